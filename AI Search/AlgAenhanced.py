@@ -2,107 +2,13 @@ import os
 import sys
 import time
 import random
-import math
-
-def read_file_into_string(input_file, from_ord, to_ord):
-    # take a file "input_file", read it character by character, strip away all unwanted
-    # characters with ord < "from_ord" and ord > "to_ord" and return the concatenation
-    # of the file as the string "output_string"
-    the_file = open(input_file,'r')
-    current_char = the_file.read(1)
-    output_string = ""
-    while current_char != "":
-        if ord(current_char) >= from_ord and ord(current_char) <= to_ord:
-            output_string = output_string + current_char
-        current_char = the_file.read(1)
-    the_file.close()
-    return output_string
-
-def stripped_string_to_int(a_string):
-    # take a string "a_string" and strip away all non-numeric characters to obtain the string
-    # "stripped_string" which is then converted to an integer with this integer returned
-    a_string_length = len(a_string)
-    stripped_string = "0"
-    if a_string_length != 0:
-        for i in range(0,a_string_length):
-            if ord(a_string[i]) >= 48 and ord(a_string[i]) <= 57:
-                stripped_string = stripped_string + a_string[i]
-    resulting_int = int(stripped_string)
-    return resulting_int
-
-def get_string_between(from_string, to_string, a_string, from_index):
-    # look for the first occurrence of "from_string" in "a_string" starting at the index
-    # "from_index", and from the end of this occurrence of "from_string", look for the first
-    # occurrence of the string "to_string"; set "middle_string" to be the sub-string of "a_string"
-    # lying between these two occurrences and "to_index" to be the index immediately after the last
-    # character of the occurrence of "to_string" and return both "middle_string" and "to_index"
-    middle_string = ""              # "middle_string" and "to_index" play no role in the case of error
-    to_index = -1                   # but need to initialized to something as they are returned
-    start = a_string.find(from_string,from_index)
-    if start == -1:
-        flag = "*** error: " + from_string + " doesn't appear"
-        #trace_file.write(flag + "\n")
-    else:
-        start = start + len(from_string)
-        end = a_string.find(to_string,start)
-        if end == -1:
-            flag = "*** error: " + to_string + " doesn't appear"
-            #trace_file.write(flag + "\n")
-        else:
-            middle_string = a_string[start:end]
-            to_index = end + len(to_string)
-            flag = "good"
-    return middle_string,to_index,flag
-
-def string_to_array(a_string, from_index, num_cities):
-    # convert the numbers separated by commas in the file-as-a-string "a_string", starting from index "from_index",
-    # which should point to the first comma before the first digit, into a two-dimensional array "distances[][]"
-    # and return it; note that we have added a comma to "a_string" so as to find the final distance
-    # distance_matrix = []
-    if from_index >= len(a_string):
-        flag = "*** error: the input file doesn't have any city distances"
-        #trace_file.write(flag + "\n")
-    else:
-        row = 0
-        column = 1
-        row_of_distances = [0]
-        flag = "good"
-        while flag == "good":
-            middle_string, from_index, flag = get_string_between(",", ",", a_string, from_index)
-            from_index = from_index - 1         # need to look again for the comma just found
-            if flag != "good":
-                flag = "*** error: there aren't enough cities"
-                # trace_file.write(flag + "\n")
-            else:
-                distance = stripped_string_to_int(middle_string)
-                row_of_distances.append(distance)
-                column = column + 1
-                if column == num_cities:
-                    distance_matrix.append(row_of_distances)
-                    row = row + 1
-                    if row == num_cities - 1:
-                        flag = "finished"
-                        row_of_distances = [0]
-                        for i in range(0, num_cities - 1):
-                            row_of_distances.append(0)
-                        distance_matrix.append(row_of_distances)
-                    else:
-                        row_of_distances = [0]
-                        for i in range(0,row):
-                            row_of_distances.append(0)
-                        column = row + 1
-        if flag == "finished":
-            flag = "good"
-    return flag
-
-def make_distance_matrix_symmetric(num_cities):
-    # make the upper triangular matrix "distance_matrix" symmetric;
-    # note that there is nothing returned
-    for i in range(1,num_cities):
-        for j in range(0,i):
-            distance_matrix[i][j] = distance_matrix[j][i]
 
-# read input file into string
+from tsp.problem import loadMatrix
+from tsp.solvers import getSolver
+from tsp.driver import Budget, SolverRun, TourFileWriter, printProgress
+from tsp.lowerbound import lowerBound
+from tsp.checkpoint import GACheckpointer
+
 
 #######################################################################################################
 ############ now we read an input file to obtain the number of cities, "num_cities", and a ############
@@ -118,38 +24,12 @@ input_file = "AISearchfile175.txt"
 
 # you need to worry about the code below until I tell you; that is, do not touch it!
 
-if len(sys.argv) == 1:
-    file_string = read_file_into_string("../city-files/" + input_file,44,122)
-else:
+if len(sys.argv) > 1:
     input_file = sys.argv[1]
-    file_string = read_file_into_string("../city-files/" + input_file,44,122)
-file_string = file_string + ","         # we need to add a final comma to find the city distances
-                                        # as we look for numbers between commas
 print("I'm working with the file " + input_file + ".")
-                                        
-# get the name of the file
 
-name_of_file,to_index,flag = get_string_between("NAME=", ",", file_string, 0)
-
-if flag == "good":
-    print("I have successfully read " + input_file + ".")
-    # get the number of cities
-    num_cities_string,to_index,flag = get_string_between("SIZE=", ",", file_string, to_index)
-    num_cities = stripped_string_to_int(num_cities_string)
-else:
-    print("***** ERROR: something went wrong when reading " + input_file + ".")
-if flag == "good":
-    print("There are " + str(num_cities) + " cities.")
-    # convert the list of distances into a 2-D array
-    distance_matrix = []
-    to_index = to_index - 1             # ensure "to_index" points to the comma before the first digit
-    flag = string_to_array(file_string, to_index, num_cities)
-if flag == "good":
-    # if the conversion went well then make the distance matrix symmetric
-    make_distance_matrix_symmetric(num_cities)
-    print("I have successfully built a symmetric two-dimensional array of city distances.")
-else:
-    print("***** ERROR: something went wrong when building the two-dimensional array of city distances.")
+# tsp.problem.loadMatrix reads and checks the file (through tsp.matrixcache), printing the usual messages
+name_of_file, num_cities, distance_matrix, flag = loadMatrix(input_file, "../city-files/", print)
 
 #######################################################################################################
 ############ end of code to build the distance matrix from the input file: so now you have ############
@@ -210,126 +90,48 @@ codes_and_names = {'BF' : 'brute-force search',
 #######################################################################################################
 ############    now the code for your algorithm should begin                               ############
 #######################################################################################################
-def genRandomTour(distance_matrix):
-    tour = list(range(len(distance_matrix)))
-    random.shuffle(tour)
-    return tour
-
-def genRandomPopulation(size, distance_matrix, best_tour):
-    population = []
-    for i in range(size):
-        t = genRandomTour(distance_matrix)
-        d = getDistance(t, distance_matrix)
-        population.append((d, t))
-        if best_tour == None or d < best_tour[0]:
-            best_tour = (d, t)
-    return (population, best_tour)
-
-def ratePopulation(population, best_tour):
-    ratedPopulation = []
-    for i in range(len(population)):
-        t = population[i]
-        d = getDistance(t, distance_matrix)
-        ratedPopulation.append((d, t))
-        if best_tour == None or d < best_tour[0]:
-            best_tour = (d, t)
-    return (ratedPopulation, best_tour)
-
-def getDistance(tour, distance_matrix):
-    dist = 0
-    for i in range(len(tour) - 1):
-        dist += distance_matrix[tour[i]][tour[i + 1]]
-    dist += distance_matrix[tour[0]][tour[len(tour) - 1]]
-    return dist
-
-#Here be failure: This was my attempt at CX. Literature said it should be good. It wasn't.
-"""
-def breed(a, b):
-    child = [-1] * len(a)
-    #Cycle crossover
-    cache = {}
-    for i in range(len(a)):
-        cache[a[i]] = i
-    cycles = [-1] * len(a)
-    count = 0
-    start = (i for i,v in enumerate(cycles) if v < 0)
-    for count, i in enumerate(start, 1):
-        while cycles[i] < 0:
-            cycles[i] = count
-            i = cache[b[i]]
-        count += 1
-    for i in range(len(cycles)):
-        if cycles[i] % 2 == 0:
-            child[i] = a[i]
-        else:
-            child[i] = b[i]
-    return child
-"""
-
-def breed(a, b):
-    child = []
-    #Ordered crossover
-    crossoverPart1 = []
-    crossoverPart2 = []
-    seqA = int(random.randrange(0, len(a)))
-    seqB = int(random.randrange(0, len(b)))
-    for i in range(min(seqA, seqB), max(seqA, seqB)):
-        crossoverPart1.append(a[i])
-    for i in range(len(b)):
-        if b[i] not in crossoverPart1:
-            crossoverPart2.append(b[i])
-    child = crossoverPart1 + crossoverPart2
-    return child
-
-def tournamentPick(population, tournament_size):
-    best = None
-    for j in range(tournament_size):
-        index = random.randrange(0, len(population))
-        if best == None or population[index][0] < population[best][0]:
-            best = index
-    return population[best][1]
-
-def breedPopulation(population, tournament_size):
-    children = []
-    for i in range(len(population) - 1):
-        parentA = tournamentPick(population, tournament_size)
-        parentB = tournamentPick(population, tournament_size)
-        children.append(breed(parentA, parentB))
-    return children
-
-def mutate(individual, mutation_rate):
-    for i in range(len(individual)):
-        if(random.random() < mutation_rate):
-            swap = random.randrange(len(individual))
-            individual[i], individual[swap] = individual[swap], individual[i]
-    return individual
-
-def mutatePopulation(population, mutation_rate):
-    mutated = []
-    for i in range(len(population)):
-        mutated.append(mutate(population[i], mutation_rate))
-    return mutated
-
-def createNextGeneration(population, mutation_rate, best_tour):
-    children = breedPopulation(population, 20)
-    mutated = mutatePopulation(children, mutation_rate)
-    mutated.append(best_tour[1])
-    ratedPopulation, best_tour = ratePopulation(mutated, best_tour)
-    return (ratedPopulation, best_tour)
-
-def geneticTSP(distance_matrix, population_size, mutation_rate, generations):
-    ratedPopulation, best_tour = genRandomPopulation(population_size, distance_matrix, None)
-    startedAt = time.time()
-    for i in range(0, generations):
-        if time.time() - startedAt >= 100:
-            break
-        mutationFactor = math.exp(-3*(math.pow(i / generations, 6)))
-        ratedPopulation, best_tour = createNextGeneration(ratedPopulation, mutation_rate * mutationFactor, best_tour)
-    return best_tour
-
-geneticTSPResult = geneticTSP(distance_matrix, 100, .01, 10000)
-tour_length = geneticTSPResult[0]
-tour = geneticTSPResult[1]
+#The GA itself lives in tsp.genetic and is run through the solver registry in tsp.solvers; set "islands" above 1
+#to run that many populations in parallel processes with tsp.islands, each sending copies of its "migrants" best
+#tours to its neighbours in "topology" ("ring", "fully-connected" or "random") every "migration_interval" generations.
+#A "seed" makes the run repeatable
+islands = 1
+migration_interval = 50
+migrants = 2
+topology = "ring"
+seed = None
+#A "fitness_cache_size" above 0 keeps that many tour lengths (tsp.fitnesscache) so repeated tours aren't scored again,
+#and "replace_duplicates" swaps repeated tours for random ones; the counters are printed at the end. Both are off
+#as repeats are rare and scoring a generation is already quick
+fitness_cache_size = 0
+replace_duplicates = False
+#The run stops after "time_limit" seconds (TSP_TIME_LIMIT in the environment, e.g. set by tsp.bench, overrides it);
+#progress is printed every "progress_interval" seconds and the best
+#tour so far is kept in "best_so_far_file", in the output file format, so a run cut short still leaves a tour
+time_limit = float(os.environ.get("TSP_TIME_LIMIT", 100))
+progress_interval = 10
+best_so_far_file = my_user_name + "BestSoFar.txt"
+#With "target_gap" set (e.g. 0.01) the run also stops as soon as its tour is within that fraction of the
+#1-tree lower bound from tsp.lowerbound, which takes up to a tenth of the time limit the first time a file is seen
+target_gap = None
+run = SolverRun(Budget(time_limit), [printProgress, TourFileWriter(best_so_far_file, my_user_name, my_first_name, my_last_name, alg_code,
+                                                                   name_of_file, added_note)], progress_interval, target_gap=target_gap)
+if target_gap is not None:
+    run.setLowerBound(lowerBound(distance_matrix, time_limit / 10, "../city-files/"))
+#Set "checkpoint_file" to save the GA's state there every "checkpoint_interval" seconds and when it stops; with
+#"resume" a run carries on from that file when it exists (same settings, so the same generations as one long run).
+#Checkpoints are only made with a single population
+checkpoint_file = ""
+checkpoint_interval = 60
+resume = False
+checkpointer = GACheckpointer(checkpoint_file, checkpoint_interval) if checkpoint_file != "" else None
+resume_file = checkpoint_file if resume and checkpointer is not None and os.path.exists(checkpoint_file) else None
+#The last "polish_time" seconds of the time limit, a tenth of it, are kept back from the GA for Lin-Kernighan moves
+#and kicks from tsp.kopt on its tour (0 to hand in the GA's tour as it is)
+polish_time = time_limit / 10
+tour, tour_length = getSolver(alg_code)(distance_matrix, run, population_size=100, mutation_rate=.01, generations=10000, islands=islands,
+                                        migration_interval=migration_interval, migrants=migrants, topology=topology, seed=seed,
+                                        fitness_cache_size=fitness_cache_size, replace_duplicates=replace_duplicates, checkpoint=checkpointer, resume=resume_file, polish_time=polish_time, report=print)
+run.finish()
 
 
 
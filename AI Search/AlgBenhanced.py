@@ -1,109 +1,12 @@
 import os
 import sys
 import time
-import random
-import copy
-import heapq
-
-def read_file_into_string(input_file, from_ord, to_ord):
-    # take a file "input_file", read it character by character, strip away all unwanted
-    # characters with ord < "from_ord" and ord > "to_ord" and return the concatenation
-    # of the file as the string "output_string"
-    the_file = open(input_file,'r')
-    current_char = the_file.read(1)
-    output_string = ""
-    while current_char != "":
-        if ord(current_char) >= from_ord and ord(current_char) <= to_ord:
-            output_string = output_string + current_char
-        current_char = the_file.read(1)
-    the_file.close()
-    return output_string
-
-def stripped_string_to_int(a_string):
-    # take a string "a_string" and strip away all non-numeric characters to obtain the string
-    # "stripped_string" which is then converted to an integer with this integer returned
-    a_string_length = len(a_string)
-    stripped_string = "0"
-    if a_string_length != 0:
-        for i in range(0,a_string_length):
-            if ord(a_string[i]) >= 48 and ord(a_string[i]) <= 57:
-                stripped_string = stripped_string + a_string[i]
-    resulting_int = int(stripped_string)
-    return resulting_int
-
-def get_string_between(from_string, to_string, a_string, from_index):
-    # look for the first occurrence of "from_string" in "a_string" starting at the index
-    # "from_index", and from the end of this occurrence of "from_string", look for the first
-    # occurrence of the string "to_string"; set "middle_string" to be the sub-string of "a_string"
-    # lying between these two occurrences and "to_index" to be the index immediately after the last
-    # character of the occurrence of "to_string" and return both "middle_string" and "to_index"
-    middle_string = ""              # "middle_string" and "to_index" play no role in the case of error
-    to_index = -1                   # but need to initialized to something as they are returned
-    start = a_string.find(from_string,from_index)
-    if start == -1:
-        flag = "*** error: " + from_string + " doesn't appear"
-        #trace_file.write(flag + "\n")
-    else:
-        start = start + len(from_string)
-        end = a_string.find(to_string,start)
-        if end == -1:
-            flag = "*** error: " + to_string + " doesn't appear"
-            #trace_file.write(flag + "\n")
-        else:
-            middle_string = a_string[start:end]
-            to_index = end + len(to_string)
-            flag = "good"
-    return middle_string,to_index,flag
-
-def string_to_array(a_string, from_index, num_cities):
-    # convert the numbers separated by commas in the file-as-a-string "a_string", starting from index "from_index",
-    # which should point to the first comma before the first digit, into a two-dimensional array "distances[][]"
-    # and return it; note that we have added a comma to "a_string" so as to find the final distance
-    # distance_matrix = []
-    if from_index >= len(a_string):
-        flag = "*** error: the input file doesn't have any city distances"
-        #trace_file.write(flag + "\n")
-    else:
-        row = 0
-        column = 1
-        row_of_distances = [0]
-        flag = "good"
-        while flag == "good":
-            middle_string, from_index, flag = get_string_between(",", ",", a_string, from_index)
-            from_index = from_index - 1         # need to look again for the comma just found
-            if flag != "good":
-                flag = "*** error: there aren't enough cities"
-                # trace_file.write(flag + "\n")
-            else:
-                distance = stripped_string_to_int(middle_string)
-                row_of_distances.append(distance)
-                column = column + 1
-                if column == num_cities:
-                    distance_matrix.append(row_of_distances)
-                    row = row + 1
-                    if row == num_cities - 1:
-                        flag = "finished"
-                        row_of_distances = [0]
-                        for i in range(0, num_cities - 1):
-                            row_of_distances.append(0)
-                        distance_matrix.append(row_of_distances)
-                    else:
-                        row_of_distances = [0]
-                        for i in range(0,row):
-                            row_of_distances.append(0)
-                        column = row + 1
-        if flag == "finished":
-            flag = "good"
-    return flag
-
-def make_distance_matrix_symmetric(num_cities):
-    # make the upper triangular matrix "distance_matrix" symmetric;
-    # note that there is nothing returned
-    for i in range(1,num_cities):
-        for j in range(0,i):
-            distance_matrix[i][j] = distance_matrix[j][i]
 
-# read input file into string
+from tsp.problem import loadMatrix
+from tsp.solvers import getSolver
+from tsp.driver import Budget, SolverRun, TourFileWriter, printProgress
+from tsp.lowerbound import lowerBound
+
 
 #######################################################################################################
 ############ now we read an input file to obtain the number of cities, "num_cities", and a ############
@@ -119,38 +22,12 @@ input_file = "AISearchfile175.txt"
 
 # you need to worry about the code below until I tell you; that is, do not touch it!
 
-if len(sys.argv) == 1:
-    file_string = read_file_into_string("../city-files/" + input_file,44,122)
-else:
+if len(sys.argv) > 1:
     input_file = sys.argv[1]
-    file_string = read_file_into_string("../city-files/" + input_file,44,122)
-file_string = file_string + ","         # we need to add a final comma to find the city distances
-                                        # as we look for numbers between commas
 print("I'm working with the file " + input_file + ".")
-                                        
-# get the name of the file
 
-name_of_file,to_index,flag = get_string_between("NAME=", ",", file_string, 0)
-
-if flag == "good":
-    print("I have successfully read " + input_file + ".")
-    # get the number of cities
-    num_cities_string,to_index,flag = get_string_between("SIZE=", ",", file_string, to_index)
-    num_cities = stripped_string_to_int(num_cities_string)
-else:
-    print("***** ERROR: something went wrong when reading " + input_file + ".")
-if flag == "good":
-    print("There are " + str(num_cities) + " cities.")
-    # convert the list of distances into a 2-D array
-    distance_matrix = []
-    to_index = to_index - 1             # ensure "to_index" points to the comma before the first digit
-    flag = string_to_array(file_string, to_index, num_cities)
-if flag == "good":
-    # if the conversion went well then make the distance matrix symmetric
-    make_distance_matrix_symmetric(num_cities)
-    print("I have successfully built a symmetric two-dimensional array of city distances.")
-else:
-    print("***** ERROR: something went wrong when building the two-dimensional array of city distances.")
+# tsp.problem.loadMatrix reads and checks the file (through tsp.matrixcache), printing the usual messages
+name_of_file, num_cities, distance_matrix, flag = loadMatrix(input_file, "../city-files/", print)
 
 #######################################################################################################
 ############ end of code to build the distance matrix from the input file: so now you have ############
@@ -211,92 +88,34 @@ codes_and_names = {'BF' : 'brute-force search',
 #######################################################################################################
 ############    now the code for your algorithm should begin                               ############
 #######################################################################################################
-def getDistance(tour, distance_matrix, home=True):
-    dist = 0
-    for i in range(len(tour) - 1):
-        dist += distance_matrix[tour[i]][tour[i + 1]]
-    if home:
-        dist += distance_matrix[tour[0]][tour[len(tour) - 1]]
-    return dist
-
-def astar(distance_matrix):
-    node = random.randrange(len(distance_matrix))
-    fringe = []
-    nodes = set(range(len(distance_matrix)))
-    t = (0, [node], 0)
-    heapq.heappush(fringe, t)
-    d = t
-    startTime = time.time()
-    while len(fringe) > 0:
-        d = heapq.heappop(fringe)
-        lastTour = d[1]
-        if len(lastTour) == len(distance_matrix):
-            break
-        lastNode = lastTour[d[2]]
-        newNodes = nodes - set(lastTour)
-        if time.time() - startTime >= 100:
-            orderedNearests = computeOrderedNearests(distance_matrix)
-            panicTour = greedyTour(lastNode, newNodes, distance_matrix, orderedNearests)
-            return lastTour + panicTour[1:]
-        for child in newNodes:
-            cost = distance_matrix[lastNode][child] + heuristic(newNodes, distance_matrix)
-            newTour = copy.copy(lastTour)
-            newTour.append(child)
-            newT = (cost, newTour, d[2] + 1)
-            heapq.heappush(fringe, newT)
-    return d[1]
-
-def heuristic(tour, distance_matrix):
-    best = list(tour)
-    better = True
-    while better:
-        better = False
-        #2-opt heuristic. Keep improving while the distance is getting better
-        for i in range(1, len(tour) - 2):
-            for j in range(i + 1, len(tour)):
-                if j - i == 1: continue
-                """
-                Credit to this StackOverflow answer https://stackoverflow.com/a/53977320 for a more efficient implementation of 2-opt
-                compared to the more well-known algorithm which I originally used.
-                """
-                delta = distance_matrix[best[i - 1]][best[j-1]]
-                delta += distance_matrix[best[i]][best[j]]
-                delta -= distance_matrix[best[i - 1]][best[i]]
-                delta -= distance_matrix[best[j - 1]][best[j]]
-                if delta < 0:
-                    best[i:j] = best[j - 1:i - 1:-1]
-                    better = True
-    return getDistance(best, distance_matrix, False)
-
-def greedyTour(v, children, distance_matrix, ordered_nearests):
-    last = v
-    tour = [v]
-    while len(children) > 0:
-        nextNode = getNearest(last, children, ordered_nearests)
-        tour.append(nextNode)
-        children.remove(nextNode)
-        last = nextNode
-    return tour
-
-def getNearest(lastNode, unvisited, ordered_nearests):
-    d = dict.fromkeys(unvisited, 0)
-    for i in ordered_nearests[lastNode]:
-        if i in d:
-            return i
-
-def computeOrderedNearests(distance_matrix):
-    nearests = []
-    for i in range(len(distance_matrix)):
-        distances = []
-        distanceTuples = sorted(enumerate(distance_matrix[i]), key=lambda x:x[1])
-        for el in distanceTuples:
-            distances.append(el[0])
-        nearests.append(distances)
-    return nearests
-
-start = time.time()
-tour = astar(distance_matrix)
-tour_length = getDistance(tour, distance_matrix)
+#The search itself lives in tsp.astar and is run, with the 2-opt heuristic, through the solver registry in tsp.solvers;
+#see tsp.astar for the node representation and memory ceiling
+#The run stops after "time_limit" seconds (TSP_TIME_LIMIT in the environment, e.g. set by tsp.bench, overrides it);
+#progress is printed every "progress_interval" seconds and the best
+#tour so far (the greedy tour until the search finishes) is kept in "best_so_far_file", in the output file format
+time_limit = float(os.environ.get("TSP_TIME_LIMIT", 100))
+progress_interval = 10
+best_so_far_file = my_user_name + "BestSoFar.txt"
+#With "target_gap" set (e.g. 0.01) the run also stops as soon as its tour is within that fraction of the
+#1-tree lower bound from tsp.lowerbound, which takes up to a tenth of the time limit the first time a file is seen
+target_gap = None
+run = SolverRun(Budget(time_limit), [printProgress, TourFileWriter(best_so_far_file, my_user_name, my_first_name, my_last_name, alg_code,
+                                                                   name_of_file, added_note)], progress_interval, target_gap=target_gap)
+if target_gap is not None:
+    run.setLowerBound(lowerBound(distance_matrix, time_limit / 10, "../city-files/"))
+#"search" is "astar", or "beam" or "sma" for tsp.bounded's beam search or SMA*, which keep to "max_bytes" of search nodes
+#instead of giving up on the search when that runs out (A* finishes its best node greedily, as at the time limit)
+search = "astar"
+max_bytes = 2 ** 30
+#With "processes" above 1 the search runs from several start cities side by side (every city on files of up to 60
+#cities, otherwise one random city per process) with tsp.multistart, and the best tour is kept
+processes = 1
+#The last "polish_time" seconds of the time limit, a tenth of it, are kept back from the search for Lin-Kernighan
+#moves and kicks from tsp.kopt on its tour (0 to hand in the A* tour as it is)
+polish_time = time_limit / 10
+tour, tour_length = getSolver(alg_code)(distance_matrix, run, heuristic="2opt", polish_time=polish_time, report=print, search=search,
+                                        max_bytes=max_bytes, processes=processes)
+run.finish()
 
 #######################################################################################################
 ############ the code for your algorithm should now be complete and you should have        ############
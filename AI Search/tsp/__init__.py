@@ -0,0 +1,6 @@
+"""
+Shared code for the AI Search TSP scripts.
+The Alg*.py scripts import from here instead of each carrying their own copy. tsp.problem loads, checks
+and writes tours, tsp.solvers holds every algorithm by its alg_code, and tsp.batch solves many city files
+with them in one process.
+"""
@@ -0,0 +1,385 @@
+"""
+A* search from AlgBbasic.py / AlgBenhanced.py with a compact search state.
+
+Every fringe entry used to carry its own copy of the partial tour, and every expansion rebuilt the
+unvisited set with nodes - set(lastTour). Now a SearchNode only stores its city, a pointer to the node it
+was expanded from (so all partial tours share their common prefixes), its depth, the path length so far
+and the visited cities as one integer bitmask. The tour is only rebuilt, by walking the parent pointers,
+for the node the search finishes on.
+
+A search stops at the goal, at the time limit, or when the fringe passes "max_nodes" or "max_bytes"
+(estimated from the size of a node). In the last two cases the best node on the fringe is finished off
+with greedyTour, like the scripts' 100 second cut-off always did. tsp.bounded has beam search and SMA*,
+which keep to a memory budget without giving up on the search. The returned stats hold the fringe size
+telemetry: nodes expanded and generated, the peak fringe size and estimated bytes, a sample of the
+fringe size every "telemetry_interval" expansions and why the search stopped.
+
+Heuristics are called as heuristic(city, unvisited, distance_matrix, ordered_nearests), "unvisited"
+being a fresh set of the cities still to visit after "city" that the heuristic may consume.
+The same (city, unvisited) pairs come up again and again across the fringe, so a HeuristicCache keyed by
+(city, visited bitmask) can remember their values. Heuristics listed in "incrementals" also have a form
+that scores all the children of an expansion together from work shared with their parent: greedy
+completions of the children are derived from the parent's own greedy completion, and 2-opt and
+localSearchHeuristic (a greedy tour improved by tsp.localsearch), whose values only depend on the parent's
+unvisited set, are run once per expansion rather than once per child.
+
+greedyHeuristic, twoOptHeuristic and localSearchHeuristic price the remaining cities as a separate tour or path, so the fringe is
+ranked by the last edge plus the heuristic, as the scripts always did. mstHeuristic (tsp.spanningtree) is an
+admissible estimate of the rest of the tour back to the start city; heuristics in "pathHeuristics" are
+given that start city and the fringe is ranked by the path so far plus the estimate, i.e. proper A*.
+
+Running this module directly checks the greedy tours and incremental values and then compares the heuristics,
+nodes expanded, time and tour length, on the given city files (the 012 to 535 files by default):
+    python -m tsp.astar [time_limit] [file ...]
+"""
+import sys
+import time
+import heapq
+import random
+
+from tsp.cityfile import load_city_file, benchmark_files
+from tsp.lrucache import LRUCache
+from tsp.problem import tourLength, pathLength, randomMatrix
+from tsp.neighbours import NeighbourIndex
+from tsp.localsearch import LocalSearch
+from tsp.spanningtree import mstHeuristic, mstChildren
+
+class SearchNode:
+    __slots__ = ("city", "parent", "depth", "g", "visited")
+
+    def __init__(self, city, parent, depth, g, visited):
+        self.city = city
+        self.parent = parent
+        self.depth = depth
+        self.g = g
+        self.visited = visited
+
+    def tour(self):
+        # rebuild the partial tour by walking back to the start city
+        tour = [0] * (self.depth + 1)
+        node = self
+        while node is not None:
+            tour[node.depth] = node.city
+            node = node.parent
+        return tour
+
+def unvisitedCities(visited, num_cities):
+    return [city for city in range(num_cities) if not (visited >> city) & 1]
+
+def greedyHeuristic(v, children, distance_matrix, ordered_nearests):
+    #AlgBbasic.py: the length of the greedy tour from v through the remaining cities and back to v
+    tour = greedyTour(v, children, distance_matrix, ordered_nearests)
+    distance = tourLength(tour, distance_matrix)
+    return distance
+
+def twoOptHeuristic(v, children, distance_matrix, ordered_nearests, deadline=None):
+    #AlgBenhanced.py: 2-opt the remaining cities (v included) into a path and return the path's length, or None if the
+    #time.time() "deadline" passes first. Starting from them in order keeps the value independent of how the set was built
+    best = sorted(children | {v})
+    better = True
+    while better:
+        better = False
+        #2-opt heuristic. Keep improving while the distance is getting better
+        for i in range(1, len(best) - 2):
+            if deadline is not None and time.time() >= deadline:
+                return None
+            for j in range(i + 1, len(best)):
+                if j - i == 1: continue
+                """
+                Credit to this StackOverflow answer https://stackoverflow.com/a/53977320 for a more efficient implementation of 2-opt
+                compared to the more well-known algorithm which I originally used.
+                """
+                delta = distance_matrix[best[i - 1]][best[j-1]]
+                delta += distance_matrix[best[i]][best[j]]
+                delta -= distance_matrix[best[i - 1]][best[i]]
+                delta -= distance_matrix[best[j - 1]][best[j]]
+                if delta < 0:
+                    best[i:j] = best[j - 1:i - 1:-1]
+                    better = True
+    return pathLength(best, distance_matrix)
+
+def localSearchHeuristic(v, children, distance_matrix, ordered_nearests, deadline=None):
+    #The greedy tour through the remaining cities (v included), improved by tsp.localsearch, as a closed tour; None if
+    #the "deadline" passes first
+    cities = children | {v}
+    first = min(cities)
+    tour = greedyTour(first, cities - {first}, distance_matrix, ordered_nearests)
+    LocalSearch(distance_matrix, ordered_nearests).improve(tour, None if deadline is None else max(0.0, deadline - time.time()))
+    if deadline is not None and time.time() >= deadline:
+        return None
+    return tourLength(tour, distance_matrix)
+
+def greedyChildren(v, unvisited, children, distance_matrix, ordered_nearests, deadline=None):
+    # greedyHeuristic for each city in "children" (a subset of "unvisited", the cities left after v), worked
+    # out from v's own greedy completion, or None if the time.time() "deadline" passes first. Greedy is deterministic given the current city and the set left, so
+    # once a child's walk stands on the parent's i-th city having visited exactly the parent's first i cities,
+    # the rest of its walk is the rest of the parent's and its length can be read off the parent's prefix sums
+    parentTour = greedyTour(v, set(unvisited), distance_matrix, ordered_nearests)
+    k = len(parentTour) - 1
+    prefix = [0] * (k + 1)
+    for i in range(1, k + 1):
+        prefix[i] = prefix[i - 1] + distance_matrix[parentTour[i - 1]][parentTour[i]]
+    position = {city: i for i, city in enumerate(parentTour)}
+    last = parentTour[k]
+    base = ordered_nearests.cursor(unvisited)
+    values = []
+    for child in children:
+        if deadline is not None and time.time() >= deadline:
+            return None
+        cursor = base.copy()
+        cursor.visit(child)
+        previous = child
+        length = 0
+        count = 1
+        furthest = position[child]
+        merged = furthest == 1
+        if not merged:
+            for city in cursor.walk(child):
+                length += distance_matrix[previous][city]
+                previous = city
+                count += 1
+                if position[city] > furthest:
+                    furthest = position[city]
+                if count == furthest == position[city]:
+                    merged = True
+                    break
+        if merged:
+            #Merged into the parent's walk: finish along it and close the cycle back to the child
+            length += prefix[k] - prefix[furthest] + distance_matrix[last][child]
+        else:
+            length += distance_matrix[previous][child]
+        values.append(length)
+    return values
+
+def twoOptChildren(v, unvisited, children, distance_matrix, ordered_nearests, deadline=None):
+    #twoOptHeuristic comes out the same for every child of an expansion, so it is run once
+    value = twoOptHeuristic(next(iter(children)), set(unvisited), distance_matrix, ordered_nearests, deadline)
+    return [value] * len(children) if value is not None else None
+
+def localSearchChildren(v, unvisited, children, distance_matrix, ordered_nearests, deadline=None):
+    #Like 2-opt, the local search value only depends on the parent's unvisited set
+    first = next(iter(children))
+    value = localSearchHeuristic(first, set(unvisited) - {first}, distance_matrix, ordered_nearests, deadline)
+    return [value] * len(children) if value is not None else None
+
+incrementals = {greedyHeuristic : greedyChildren,
+                twoOptHeuristic : twoOptChildren,
+                localSearchHeuristic : localSearchChildren,
+                mstHeuristic : mstChildren}
+
+pathHeuristics = {mstHeuristic}
+
+heuristics = {'greedy' : greedyHeuristic,
+              '2opt' : twoOptHeuristic,
+              'ls' : localSearchHeuristic,
+              'mst' : mstHeuristic}
+
+def getHeuristic(name):
+    if name not in heuristics:
+        raise ValueError("unknown heuristic " + str(name) + ", expected one of " + ", ".join(heuristics))
+    return heuristics[name]
+
+class HeuristicCache(LRUCache):
+    # heuristic values keyed by (city, visited bitmask)
+    pass
+
+def greedyTour(v, children, distance_matrix, ordered_nearests):
+    #"ordered_nearests" is a tsp.neighbours.NeighbourIndex; its cursor finds each nearest unvisited city in a few steps
+    tour = [v]
+    tour.extend(ordered_nearests.cursor(children).walk(v))
+    return tour
+
+#The original full-sort versions, kept to check greedyTour against
+def legacyGreedyTour(v, children, distance_matrix, ordered_nearests):
+    last = v
+    tour = [v]
+    while len(children) > 0:
+        nextNode = getNearest(last, children, ordered_nearests)
+        tour.append(nextNode)
+        children.remove(nextNode)
+        last = nextNode
+    return tour
+
+def getNearest(lastNode, unvisited, ordered_nearests):
+    d = dict.fromkeys(unvisited, 0)
+    for i in ordered_nearests[lastNode]:
+        if i in d:
+            return i
+
+def computeOrderedNearests(distance_matrix):
+    nearests = []
+    for i in range(len(distance_matrix)):
+        distances = []
+        distanceTuples = sorted(enumerate(distance_matrix[i]), key=lambda x:x[1])
+        for el in distanceTuples:
+            distances.append(el[0])
+        nearests.append(distances)
+    return nearests
+
+def nodeBytes(num_cities):
+    # rough size of one fringe entry: the node, its visited bitmask and the heap tuple pointing at it
+    node = SearchNode(0, None, 0, 0, (1 << num_cities) - 1)
+    return sys.getsizeof(node) + sys.getsizeof(node.visited) + sys.getsizeof((0, 0, node))
+
+def scoreChildren(node, children, unvisited, heuristic, distance_matrix, ordered_nearests, start, heuristic_cache=None, incremental=True,
+                  deadline=None):
+    # (city, visited bitmask, path length, fringe cost) for each of "children", some or all of "unvisited" (the cities
+    # left after "node"); the cost is the last edge plus the heuristic, with the path so far added for path heuristics.
+    # Returns None if the time.time() "deadline" passes before every child is scored
+    childHeuristics = incrementals.get(heuristic) if incremental else None
+    pathCost = heuristic in pathHeuristics
+    startArgument = {"start": start} if pathCost else {}
+    lastNode = node.city
+    masks = [node.visited | (1 << child) for child in children]
+    values = [None] * len(children)
+    if heuristic_cache is not None:
+        values = [heuristic_cache.get((child, mask)) for child, mask in zip(children, masks)]
+    missing = [k for k in range(len(children)) if values[k] is None]
+    if missing:
+        if childHeuristics is not None:
+            scored = childHeuristics(lastNode, unvisited, [children[k] for k in missing], distance_matrix, ordered_nearests,
+                                     deadline=deadline, **startArgument)
+            if scored is None:
+                return None
+        else:
+            scored = []
+            for k in missing:
+                if deadline is not None and time.time() >= deadline:
+                    return None
+                childNodes = set(unvisited)
+                childNodes.discard(children[k])
+                scored.append(heuristic(children[k], childNodes, distance_matrix, ordered_nearests, **startArgument))
+        for k, value in zip(missing, scored):
+            values[k] = value
+            if heuristic_cache is not None:
+                heuristic_cache.put((children[k], masks[k]), value)
+    result = []
+    for child, mask, value in zip(children, masks, values):
+        edge = distance_matrix[lastNode][child]
+        cost = edge + value
+        if pathCost:
+            cost += node.g
+        result.append((child, mask, node.g + edge, cost))
+    return result
+
+def astarSearch(distance_matrix, heuristic=greedyHeuristic, start=None, time_limit=100, max_nodes=None, max_bytes=None,
+                telemetry_interval=1000, report=None, heuristic_cache=None, incremental=True, run=None, ordered_nearests=None):
+    # return the tour found and a dict of search stats; "report", if given, is called with the stats
+    # every "telemetry_interval" expansions. Pass a HeuristicCache to memoise heuristic values, and
+    # incremental=False to score every child on its own even if the heuristic has an incremental form.
+    #A tsp.driver.SolverRun "run" replaces "time_limit" with its own budget (an iteration is an expansion); it is
+    #offered the greedy tour from the start city straight away, so there is an answer however early the run ends.
+    #A NeighbourIndex already built for the matrix can be passed in as "ordered_nearests"
+    num_cities = len(distance_matrix)
+    orderedNearests = ordered_nearests if ordered_nearests is not None else NeighbourIndex(distance_matrix)
+    if start is None:
+        start = random.randrange(num_cities)
+    bytesPerNode = nodeBytes(num_cities)
+    if max_bytes is not None:
+        byteLimit = max_bytes // bytesPerNode
+        max_nodes = byteLimit if max_nodes is None else min(max_nodes, byteLimit)
+    stats = {"expanded": 0, "generated": 1, "max_fringe": 1, "bytes_per_node": bytesPerNode, "max_fringe_bytes": bytesPerNode,
+             "fringe_samples": [], "stopped": "goal", "seconds": 0.0}
+    full = (1 << num_cities) - 1
+    counter = 0
+    node = SearchNode(start, None, 0, 0, 1 << start)
+    #The counter breaks ties between equal costs in insertion order, so nodes themselves are never compared
+    fringe = [(0, counter, node)]
+    startTime = time.time()
+    if run is not None:
+        deadline = run.budget.deadline()
+        greedy = greedyTour(start, set(unvisitedCities(node.visited, num_cities)), distance_matrix, orderedNearests)
+        run.offer(greedy, tourLength(greedy, distance_matrix), 0)
+    else:
+        deadline = startTime + time_limit if time_limit is not None else float("inf")
+    #Scoring an expansion's children can take seconds on big files, so it watches the deadline too
+    scoringDeadline = deadline if deadline != float("inf") else None
+    while fringe:
+        cost, c, node = heapq.heappop(fringe)
+        if node.visited == full:
+            break
+        stopped = None
+        if max_nodes is not None and len(fringe) >= max_nodes:
+            stopped = "memory"
+        elif run is not None:
+            if run.tick(stats["expanded"]):
+                stopped = run.stopped
+        elif time.time() >= deadline:
+            stopped = "deadline"
+        if stopped is None:
+            newNodes = unvisitedCities(node.visited, num_cities)
+            scored = scoreChildren(node, newNodes, newNodes, heuristic, distance_matrix, orderedNearests, start, heuristic_cache, incremental,
+                                   scoringDeadline)
+            if scored is None:
+                stopped = "deadline"
+        if stopped is not None:
+            stats["stopped"] = stopped
+            panicTour = greedyTour(node.city, set(unvisitedCities(node.visited, num_cities)), distance_matrix, orderedNearests)
+            stats["seconds"] = time.time() - startTime
+            tour = node.tour() + panicTour[1:]
+            if run is not None:
+                run.stop(stopped)
+                run.offer(tour, tourLength(tour, distance_matrix), stats["expanded"])
+            return tour, stats
+        stats["expanded"] += 1
+        for child, mask, g, cost in scored:
+            counter += 1
+            heapq.heappush(fringe, (cost, counter, SearchNode(child, node, node.depth + 1, g, mask)))
+        stats["generated"] += len(newNodes)
+        if len(fringe) > stats["max_fringe"]:
+            stats["max_fringe"] = len(fringe)
+            stats["max_fringe_bytes"] = len(fringe) * bytesPerNode
+        if stats["expanded"] % telemetry_interval == 0:
+            stats["fringe_samples"].append((stats["expanded"], len(fringe)))
+            if report is not None:
+                report(stats)
+    stats["seconds"] = time.time() - startTime
+    tour = node.tour()
+    if run is not None:
+        run.offer(tour, tourLength(tour, distance_matrix), stats["expanded"])
+    return tour, stats
+
+def astar(distance_matrix, heuristic=greedyHeuristic, time_limit=100, heuristic_cache=None, run=None):
+    tour, stats = astarSearch(distance_matrix, heuristic, time_limit=time_limit, heuristic_cache=heuristic_cache, run=run)
+    return tour
+
+def crossCheck(rounds=300, rng=random):
+    #Compare greedyTour on short candidate lists with the full-sort version, and the incremental greedy
+    #values with greedyHeuristic run on each child by itself
+    failures = 0
+    for r in range(rounds):
+        num_cities = rng.randint(2, 40)
+        distance_matrix = [[d // 50 for d in row] for row in randomMatrix(num_cities, rng)]
+        orderedNearests = NeighbourIndex(distance_matrix, rng.randint(1, 8))
+        v = rng.randrange(num_cities)
+        unvisited = [city for city in range(num_cities) if city != v and rng.random() < 0.8] or [(v + 1) % num_cities]
+        if greedyTour(v, set(unvisited), distance_matrix, orderedNearests) != legacyGreedyTour(v, set(unvisited), distance_matrix,
+                                                                                                computeOrderedNearests(distance_matrix)):
+            failures += 1
+        values = greedyChildren(v, unvisited, unvisited, distance_matrix, orderedNearests)
+        for child, value in zip(unvisited, values):
+            if value != greedyHeuristic(child, set(unvisited) - {child}, distance_matrix, orderedNearests):
+                failures += 1
+    return failures
+
+def benchmark(file_names=benchmark_files, time_limit=10, directory="../city-files/"):
+    # run every heuristic on every file from the same start city; returns a list of result dicts
+    results = []
+    for input_file in file_names:
+        name_of_file, num_cities, distance_matrix, flag = load_city_file(input_file, directory)
+        if flag != "good":
+            continue
+        distance_matrix = distance_matrix.tolist()
+        for name, heuristic in heuristics.items():
+            tour, stats = astarSearch(distance_matrix, heuristic, start=0, time_limit=time_limit)
+            results.append({"file": input_file, "heuristic": name, "length": tourLength(tour, distance_matrix),
+                            "expanded": stats["expanded"], "seconds": stats["seconds"], "stopped": stats["stopped"]})
+    return results
+
+if __name__ == "__main__":
+    failures = crossCheck()
+    print("greedy tours and incremental values match" if failures == 0 else str(failures) + " mismatches")
+    time_limit = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    for result in benchmark(sys.argv[2:] or benchmark_files, time_limit):
+        print(result["file"] + " " + result["heuristic"].ljust(6) + " length " + str(result["length"]).ljust(7) + " expanded " +
+              str(result["expanded"]).ljust(7) + " " + format(result["seconds"], ".2f") + "s (" + result["stopped"] + ")")
@@ -0,0 +1,78 @@
+"""
+The basic genetic algorithm from AlgAbasic.py: roulette-wheel mating pool, random pairing, crossover
+and swap mutation, with no elitism.
+It used to live in the script and read the script's "evaluator" and "distance_matrix" globals; here
+the evaluator and matrix are passed in, so it runs on any matrix (see tsp.solvers).
+A population is a tuple of the rated tours, as (length, tour) pairs, and the sum of their fitnesses.
+"""
+import random
+
+from tsp.fitness import PopulationEvaluator
+from tsp.crossover import getCrossover
+from tsp.selection import rouletteSelect, randomSelect
+from tsp.mutation import swapMutate
+
+def genRandomTour(distance_matrix):
+    tour = list(range(len(distance_matrix)))
+    random.shuffle(tour)
+    return tour
+
+def genRandomPopulation(size, distance_matrix, evaluator):
+    tours = [genRandomTour(distance_matrix) for i in range(size)]
+    return evaluator.ratePopulation(tours)
+
+#The same cumulative probabilities as the original loop, but the whole pool is drawn in one batched call
+#with a binary search per draw instead of a linear scan, see tsp.selection
+def createMatingPoolFromPopulation(population_sorted, population_fitness):
+    individualFitnesses = [population_sorted[i][0] / population_fitness for i in range(len(population_sorted))]
+    selected = rouletteSelect(individualFitnesses, len(population_sorted), total=1.0).tolist()
+    return [population_sorted[i] for i in selected]
+
+def breedPool(pool, breed):
+    children = []
+    parents = randomSelect(len(pool), 2 * len(pool)).tolist()
+    for i in range(len(pool)):
+        parentA = pool[parents[2 * i]][1]
+        parentB = pool[parents[2 * i + 1]][1]
+        child = breed(parentA, parentB)
+        children.append(child)
+    return children
+
+def mutatePopulation(ratedPopulation, mutation_rate, distance_matrix):
+    mutated = []
+    for length, individual in ratedPopulation:
+        individual, length = swapMutate(individual, length, mutation_rate, distance_matrix)
+        mutated.append((length, individual))
+    return mutated
+
+#Children are scored once, straight after crossover, and swapMutate (tsp.mutation) then carries each
+#length through its swaps, so the mutated tours never need summing again
+def createNextGeneration(populationTuple, mutation_rate, breed, evaluator, distance_matrix):
+    population = sorted(populationTuple[0], key=lambda kv: kv[0])
+    matingPool = createMatingPoolFromPopulation(population, populationTuple[1])
+    children = breedPool(matingPool, breed)
+    ratedChildren, childrenFitness = evaluator.ratePopulation(children)
+    mutated = mutatePopulation(ratedChildren, mutation_rate, distance_matrix)
+    populationFitness = sum(1 / d for d, t in mutated)
+    return (mutated, populationFitness)
+
+#Crossovers are picked by name from tsp.crossover: OX (ordered), PMX, ERX (edge recombination) or CX (cycle)
+#The tsp.driver.SolverRun "run" decides when to stop, counts the generations and is offered every generation's
+#best tour that beats the best so far, so it can stop the GA on a target as soon as one is reached
+def geneticTSP(distance_matrix, population_size, mutation_rate, generations, run, crossover="OX", evaluator=None):
+    # return the best (distance, tour) of the last generation
+    breed = getCrossover(crossover)
+    if evaluator is None:
+        evaluator = PopulationEvaluator(distance_matrix)
+    populationTuple = genRandomPopulation(population_size, distance_matrix, evaluator)
+    best_length, best = min(populationTuple[0], key=lambda kv: kv[0])
+    run.offer(best, best_length, 0)
+    for i in range(0, generations):
+        if run.tick(i):
+            break
+        populationTuple = createNextGeneration(populationTuple, mutation_rate, breed, evaluator, distance_matrix)
+        best_length, best = min(populationTuple[0], key=lambda kv: kv[0])
+        if best_length < run.best_length:
+            run.offer(best, best_length, i + 1)
+    population = sorted(populationTuple[0], key=lambda kv: kv[0])
+    return population[0]
@@ -0,0 +1,132 @@
+"""
+Solve a list of city files with a list of algorithms in one process, or in a pool of worker processes.
+Each (file, algorithm, variant) is a task run through tsp.solvers under its own time limit. A process
+loads each city file once (through tsp.problem.loadMatrix, so the matrix cache is used too) and keeps
+the matrices it has loaded, and a pool is handed all the tasks for one file together so that file is
+only loaded by one worker. Every tour is checked like the scripts check theirs and, given an output
+directory, written there in the output file format as <city file>-<alg_code>-<variant>.txt. With a
+target gap a task stops as soon as its tour is within that fraction of the file's 1-tree lower bound
+(tsp.lowerbound), which is worked out once per file and kept in the matrix cache.
+
+    python -m tsp.batch AISearchfile012.txt ... [--algorithms GA AS] [--variants basic enhanced] [--time-limit 10]
+                        [--workers 4] [--seed 0] [--target-gap 0.01] [--output-dir tours] [--json results.json]
+                        [--city-dir ../city-files/]
+                        [--user abcd12 --first-name A --last-name B]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+from tsp.cityfile import CITY_FILE_DIR, benchmark_files
+from tsp.problem import loadMatrix, checkTour, writeTourFile
+from tsp.solvers import solve, getSolver
+from tsp.islands import poolContext
+
+_matrices = {}
+_settings = {}
+
+def _matrix(input_file, city_dir):
+    # the loaded city file, from this process's memo if it has been loaded before
+    key = (city_dir, input_file)
+    if key not in _matrices:
+        _matrices[key] = loadMatrix(input_file, city_dir)
+    return _matrices[key]
+
+def _initWorker(settings):
+    _settings.update(settings)
+
+def solveTask(task, settings=None):
+    # solve one (input_file, alg_code, variant, seed) task; returns a result dict
+    settings = settings if settings is not None else _settings
+    input_file, alg_code, variant, seed = task
+    result = {"file": input_file, "alg_code": alg_code, "variant": variant, "seed": seed, "error": ""}
+    name_of_file, num_cities, distance_matrix, flag = _matrix(input_file, settings["city_dir"])
+    if flag != "good":
+        result["error"] = "could not read " + input_file
+        return result
+    if seed is not None:
+        random.seed(seed)
+    startedAt = time.perf_counter()
+    tour, tour_length, stats = solve(alg_code, distance_matrix, settings["time_limit"], variant, target_gap=settings.get("target_gap"),
+                                     city_dir=settings["city_dir"])
+    check, check_tour_length = checkTour(tour, tour_length, distance_matrix)
+    result.update({"num_cities": num_cities, "length": tour_length, "valid": check == "good", "seconds": time.perf_counter() - startedAt,
+                   "iterations": stats["iterations"], "stopped": stats["stopped"], "gap": stats.get("gap")})
+    if check == "good" and settings.get("output_dir"):
+        output_file_name = os.path.join(settings["output_dir"], os.path.splitext(input_file)[0] + "-" + alg_code + "-" + variant + ".txt")
+        writeTourFile(output_file_name, tour, tour_length, settings["my_user_name"], settings["my_first_name"], settings["my_last_name"],
+                      alg_code, name_of_file)
+        result["output_file"] = output_file_name
+    return result
+
+def runBatch(file_names, alg_codes=("GA", "AS"), variants=("enhanced",), time_limit=10, workers=1, seed=None, report=None, **settings):
+    # solve every file with every algorithm and variant; returns the results in that order. "settings" are
+    # city_dir, target_gap, output_dir, my_user_name, my_first_name and my_last_name
+    settings = dict({"city_dir": CITY_FILE_DIR, "target_gap": None, "output_dir": None, "my_user_name": "", "my_first_name": "",
+                     "my_last_name": ""},
+                    time_limit=time_limit, **settings)
+    for alg_code in alg_codes:
+        for variant in variants:
+            getSolver(alg_code, variant)
+    perFile = len(alg_codes) * len(variants)
+    tasks = [(input_file, alg_code, variant) for input_file in file_names for alg_code in alg_codes for variant in variants]
+    #Task k is seeded with seed + k, so a run gets the same tours however many workers there are
+    tasks = [task + (None if seed is None else seed + k,) for k, task in enumerate(tasks)]
+    if settings["output_dir"]:
+        os.makedirs(settings["output_dir"], exist_ok=True)
+    results = []
+    if workers <= 1:
+        for task in tasks:
+            results.append(solveTask(task, settings))
+            if report is not None:
+                report(results[-1])
+        return results
+    with poolContext().Pool(workers, initializer=_initWorker, initargs=(settings,)) as pool:
+        #One chunk per file, so each file is loaded by just one worker
+        for result in pool.imap(solveTask, tasks, chunksize=perFile):
+            results.append(result)
+            if report is not None:
+                report(result)
+    return results
+
+def printResult(result):
+    label = result["file"] + " " + result["alg_code"] + " " + result["variant"]
+    if result["error"]:
+        print(label + ": " + result["error"])
+    else:
+        print(label + ": length " + str(result["length"]) + ("" if result["valid"] else " (INVALID)") + " in " +
+              format(result["seconds"], ".1f") + "s (" + str(result["stopped"]) + ")" +
+              ("" if result["gap"] is None else ", " + format(100 * result["gap"], ".2f") + "% above the lower bound"))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m tsp.batch", description="Solve city files with the registered algorithms")
+    parser.add_argument("files", nargs="*", default=benchmark_files)
+    parser.add_argument("--algorithms", nargs="+", default=["GA", "AS"], help="alg_codes from tsp.solvers")
+    parser.add_argument("--variants", nargs="+", default=["enhanced"])
+    parser.add_argument("--time-limit", type=float, default=10)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--target-gap", type=float, help="stop a task once its tour is within this fraction of the lower bound")
+    parser.add_argument("--city-dir", default=CITY_FILE_DIR)
+    parser.add_argument("--output-dir")
+    parser.add_argument("--json")
+    parser.add_argument("--user", default="")
+    parser.add_argument("--first-name", default="")
+    parser.add_argument("--last-name", default="")
+    args = parser.parse_args(argv)
+    try:
+        results = runBatch(args.files, args.algorithms, args.variants, args.time_limit, args.workers, args.seed, printResult,
+                           city_dir=args.city_dir, target_gap=args.target_gap, output_dir=args.output_dir, my_user_name=args.user, my_first_name=args.first_name,
+                           my_last_name=args.last_name)
+    except ValueError as error:
+        parser.error(str(error))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=1)
+    return 0 if all(result["valid"] for result in results if not result["error"]) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+"""
+Benchmark harness for the Alg*.py scripts over the city files.
+Every script in the scripts' directory whose alg_code is one of its codes_and_names is run, as it stands,
+on each city file for each seed. Each run is a separate Python process with its own scratch directory
+(next to ../city-files/, so the scripts find their input and their output files are thrown away), with
+random seeded from the seed, PYTHONHASHSEED set to it and TSP_TIME_LIMIT set to the time limit. Up to
+"workers" runs go at once.
+
+A run records the tour length (and whether the script's own check passed), wall time, the script process's
+peak resident set size, the largest peak among the worker processes it started (the GA's islands and
+tsp.multistart's searches do their work in pools, whose workers are reaped when the pool closes) and the
+solver's iterations per second: generations for the GAs and node expansions
+for A*, read from the script's tsp.driver.SolverRun. Results go to CSV and/or JSON. summarise() averages
+them per script and file; compared against a baseline summary saved by an earlier run, a script and file
+whose mean length, time or either peak memory got worse by more than the tolerance is reported as a regression.
+
+    python -m tsp.bench [--scripts AlgAenhanced ...] [--files AISearchfile012.txt ...] [--seeds 3] [--time-limit 10]
+                        [--workers 4] [--csv results.csv] [--json results.json] [--baseline baseline.json]
+                        [--save-baseline baseline.json] [--city-dir ../city-files/]
+
+The exit status is 1 if any regression was found.
+"""
+import os
+import ast
+import csv
+import sys
+import json
+import time
+import runpy
+import random
+import shutil
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from tsp.cityfile import CITY_FILE_DIR, benchmark_files
+
+SCRIPT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+fields = ["script", "alg_code", "algorithm", "file", "seed", "time_limit", "length", "valid", "seconds", "peak_rss_bytes",
+          "children_peak_rss_bytes", "iterations", "iterations_per_second", "error"]
+
+def _literal(tree, name):
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(isinstance(t, ast.Name) and t.id == name for t in node.targets):
+            try:
+                return ast.literal_eval(node.value)
+            except ValueError:
+                return None
+    return None
+
+def findScripts(directory=SCRIPT_DIR):
+    # (script name, alg_code, algorithm name) for each Alg*.py whose alg_code is in its own codes_and_names
+    scripts = []
+    for file_name in sorted(os.listdir(directory)):
+        if not (file_name.startswith("Alg") and file_name.endswith(".py")):
+            continue
+        with open(os.path.join(directory, file_name)) as f:
+            tree = ast.parse(f.read())
+        alg_code = _literal(tree, "alg_code")
+        codes_and_names = _literal(tree, "codes_and_names") or {}
+        if alg_code in codes_and_names:
+            scripts.append((file_name[:-3], alg_code, codes_and_names[alg_code]))
+    return scripts
+
+def _child(script_path, input_file, seed, result_path):
+    #Runs inside the benchmark's subprocess: run the script as if from the command line and note what it left behind
+    random.seed(seed)
+    sys.argv = [script_path, input_file]
+    startedAt = time.perf_counter()
+    namespace = runpy.run_path(script_path, run_name="__main__")
+    seconds = time.perf_counter() - startedAt
+    rss = childrenRss = None
+    if resource is not None:
+        #ru_maxrss is in kilobytes on Linux but bytes on macOS; for RUSAGE_CHILDREN it is the largest single worker, not a sum
+        scale = 1 if sys.platform == "darwin" else 1024
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+        childrenRss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+    run = namespace.get("run")
+    iterations = run.iterations if run is not None else None
+    result = {"length": namespace.get("tour_length"), "valid": namespace.get("flag") == "good", "seconds": seconds, "peak_rss_bytes": rss,
+              "children_peak_rss_bytes": childrenRss, "iterations": iterations, "iterations_per_second": iterations / seconds if iterations is not None and seconds > 0 else None}
+    with open(result_path, "w") as f:
+        json.dump(result, f)
+
+def runOne(script, input_file, seed, time_limit, directory=SCRIPT_DIR, city_dir=CITY_FILE_DIR):
+    # run one script on one city file in a fresh process; returns a result dict with the keys in "fields"
+    script_path = os.path.join(directory, script + ".py")
+    #The scripts read "../city-files/", so the scratch directory goes next to the city files' directory
+    scratch = tempfile.mkdtemp(prefix="bench-", dir=os.path.dirname(os.path.abspath(city_dir.rstrip("/\\"))))
+    result_path = os.path.join(scratch, "result.json")
+    env = dict(os.environ, TSP_TIME_LIMIT=str(time_limit), PYTHONHASHSEED=str(seed))
+    env["PYTHONPATH"] = directory + os.pathsep + env["PYTHONPATH"] if env.get("PYTHONPATH") else directory
+    result = {"script": script, "file": input_file, "seed": seed, "time_limit": time_limit, "error": ""}
+    try:
+        completed = subprocess.run([sys.executable, "-m", "tsp.bench", "--child", script_path, input_file, str(seed), result_path],
+                                   cwd=scratch, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if completed.returncode == 0 and os.path.exists(result_path):
+            with open(result_path) as f:
+                result.update(json.load(f))
+        else:
+            lines = completed.stderr.decode(errors="replace").strip().splitlines()
+            result["error"] = lines[-1] if lines else "exit status " + str(completed.returncode)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    return result
+
+def runBenchmark(scripts=None, file_names=benchmark_files, seeds=(0,), time_limit=10, workers=None, report=None, city_dir=CITY_FILE_DIR):
+    # run every script on every file for every seed; returns the results in that order
+    found = findScripts()
+    if scripts is not None:
+        found = [entry for entry in found if entry[0] in scripts]
+    jobs = [(entry, input_file, seed) for entry in found for input_file in file_names for seed in seeds]
+    def job(task):
+        (script, alg_code, algorithm), input_file, seed = task
+        result = runOne(script, input_file, seed, time_limit, city_dir=city_dir)
+        result["alg_code"] = alg_code
+        result["algorithm"] = algorithm
+        if report is not None:
+            report(result)
+        return result
+    #The runs are subprocesses, so threads are enough to keep "workers" of them going
+    with ThreadPoolExecutor(workers or os.cpu_count() or 1) as pool:
+        return list(pool.map(job, jobs))
+
+def writeCsv(results, path):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fields, extrasaction="ignore")
+        writer.writeheader()
+        for result in results:
+            writer.writerow(result)
+
+def writeJson(results, path):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=1)
+
+def _mean(values):
+    values = [v for v in values if v is not None]
+    return sum(values) / len(values) if values else None
+
+def summarise(results):
+    # mean length, seconds, peak RSS (the script's and its workers') and iterations per second of the valid runs, per "script/file"
+    groups = {}
+    for result in results:
+        groups.setdefault(result["script"] + "/" + result["file"], []).append(result)
+    summary = {}
+    for key, group in groups.items():
+        good = [r for r in group if r.get("valid") and not r["error"]]
+        summary[key] = {"runs": len(group), "failed": len(group) - len(good), "length": _mean([r["length"] for r in good]),
+                        "best_length": min([r["length"] for r in good], default=None), "seconds": _mean([r["seconds"] for r in good]),
+                        "peak_rss_bytes": _mean([r["peak_rss_bytes"] for r in good]),
+                        "children_peak_rss_bytes": _mean([r.get("children_peak_rss_bytes") for r in good]),
+                        "iterations_per_second": _mean([r["iterations_per_second"] for r in good])}
+    return summary
+
+def findRegressions(summary, baseline, length_tolerance=0.02, time_tolerance=0.25, memory_tolerance=0.25):
+    # a list of messages, one for each script/file that failed, or whose mean length, time or peak memory is worse
+    # than the baseline by more than the given fraction
+    regressions = []
+    for key, now in sorted(summary.items()):
+        before = baseline.get(key)
+        if before is None:
+            continue
+        if now["failed"] > before.get("failed", 0):
+            regressions.append(key + ": " + str(now["failed"]) + " of " + str(now["runs"]) + " runs failed")
+        for name, tolerance in (("length", length_tolerance), ("seconds", time_tolerance), ("peak_rss_bytes", memory_tolerance),
+                                ("children_peak_rss_bytes", memory_tolerance)):
+            if now.get(name) is not None and before.get(name) and now[name] > before[name] * (1 + tolerance):
+                regressions.append(key + ": " + name + " " + format(now[name], ".6g") + " against " + format(before[name], ".6g") +
+                                   " (+" + format(100 * (now[name] / before[name] - 1), ".1f") + "%)")
+    return regressions
+
+def printResult(result):
+    if result["error"]:
+        print(result["script"] + " " + result["file"] + " seed " + str(result["seed"]) + ": " + result["error"])
+    else:
+        print(result["script"] + " " + result["file"] + " seed " + str(result["seed"]) + ": length " + str(result["length"]) +
+              (" " if result["valid"] else " (INVALID) ") + format(result["seconds"], ".1f") + "s, " +
+              format((result["peak_rss_bytes"] or 0) / 2 ** 20, ".0f") + "MB" +
+              (", workers " + format(result["children_peak_rss_bytes"] / 2 ** 20, ".0f") + "MB" if result.get("children_peak_rss_bytes") else ""))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m tsp.bench", description="Benchmark the Alg*.py scripts over the city files")
+    parser.add_argument("--scripts", nargs="+", help="script names, e.g. AlgAenhanced (default: every script found)")
+    parser.add_argument("--files", nargs="+", default=benchmark_files)
+    parser.add_argument("--city-dir", default=CITY_FILE_DIR, help="the city files' directory, which must be called city-files")
+    parser.add_argument("--seeds", type=int, default=1, help="runs per script and file, seeded 0, 1, ...")
+    parser.add_argument("--time-limit", type=float, default=10)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--csv")
+    parser.add_argument("--json")
+    parser.add_argument("--baseline", help="summary JSON from --save-baseline to check for regressions against")
+    parser.add_argument("--save-baseline")
+    parser.add_argument("--length-tolerance", type=float, default=0.02)
+    parser.add_argument("--time-tolerance", type=float, default=0.25)
+    parser.add_argument("--memory-tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+    results = runBenchmark(args.scripts, args.files, range(args.seeds), args.time_limit, args.workers, printResult, args.city_dir)
+    if args.csv:
+        writeCsv(results, args.csv)
+    if args.json:
+        writeJson(results, args.json)
+    summary = summarise(results)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(summary, f, indent=1, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = findRegressions(summary, json.load(f), args.length_tolerance, args.time_tolerance, args.memory_tolerance)
+        for message in regressions:
+            print("REGRESSION " + message)
+        if regressions:
+            return 1
+        print("no regressions against " + args.baseline)
+    return 0
+
+if __name__ == "__main__":
+    if len(sys.argv) == 6 and sys.argv[1] == "--child":
+        _child(sys.argv[2], sys.argv[3], int(sys.argv[4]), sys.argv[5])
+    else:
+        sys.exit(main())
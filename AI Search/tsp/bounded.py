@@ -0,0 +1,339 @@
+"""
+Searches that keep to a memory budget, for the files where tsp.astar's fringe grows by a whole row of
+children per expansion and the search is cut off long before it reaches a goal. Both score children with
+the same heuristics as tsp.astar (through scoreChildren, so the incremental forms and a HeuristicCache
+apply) and take their budget as a node count and/or bytes, from the same per-node estimate.
+
+beamSearch goes one layer (one more city) at a time and keeps only the "width" best nodes of each layer.
+Every node of a layer has come the same number of steps, so a layer is ranked by the path so far plus the
+heuristic, whatever the heuristic, and of two nodes with the same city and visited set only the shorter
+is kept. A layer's nodes share their prefixes, so the search holds at most width x num_cities nodes, and a
+byte budget sets the width. Given a time limit the width is also re-worked out after every layer. A node
+at depth d has num_cities - 1 - d children to score, each costing about the cities it leaves for the
+heuristic, so the layers below cost the width times what one node's descendants would, at rates per
+node, child and city fitted to the layers so far. The width is the one that fits that into most of the
+time left, spread evenly over the layers below rather than narrowing early on when the layers are wide
+and widening at the bottom when they are cheap. The deadline is also checked while a node's children are
+scored, so a search that still runs out of time (when even one greedy descent takes longer) stops within
+a child.
+
+smaSearch is simplified memory-bounded A* (Russell's SMA*): A* ordered as in tsp.astar, but once more
+than "max_nodes" nodes are held it forgets the worst leaf on the fringe (the shallowest of the highest
+cost), remembering in its parent the cheapest cost it has forgotten below it. The parent goes back on
+the fringe at that cost, and if it comes up again it regenerates just the children it has forgotten. So
+memory never passes the budget by more than one expansion, and with room for at least one path and its
+children the search still ends on a whole tour; with an admissible heuristic (mst) the tour is optimal
+whenever the search reaches the goal.
+
+Both stop like astarSearch on the time limit or their "run", finishing the best node so far with greedyTour,
+and like it take a prebuilt NeighbourIndex as "ordered_nearests".
+searches names these and astarSearch for tsp.solvers. Running this module directly compares the three
+on the given city files with a byte budget:
+    python -m tsp.bounded [time_limit] [max_megabytes] [file ...]
+"""
+import sys
+import time
+import heapq
+import random
+import numpy as np
+
+from tsp.neighbours import NeighbourIndex
+from tsp.astar import (SearchNode, astarSearch, scoreChildren, unvisitedCities, greedyTour, greedyHeuristic, nodeBytes,
+                       pathHeuristics, heuristics)
+from tsp.cityfile import load_city_file, benchmark_files
+from tsp.problem import tourLength, randomMatrix
+
+#The memory budget when none is given
+DEFAULT_MAX_BYTES = 2 ** 28
+#The share of the time left that beamSearch plans the layers below to take
+BEAM_TIME_SHARE = 0.8
+
+def _finish(node, num_cities, distance_matrix, ordered_nearests):
+    # "node"'s partial tour finished off with greedyTour
+    panicTour = greedyTour(node.city, set(unvisitedCities(node.visited, num_cities)), distance_matrix, ordered_nearests)
+    return node.tour() + panicTour[1:]
+
+def _layerRates(layers):
+    # seconds per node expanded, per child scored and per city the children leave, fitted by least squares to "layers", rows of
+    # (nodes, children, cities, seconds); a rate that would come out negative is left out and the others fitted again
+    counts = np.array([layer[:3] for layer in layers], dtype=float)
+    seconds = np.array([layer[3] for layer in layers])
+    used = [0, 1, 2]
+    while used:
+        fitted = np.linalg.lstsq(counts[:, used], seconds, rcond=None)[0]
+        if (fitted >= 0).all():
+            rates = [0.0] * 3
+            for k, rate in zip(used, fitted):
+                rates[k] = float(rate)
+            return rates
+        del used[int(np.argmin(fitted))]
+    return [0.0] * 3
+
+def beamSearch(distance_matrix, heuristic=greedyHeuristic, start=None, width=None, time_limit=100, max_bytes=DEFAULT_MAX_BYTES,
+               heuristic_cache=None, incremental=True, run=None, report=None, ordered_nearests=None):
+    # return the tour found and a dict of search stats; "report", if given, is called with the stats after every layer.
+    # "width" (by default as wide as "max_bytes" allows; unlimited with neither) is the most nodes kept per layer
+    num_cities = len(distance_matrix)
+    orderedNearests = ordered_nearests if ordered_nearests is not None else NeighbourIndex(distance_matrix)
+    if start is None:
+        start = random.randrange(num_cities)
+    bytesPerNode = nodeBytes(num_cities)
+    maxWidth = width
+    if max_bytes is not None:
+        byteWidth = max(1, max_bytes // (bytesPerNode * num_cities))
+        maxWidth = byteWidth if maxWidth is None else min(maxWidth, byteWidth)
+    stats = {"expanded": 0, "generated": 1, "bytes_per_node": bytesPerNode, "max_width": maxWidth, "widths": [], "stopped": "goal",
+             "seconds": 0.0}
+    pathCost = heuristic in pathHeuristics
+    startTime = time.time()
+    if run is not None:
+        deadline = run.budget.deadline()
+    else:
+        deadline = startTime + time_limit if time_limit is not None else float("inf")
+    scoringDeadline = deadline if deadline != float("inf") else None
+    layer = [SearchNode(start, None, 0, 0, 1 << start)]
+    if run is not None:
+        greedy = _finish(layer[0], num_cities, distance_matrix, orderedNearests)
+        run.offer(greedy, tourLength(greedy, distance_matrix), 0)
+    layerWidth = maxWidth
+    #(nodes, children, cities, seconds) for every layer, timed from one width to the next so choosing the nodes is counted too
+    layerCosts = []
+    widthAt = startTime
+    for depth in range(1, num_cities):
+        stats["widths"].append(len(layer))
+        layerChildren = layerCities = 0
+        #Costs keyed by (city, visited): two paths through the same cities to the same city only need the shorter
+        candidates = {}
+        for node in layer:
+            stopped = None
+            if run is not None:
+                if run.tick(stats["expanded"]):
+                    stopped = run.stopped
+            elif time.time() >= deadline:
+                stopped = "deadline"
+            if stopped is None:
+                newNodes = unvisitedCities(node.visited, num_cities)
+                scored = scoreChildren(node, newNodes, newNodes, heuristic, distance_matrix, orderedNearests, start, heuristic_cache,
+                                       incremental, scoringDeadline)
+                if scored is None:
+                    stopped = "deadline"
+            if stopped is not None:
+                stats["stopped"] = stopped
+                stats["seconds"] = time.time() - startTime
+                tour = _finish(layer[0], num_cities, distance_matrix, orderedNearests)
+                if run is not None:
+                    run.stop(stopped)
+                    run.offer(tour, tourLength(tour, distance_matrix), stats["expanded"])
+                return tour, stats
+            stats["expanded"] += 1
+            layerChildren += len(newNodes)
+            layerCities += len(newNodes) * len(newNodes)
+            for child, mask, g, cost in scored:
+                #The path so far plus the heuristic, whether or not scoreChildren has added the path
+                rank = cost if pathCost else cost + node.g
+                key = (child, mask)
+                if key not in candidates or rank < candidates[key][0]:
+                    candidates[key] = (rank, g, node, child, mask)
+            stats["generated"] += len(newNodes)
+        if deadline != float("inf"):
+            #A layer's time goes on its nodes and their children, each child taking a fixed part plus a part for every city it
+            #leaves (the heuristic walks them). Each node chosen now has left = num_cities - 1 - depth children and its
+            #descendants one fewer a layer down, so one node costs left nodes, left (left + 1) / 2 children and the sum of k * k
+            #up to left cities to the bottom, and the beam is as wide as the time left pays for at the rates of the layers so
+            #far, less a share held back in case the layers below go slower than that
+            now = time.time()
+            layerCosts.append((len(layer), layerChildren, layerCities, now - widthAt))
+            widthAt = now
+            perNode, perChild, perCity = _layerRates(layerCosts)
+            left = num_cities - 1 - depth
+            nodeCost = perNode * left + perChild * left * (left + 1) / 2 + perCity * left * (left + 1) * (2 * left + 1) / 6
+            affordable = int(BEAM_TIME_SHARE * (deadline - now) / nodeCost) if nodeCost > 0 else len(candidates)
+            layerWidth = max(1, affordable if maxWidth is None else min(maxWidth, affordable))
+        if layerWidth is None:
+            chosen = sorted(candidates.values(), key=lambda candidate: candidate[0])
+        else:
+            chosen = heapq.nsmallest(layerWidth, candidates.values(), key=lambda candidate: candidate[0])
+        layer = [SearchNode(child, parent, depth, g, mask) for rank, g, parent, child, mask in chosen]
+        if report is not None:
+            report(stats)
+    #Every node of the last layer is a whole tour; keep the shortest once closed
+    best = min(layer, key=lambda node: node.g + distance_matrix[node.city][start])
+    tour = best.tour()
+    stats["seconds"] = time.time() - startTime
+    if run is not None:
+        run.offer(tour, tourLength(tour, distance_matrix), stats["expanded"])
+    return tour, stats
+
+class SMANode(SearchNode):
+    #"f" is the node's cost on the fringe, "forgotten" the cheapest cost forgotten among its children, "children" a bitmask of
+    #the children still held, "open" whether it is on the fringe and "key" the counter of its current fringe entries
+    __slots__ = ("f", "forgotten", "children", "open", "key")
+
+    def __init__(self, city, parent, depth, g, visited, f):
+        SearchNode.__init__(self, city, parent, depth, g, visited)
+        self.f = f
+        self.forgotten = float("inf")
+        self.children = 0
+        self.open = False
+        self.key = 0
+
+def smaNodeBytes(num_cities):
+    # rough size of one held node: the node, its bitmasks and an entry in each of the two fringe heaps
+    node = SMANode(0, None, 0, 0, (1 << num_cities) - 1, 0.0)
+    node.children = node.visited
+    return (sys.getsizeof(node) + sys.getsizeof(node.visited) + sys.getsizeof(node.children) + sys.getsizeof(node.f) +
+            2 * sys.getsizeof((0, 0, 0, node)))
+
+def smaSearch(distance_matrix, heuristic=greedyHeuristic, start=None, max_nodes=None, max_bytes=DEFAULT_MAX_BYTES, time_limit=100,
+              heuristic_cache=None, incremental=True, run=None, report=None, telemetry_interval=1000, ordered_nearests=None):
+    # return the tour found and a dict of search stats; "report", if given, is called with the stats every "telemetry_interval"
+    # expansions. At most "max_nodes" nodes (or "max_bytes" worth) are held, though never fewer than two per city
+    num_cities = len(distance_matrix)
+    orderedNearests = ordered_nearests if ordered_nearests is not None else NeighbourIndex(distance_matrix)
+    if start is None:
+        start = random.randrange(num_cities)
+    bytesPerNode = smaNodeBytes(num_cities)
+    if max_bytes is not None:
+        byteLimit = max_bytes // bytesPerNode
+        max_nodes = byteLimit if max_nodes is None else min(max_nodes, byteLimit)
+    if max_nodes is not None:
+        max_nodes = max(max_nodes, 2 * num_cities)
+    pathCost = heuristic in pathHeuristics
+    stats = {"expanded": 0, "generated": 1, "forgotten": 0, "max_nodes": max_nodes, "peak_nodes": 1, "bytes_per_node": bytesPerNode,
+             "stopped": "goal", "seconds": 0.0}
+    full = (1 << num_cities) - 1
+    #Nodes come off "fringe" cheapest and deepest first and off "worst" dearest and shallowest first. A node forgotten or
+    #expanded is left in the heaps and skipped when it comes up, until the heaps are rebuilt from the open nodes
+    fringe = []
+    worst = []
+    counter = 0
+    def push(node):
+        nonlocal counter
+        counter += 1
+        node.open = True
+        node.key = counter
+        heapq.heappush(fringe, (node.f, -node.depth, counter, node))
+        heapq.heappush(worst, (-node.f, node.depth, counter, node))
+    root = SMANode(start, None, 0, 0, 1 << start, 0)
+    push(root)
+    held = 1
+    startTime = time.time()
+    if run is not None:
+        deadline = run.budget.deadline()
+        greedy = _finish(root, num_cities, distance_matrix, orderedNearests)
+        run.offer(greedy, tourLength(greedy, distance_matrix), 0)
+    else:
+        deadline = startTime + time_limit if time_limit is not None else float("inf")
+    scoringDeadline = deadline if deadline != float("inf") else None
+    node = root
+    while fringe:
+        f, negativeDepth, key, node = heapq.heappop(fringe)
+        if not node.open or node.key != key:
+            continue
+        if node.visited == full:
+            break
+        stopped = None
+        if run is not None:
+            if run.tick(stats["expanded"]):
+                stopped = run.stopped
+        elif time.time() >= deadline:
+            stopped = "deadline"
+        if stopped is None:
+            unvisited = unvisitedCities(node.visited, num_cities)
+            #A node expanded again after its children were forgotten only needs the ones it no longer holds
+            children = [child for child in unvisited if not (node.children >> child) & 1]
+            scored = scoreChildren(node, children, unvisited, heuristic, distance_matrix, orderedNearests, start, heuristic_cache,
+                                   incremental, scoringDeadline)
+            if scored is None:
+                stopped = "deadline"
+        if stopped is not None:
+            stats["stopped"] = stopped
+            stats["seconds"] = time.time() - startTime
+            tour = _finish(node, num_cities, distance_matrix, orderedNearests)
+            if run is not None:
+                run.stop(stopped)
+                run.offer(tour, tourLength(tour, distance_matrix), stats["expanded"])
+            return tour, stats
+        node.open = False
+        stats["expanded"] += 1
+        for child, mask, g, cost in scored:
+            #Path costs never fall below the parent's (pathmax), so a forgotten cost stays a fair bound on what was below it
+            childNode = SMANode(child, node, node.depth + 1, g, mask, max(cost, node.f) if pathCost else cost)
+            node.children |= 1 << child
+            push(childNode)
+        node.forgotten = float("inf")
+        held += len(children)
+        stats["generated"] += len(children)
+        stats["peak_nodes"] = max(stats["peak_nodes"], held)
+        while max_nodes is not None and held > max_nodes:
+            negativeF, depth, key, leaf = heapq.heappop(worst)
+            #Only leaves are forgotten; a node waiting to regenerate children it still has some of is pushed again once it has none
+            if not leaf.open or leaf.key != key or leaf.parent is None or leaf.children:
+                continue
+            leaf.open = False
+            parent = leaf.parent
+            parent.children &= ~(1 << leaf.city)
+            parent.forgotten = min(parent.forgotten, leaf.f)
+            held -= 1
+            stats["forgotten"] += 1
+            parent.f = parent.forgotten
+            push(parent)
+        if len(fringe) + len(worst) > 4 * held + 8 * num_cities:
+            openNodes = [entry for entry in fringe if entry[3].open and entry[3].key == entry[2]]
+            fringe = openNodes
+            heapq.heapify(fringe)
+            worst = [(-f, -negativeDepth, key, openNode) for f, negativeDepth, key, openNode in openNodes]
+            heapq.heapify(worst)
+        if stats["expanded"] % telemetry_interval == 0 and report is not None:
+            report(stats)
+    stats["seconds"] = time.time() - startTime
+    tour = node.tour()
+    if run is not None:
+        run.offer(tour, tourLength(tour, distance_matrix), stats["expanded"])
+    return tour, stats
+
+searches = {"astar" : astarSearch,
+            "beam" : beamSearch,
+            "sma" : smaSearch}
+
+def getSearch(name):
+    if name not in searches:
+        raise ValueError("unknown search " + str(name) + ", expected one of " + ", ".join(searches))
+    return searches[name]
+
+def crossCheck(rounds=100, rng=random):
+    #SMA* with an admissible heuristic has to end on an optimal tour however little memory it has, and beam search on a valid one.
+    #SMA* gets a few paths' worth of memory: at the floor of one path it can thrash for minutes before it reaches a goal
+    from tsp.exact import heldKarp
+    failures = 0
+    for r in range(rounds):
+        num_cities = rng.randint(5, 10)
+        distance_matrix = randomMatrix(num_cities, rng)
+        tour, stats = smaSearch(distance_matrix, heuristics["mst"], start=rng.randrange(num_cities), max_nodes=rng.randint(3 * num_cities, 60))
+        if sorted(tour) != list(range(num_cities)) or tourLength(tour, distance_matrix) != heldKarp(distance_matrix)[0]:
+            failures += 1
+        tour, stats = beamSearch(distance_matrix, heuristics["greedy"], width=rng.randint(1, 5), time_limit=None)
+        if sorted(tour) != list(range(num_cities)):
+            failures += 1
+    return failures
+
+if __name__ == "__main__":
+    import tracemalloc
+    failures = crossCheck()
+    print("SMA* tours are optimal under any budget" if failures == 0 else str(failures) + " mismatches")
+    time_limit = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    max_bytes = int(float(sys.argv[2]) * 2 ** 20) if len(sys.argv) > 2 else 2 ** 25
+    for input_file in sys.argv[3:] or benchmark_files:
+        name_of_file, num_cities, distance_matrix, flag = load_city_file(input_file)
+        distance_matrix = distance_matrix.tolist()
+        for heuristic in ("greedy", "mst"):
+            for name, search in searches.items():
+                tracemalloc.start()
+                tour, stats = search(distance_matrix, heuristics[heuristic], start=0, time_limit=time_limit, max_bytes=max_bytes)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                if sorted(tour) != list(range(num_cities)):
+                    print(input_file + " " + name + ": INVALID TOUR")
+                print(input_file + " " + heuristic.ljust(6) + " " + name.ljust(5) + " length " +
+                      str(tourLength(tour, distance_matrix)).ljust(7) + " expanded " + str(stats["expanded"]).ljust(7) + " peak " + format(peak / 2 ** 20, ".1f").rjust(6) + "MB " +
+                      format(stats["seconds"], ".2f") + "s (" + stats["stopped"] + ")")
@@ -0,0 +1,194 @@
+"""
+Checkpoints of a running genetic algorithm, so a long run can be stopped and carried on later.
+Everything the next generation depends on is saved at the start of a generation: the population's
+tours and lengths, the best tour so far, the generation number (which fixes where the mutation rate's
+decay has got to) and the state of the random module, from which every random draw of the GA comes.
+A run resumed from a checkpoint therefore makes exactly the same generations as it would have without
+stopping. The run's settings are saved too, and resuming with different ones is refused.
+
+File layout: a fixed header (magic, version, number of cities, population size, generation, generations,
+best length, mutation rate, memetic count, replace_duplicates, Mersenne Twister position, whether a
+Gaussian is cached and its value, length of the SETTINGS field), the settings ("OX,swap"), then the 624
+word Mersenne Twister state as uint32, the population's tours (uint16, or uint32 past 65536 cities), their
+lengths as int64 and the best tour, all little-endian.
+
+The GA only takes copies of the arrays and the random state; a GACheckpointer turns them into a file on
+a background thread, written to a temporary file and renamed into place so a checkpoint is never half written.
+geneticTSP saves one more, without a thread, when it stops for any reason, so budgeted runs can be chained.
+
+Running this module directly checks that a resumed run matches an uninterrupted one:
+    python -m tsp.checkpoint
+"""
+import os
+import sys
+import time
+import struct
+import random
+import threading
+import numpy as np
+
+from tsp.individual import Individual, PopulationBuffer, tourDtype
+from tsp.cityfile import atomicWrite
+
+_MAGIC = b"TSPG"
+_VERSION = 1
+_HEADER = struct.Struct("<4sHIIIIqdI?I?dH")
+
+class CheckpointError(ValueError):
+    pass
+
+class GAState:
+    # a copy of the GA's state at the start of generation "generation"
+    __slots__ = ("tours", "lengths", "best_tour", "best_length", "generation", "generations", "mutation_rate", "crossover",
+                 "mutation", "memetic_count", "replace_duplicates", "random_state")
+
+    def __init__(self, tours, lengths, best_tour, best_length, generation, generations, mutation_rate, crossover, mutation,
+                 memetic_count, replace_duplicates, random_state):
+        self.tours = tours
+        self.lengths = lengths
+        self.best_tour = best_tour
+        self.best_length = best_length
+        self.generation = generation
+        self.generations = generations
+        self.mutation_rate = mutation_rate
+        self.crossover = crossover
+        self.mutation = mutation
+        self.memetic_count = memetic_count
+        self.replace_duplicates = replace_duplicates
+        self.random_state = random_state
+
+    def population(self):
+        # the population as a fresh PopulationBuffer and the best tour as an Individual
+        population = PopulationBuffer(len(self.lengths), self.tours.shape[1])
+        population.tours[:] = self.tours
+        population.lengths[:] = self.lengths
+        return population, Individual(self.best_tour.copy(), self.best_length)
+
+    def checkSettings(self, num_cities, population_size, generations, mutation_rate, crossover, mutation, memetic_count,
+                      replace_duplicates):
+        #Anything else would not carry on the same run
+        saved = (self.tours.shape[1], len(self.lengths), self.generations, self.mutation_rate, self.crossover, self.mutation,
+                 self.memetic_count, self.replace_duplicates)
+        given = (num_cities, population_size, generations, mutation_rate, crossover, mutation, memetic_count, replace_duplicates)
+        names = ("num_cities", "population_size", "generations", "mutation_rate", "crossover", "mutation", "memetic_count",
+                 "replace_duplicates")
+        for name, a, b in zip(names, saved, given):
+            if a != b:
+                raise CheckpointError("checkpoint was made with " + name + " = " + str(a) + ", not " + str(b))
+
+def captureState(population, best, generation, generations, mutation_rate, crossover, mutation, memetic_count=0,
+                 replace_duplicates=False):
+    # copy what the GA needs to carry on from generation "generation"; cheap enough to do inside the loop
+    return GAState(population.tours.copy(), population.lengths.copy(), best.tour.copy(), best.length, generation, generations,
+                   mutation_rate, crossover, mutation, memetic_count, replace_duplicates, random.getstate())
+
+def writeCheckpoint(path, state):
+    version, internal, gauss = state.random_state
+    settings = (state.crossover + "," + state.mutation).encode("ascii")
+    num_cities = state.tours.shape[1]
+    header = _HEADER.pack(_MAGIC, _VERSION, num_cities, len(state.lengths), state.generation, state.generations, state.best_length,
+                          state.mutation_rate, state.memetic_count, state.replace_duplicates, internal[-1], gauss is not None,
+                          gauss if gauss is not None else 0.0, len(settings))
+    dtype = np.dtype(tourDtype(num_cities)).newbyteorder("<")
+    #A crash never leaves half a checkpoint
+    with atomicWrite(path, "wb") as f:
+        f.write(header)
+        f.write(settings)
+        f.write(np.array(internal[:-1], dtype="<u4").tobytes())
+        f.write(np.ascontiguousarray(state.tours, dtype=dtype).tobytes())
+        f.write(np.ascontiguousarray(state.lengths, dtype="<i8").tobytes())
+        f.write(np.ascontiguousarray(state.best_tour, dtype=dtype).tobytes())
+
+def readCheckpoint(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < _HEADER.size:
+        raise CheckpointError(path + " is not a GA checkpoint")
+    (magic, version, num_cities, population_size, generation, generations, best_length, mutation_rate, memetic_count,
+     replace_duplicates, position, hasGauss, gauss, settingsLength) = _HEADER.unpack_from(data)
+    if magic != _MAGIC or version != _VERSION:
+        raise CheckpointError(path + " is not a version " + str(_VERSION) + " GA checkpoint")
+    offset = _HEADER.size
+    crossover, mutation = data[offset:offset + settingsLength].decode("ascii").split(",")
+    offset += settingsLength
+    dtype = np.dtype(tourDtype(num_cities)).newbyteorder("<")
+    sizes = ((np.dtype("<u4"), 624), (dtype, population_size * num_cities), (np.dtype("<i8"), population_size), (dtype, num_cities))
+    arrays = []
+    for arrayType, count in sizes:
+        if offset + arrayType.itemsize * count > len(data):
+            raise CheckpointError(path + " is truncated")
+        arrays.append(np.frombuffer(data, arrayType, count, offset))
+        offset += arrayType.itemsize * count
+    internal, tours, lengths, best_tour = arrays
+    random_state = (3, tuple(internal.tolist()) + (position,), gauss if hasGauss else None)
+    return GAState(tours.reshape(population_size, num_cities).astype(tourDtype(num_cities)), lengths.astype(np.int64),
+                   best_tour.astype(tourDtype(num_cities)), best_length, generation, generations, mutation_rate, crossover, mutation,
+                   memetic_count, replace_duplicates, random_state)
+
+class GACheckpointer:
+    # called by tsp.genetic.evolve at the start of each generation; saves a checkpoint to "path" every "interval"
+    # seconds and/or every "every" generations, on a background thread, skipping one if the last is still being written
+    def __init__(self, path, interval=60, every=None):
+        self.path = path
+        self.interval = interval
+        self.every = every
+        self.lastSaved = time.time()
+        self.thread = None
+        self.saved = 0
+        self.settings = None
+
+    def configure(self, generations, mutation_rate, crossover, mutation, memetic_count=0, replace_duplicates=False):
+        self.settings = (generations, mutation_rate, crossover, mutation, memetic_count, replace_duplicates)
+
+    def due(self, generation):
+        if self.every is not None and generation % self.every == 0:
+            return True
+        return self.interval is not None and time.time() - self.lastSaved >= self.interval
+
+    def __call__(self, population, best, generation):
+        if not self.due(generation) or (self.thread is not None and self.thread.is_alive()):
+            return
+        self.save(captureState(population, best, generation, *self.settings), wait=False)
+
+    def save(self, state, wait=True):
+        self.join()
+        self.lastSaved = time.time()
+        self.saved += 1
+        if wait:
+            writeCheckpoint(self.path, state)
+        else:
+            self.thread = threading.Thread(target=writeCheckpoint, args=(self.path, state))
+            self.thread.start()
+
+    def join(self):
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+def crossCheck(path, num_cities=40, generations=60, stop_at=25):
+    #Run a GA straight through, then again stopped after "stop_at" generations and resumed from its checkpoint
+    from tsp.genetic import geneticTSP
+    from tsp.driver import Budget, SolverRun
+    from tsp.problem import randomMatrix
+    distance_matrix = randomMatrix(num_cities, random.Random(1))
+    failures = 0
+    for crossover, mutation, memetic_count in (("OX", "swap", 0), ("ERX", "inversion", 1), ("PMX", "insertion", 0)):
+        straight = geneticTSP(distance_matrix, 30, .05, generations, crossover, mutation=mutation, memetic_count=memetic_count, seed=7)
+        geneticTSP(distance_matrix, 30, .05, generations, crossover, mutation=mutation, memetic_count=memetic_count, seed=7,
+                   checkpoint=GACheckpointer(path, every=10), run=SolverRun(Budget(None, stop_at)))
+        if readCheckpoint(path).generation != stop_at:
+            failures += 1
+        #The random module's state comes from the checkpoint, whatever it is beforehand
+        random.seed()
+        resumed = geneticTSP(distance_matrix, 30, .05, generations, crossover, mutation=mutation, memetic_count=memetic_count,
+                             resume=path)
+        if resumed != straight:
+            failures += 1
+            print("resumed run differs with " + crossover + "/" + mutation)
+    os.remove(path)
+    return failures
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "ga-checkpoint-check.bin"
+    failures = crossCheck(path)
+    print("resumed runs match uninterrupted ones" if failures == 0 else str(failures) + " mismatches")
@@ -0,0 +1,255 @@
+"""
+Loader for the city files in ../city-files/.
+The whole file is read in one go, filtered and tokenised in a single pass and turned straight into a
+symmetric NumPy int32 distance matrix. The checks and messages are the same as the original
+character-by-character parser, which is kept at the bottom of this file as the reference implementation.
+atomicWrite is how every file the package writes (cache entries, bounds, checkpoints, tours) is written.
+
+Running this module directly benchmarks both loaders against each other:
+    python -m tsp.cityfile AISearchfile535.txt
+"""
+import os
+import sys
+import time
+import contextlib
+import numpy as np
+
+CITY_FILE_DIR = "../city-files/"
+#The city files the benchmarks and self-checks run on by default
+benchmark_files = ["AISearchfile012.txt", "AISearchfile017.txt", "AISearchfile021.txt", "AISearchfile026.txt", "AISearchfile042.txt",
+                   "AISearchfile048.txt", "AISearchfile058.txt", "AISearchfile175.txt", "AISearchfile180.txt", "AISearchfile535.txt"]
+
+#Every byte outside ord 44 (",") to ord 122 ("z") is thrown away, exactly like read_file_into_string(input_file, 44, 122)
+_KEEP = bytes(range(44, 123))
+_DROP = bytes(b for b in range(256) if b not in _KEEP)
+#Distances only keep their digits (see stripped_string_to_int) so everything else but the separators can go too
+_DROP_NON_NUMERIC = bytes(b for b in range(256) if not (48 <= b <= 57 or b == 44))
+
+def _report(report, message):
+    if report is not None:
+        report(message)
+
+@contextlib.contextmanager
+def atomicWrite(path, mode="w"):
+    # open a private temporary file to write "path" through; it is renamed into place once the block finishes, so
+    # readers never see half a file, and removed if the block raises
+    temp_path = path + "." + str(os.getpid()) + ".tmp"
+    try:
+        with open(temp_path, mode) as f:
+            yield f
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+#Distances are converted a chunk of roughly this many bytes at a time so large files never hold every token at once
+_CHUNK = 1 << 22
+
+def _parse_distances(distances, needed):
+    # convert the comma separated digit strings in "distances" into the int32 array "values" of length "needed",
+    # returning None if there aren't enough of them; an empty string counts as 0 like stripped_string_to_int
+    values = np.empty(needed, dtype=np.int32)
+    filled = 0
+    start = 0
+    while filled < needed:
+        end = distances.find(b",", start + _CHUNK)
+        tokens = distances[start:end].split(b",") if end != -1 else distances[start:].split(b",")
+        take = min(len(tokens), needed - filled)
+        values[filled:filled + take] = [int(t) if t else 0 for t in tokens[:take]]
+        filled += take
+        if end == -1:
+            break
+        start = end + 1
+    if filled < needed:
+        return None
+    return values
+
+def parse_city_values(file_bytes, input_file="", report=None):
+    # take the raw bytes of a city file and return "name_of_file", "num_cities", the row-major upper triangle
+    # of the distance matrix as the int32 array "values" and a "flag" which is "good" unless something went wrong
+    file_string = file_bytes.translate(None, _DROP) + b","
+    name_of_file = ""
+    num_cities = 0
+    start = file_string.find(b"NAME=")
+    end = file_string.find(b",", start + 5) if start != -1 else -1
+    if end == -1:
+        _report(report, "***** ERROR: something went wrong when reading " + input_file + ".")
+        return name_of_file, num_cities, None, "*** error: NAME= doesn't appear"
+    name_of_file = file_string[start + 5:end].decode("ascii")
+    _report(report, "I have successfully read " + input_file + ".")
+    start = file_string.find(b"SIZE=", end + 1)
+    end = file_string.find(b",", start + 5) if start != -1 else -1
+    if end == -1:
+        _report(report, "***** ERROR: something went wrong when building the two-dimensional array of city distances.")
+        return name_of_file, num_cities, None, "*** error: SIZE= doesn't appear"
+    num_cities = int(b"0" + file_string[start + 5:end].translate(None, _DROP_NON_NUMERIC))
+    _report(report, "There are " + str(num_cities) + " cities.")
+    #Skip the comma after SIZE and drop the final comma that was added so every distance sits between two commas
+    distances = file_string[end + 1:-1].translate(None, _DROP_NON_NUMERIC)
+    values = _parse_distances(distances, num_cities * (num_cities - 1) // 2)
+    if values is None:
+        _report(report, "***** ERROR: something went wrong when building the two-dimensional array of city distances.")
+        return name_of_file, num_cities, None, "*** error: there aren't enough cities"
+    return name_of_file, num_cities, values, "good"
+
+def parse_city_string(file_bytes, input_file="", report=None):
+    # take the raw bytes of a city file and return "name_of_file", "num_cities", the symmetric
+    # int32 matrix "distance_matrix" and a "flag" which is "good" unless something went wrong
+    name_of_file, num_cities, values, flag = parse_city_values(file_bytes, input_file, report)
+    if flag != "good":
+        return name_of_file, num_cities, None, flag
+    distance_matrix = values_to_matrix(num_cities, values)
+    _report(report, "I have successfully built a symmetric two-dimensional array of city distances.")
+    return name_of_file, num_cities, distance_matrix, flag
+
+def values_to_matrix(num_cities, values):
+    # the symmetric int32 matrix whose upper triangle is "values", row-major as parse_city_values returns it
+    distance_matrix = np.zeros((num_cities, num_cities), dtype=np.int32)
+    offset = 0
+    for i in range(num_cities - 1):
+        row = values[offset:offset + num_cities - i - 1]
+        distance_matrix[i, i + 1:] = row
+        distance_matrix[i + 1:, i] = row
+        offset += num_cities - i - 1
+    return distance_matrix
+
+def load_city_file(input_file, directory=CITY_FILE_DIR, report=None):
+    # read the city file "input_file" from "directory" in bulk and parse it with parse_city_string;
+    # pass report=print to get the same progress messages the scripts always printed
+    with open(directory + input_file, "rb") as the_file:
+        file_bytes = the_file.read()
+    return parse_city_string(file_bytes, input_file, report)
+
+#######################################################################################################
+############ the original loader, kept as the reference the bulk loader is checked against ############
+#######################################################################################################
+
+def read_file_into_string(input_file, from_ord, to_ord):
+    # take a file "input_file", read it character by character, strip away all unwanted
+    # characters with ord < "from_ord" and ord > "to_ord" and return the concatenation
+    # of the file as the string "output_string"
+    the_file = open(input_file,'r')
+    current_char = the_file.read(1)
+    output_string = ""
+    while current_char != "":
+        if ord(current_char) >= from_ord and ord(current_char) <= to_ord:
+            output_string = output_string + current_char
+        current_char = the_file.read(1)
+    the_file.close()
+    return output_string
+
+def stripped_string_to_int(a_string):
+    # take a string "a_string" and strip away all non-numeric characters to obtain the string
+    # "stripped_string" which is then converted to an integer with this integer returned
+    a_string_length = len(a_string)
+    stripped_string = "0"
+    if a_string_length != 0:
+        for i in range(0,a_string_length):
+            if ord(a_string[i]) >= 48 and ord(a_string[i]) <= 57:
+                stripped_string = stripped_string + a_string[i]
+    resulting_int = int(stripped_string)
+    return resulting_int
+
+def get_string_between(from_string, to_string, a_string, from_index):
+    # look for the first occurrence of "from_string" in "a_string" starting at the index
+    # "from_index", and from the end of this occurrence of "from_string", look for the first
+    # occurrence of the string "to_string"; set "middle_string" to be the sub-string of "a_string"
+    # lying between these two occurrences and "to_index" to be the index immediately after the last
+    # character of the occurrence of "to_string" and return both "middle_string" and "to_index"
+    middle_string = ""
+    to_index = -1
+    start = a_string.find(from_string,from_index)
+    if start == -1:
+        flag = "*** error: " + from_string + " doesn't appear"
+    else:
+        start = start + len(from_string)
+        end = a_string.find(to_string,start)
+        if end == -1:
+            flag = "*** error: " + to_string + " doesn't appear"
+        else:
+            middle_string = a_string[start:end]
+            to_index = end + len(to_string)
+            flag = "good"
+    return middle_string,to_index,flag
+
+def string_to_array(a_string, from_index, num_cities, distance_matrix):
+    # convert the numbers separated by commas in the file-as-a-string "a_string", starting from index "from_index",
+    # which should point to the first comma before the first digit, into the rows of "distance_matrix"
+    if from_index >= len(a_string):
+        flag = "*** error: the input file doesn't have any city distances"
+    else:
+        row = 0
+        column = 1
+        row_of_distances = [0]
+        flag = "good"
+        while flag == "good":
+            middle_string, from_index, flag = get_string_between(",", ",", a_string, from_index)
+            from_index = from_index - 1
+            if flag != "good":
+                flag = "*** error: there aren't enough cities"
+            else:
+                distance = stripped_string_to_int(middle_string)
+                row_of_distances.append(distance)
+                column = column + 1
+                if column == num_cities:
+                    distance_matrix.append(row_of_distances)
+                    row = row + 1
+                    if row == num_cities - 1:
+                        flag = "finished"
+                        row_of_distances = [0]
+                        for i in range(0, num_cities - 1):
+                            row_of_distances.append(0)
+                        distance_matrix.append(row_of_distances)
+                    else:
+                        row_of_distances = [0]
+                        for i in range(0,row):
+                            row_of_distances.append(0)
+                        column = row + 1
+        if flag == "finished":
+            flag = "good"
+    return flag
+
+def make_distance_matrix_symmetric(num_cities, distance_matrix):
+    # make the upper triangular matrix "distance_matrix" symmetric
+    for i in range(1,num_cities):
+        for j in range(0,i):
+            distance_matrix[i][j] = distance_matrix[j][i]
+
+def legacy_load_city_file(input_file, directory=CITY_FILE_DIR):
+    # the original loading sequence from the scripts, returning the same values as load_city_file
+    file_string = read_file_into_string(directory + input_file, 44, 122) + ","
+    num_cities = 0
+    distance_matrix = []
+    name_of_file,to_index,flag = get_string_between("NAME=", ",", file_string, 0)
+    if flag == "good":
+        num_cities_string,to_index,flag = get_string_between("SIZE=", ",", file_string, to_index)
+        num_cities = stripped_string_to_int(num_cities_string)
+    if flag == "good":
+        flag = string_to_array(file_string, to_index - 1, num_cities, distance_matrix)
+    if flag == "good":
+        make_distance_matrix_symmetric(num_cities, distance_matrix)
+    return name_of_file, num_cities, distance_matrix, flag
+
+def benchmark(input_file, repeats=3, directory=CITY_FILE_DIR):
+    #Time both loaders on the same file, keeping the best of "repeats" runs, and check they agree
+    timings = {}
+    results = {}
+    for label, loader in (("legacy", legacy_load_city_file), ("bulk", load_city_file)):
+        best = None
+        for r in range(repeats):
+            startedAt = time.perf_counter()
+            results[label] = loader(input_file, directory=directory)
+            elapsed = time.perf_counter() - startedAt
+            if best is None or elapsed < best:
+                best = elapsed
+        timings[label] = best
+    legacy, bulk = results["legacy"], results["bulk"]
+    same = legacy[:2] == bulk[:2] and legacy[3] == bulk[3] and (bulk[2] is None or legacy[2] == bulk[2].tolist())
+    return timings, same
+
+if __name__ == "__main__":
+    for input_file in (sys.argv[1:] or ["AISearchfile535.txt"]):
+        timings, same = benchmark(input_file)
+        print(input_file + ": legacy " + format(timings["legacy"], ".4f") + "s, bulk " + format(timings["bulk"], ".4f")
+              + "s, speed-up x" + format(timings["legacy"] / timings["bulk"], ".1f") + (", matrices match" if same else ", MATRICES DIFFER"))
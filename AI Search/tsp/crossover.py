@@ -0,0 +1,182 @@
+"""
+Crossover operators for the genetic algorithm.
+Every operator takes two parent tours (lists of cities) and an optional random source and returns a new
+child list, so geneticTSP can pick one by name through getCrossover. They all run in O(n): membership
+is tracked in a bytearray indexed by city and positions in a list, never by searching a list.
+Given an "out" row (of a tsp.individual.PopulationBuffer, say) they take the parents as rows too and
+write the child into it instead; OX then runs in NumPy, and the others work on the parents as lists.
+
+    OX  - ordered crossover, the same child as the original breed() given the same random numbers
+    PMX - partially mapped crossover
+    ERX - edge recombination crossover
+    CX  - cycle crossover
+
+Running this module directly reports children per second for each operator:
+    python -m tsp.crossover 535
+"""
+import sys
+import time
+import random
+import numpy as np
+
+def _lists(a, b, out):
+    # the parents as lists for the operators that work on lists, when they come as rows to write "out" from
+    return (a.tolist(), b.tolist()) if out is not None else (a, b)
+
+def _written(child, out):
+    if out is None:
+        return child
+    out[:] = child
+    return out
+
+def orderedCrossover(a, b, rng=random, out=None):
+    #Copy a random slice of a, then fill up with the rest of b in b's order
+    seqA = rng.randrange(0, len(a))
+    seqB = rng.randrange(0, len(b))
+    start, end = min(seqA, seqB), max(seqA, seqB)
+    if out is not None:
+        taken = np.zeros(len(a), dtype=bool)
+        taken[a[start:end]] = True
+        out[:end - start] = a[start:end]
+        out[end - start:] = b[~taken[b]]
+        return out
+    crossoverPart1 = a[start:end]
+    taken = bytearray(len(a))
+    for city in crossoverPart1:
+        taken[city] = 1
+    return crossoverPart1 + [city for city in b if not taken[city]]
+
+def partiallyMappedCrossover(a, b, rng=random, out=None):
+    a, b = _lists(a, b, out)
+    num_cities = len(a)
+    start = rng.randrange(0, num_cities)
+    end = rng.randrange(0, num_cities)
+    if start > end:
+        start, end = end, start
+    positionInB = [0] * num_cities
+    for i, city in enumerate(b):
+        positionInB[city] = i
+    child = [-1] * num_cities
+    child[start:end] = a[start:end]
+    taken = bytearray(num_cities)
+    for city in child[start:end]:
+        taken[city] = 1
+    for i in range(start, end):
+        city = b[i]
+        if taken[city]:
+            continue
+        #Follow the mapping a[i] -> position of that city in b until it lands outside the copied slice
+        position = i
+        while start <= position < end:
+            position = positionInB[a[position]]
+        child[position] = city
+    for i in range(num_cities):
+        if child[i] == -1:
+            child[i] = b[i]
+    return _written(child, out)
+
+def edgeRecombinationCrossover(a, b, rng=random, out=None):
+    a, b = _lists(a, b, out)
+    num_cities = len(a)
+    #Neighbour lists hold each city's (at most four) distinct neighbours across both parents
+    neighbours = [None] * num_cities
+    for previous, city, following in zip(a[-1:] + a[:-1], a, a[1:] + a[:1]):
+        neighbours[city] = [previous, following] if previous != following else [previous]
+    for previous, city, following in zip(b[-1:] + b[:-1], b, b[1:] + b[:1]):
+        edges = neighbours[city]
+        if previous not in edges:
+            edges.append(previous)
+        if following not in edges:
+            edges.append(following)
+    #Unvisited cities are kept in a list with a position index so a random one can be removed in O(1)
+    unvisited = list(range(num_cities))
+    positions = list(range(num_cities))
+    current = a[0] if rng.random() < 0.5 else b[0]
+    child = [current]
+    for step in range(num_cities - 1):
+        last = unvisited.pop()
+        if last != current:
+            unvisited[positions[current]] = last
+            positions[last] = positions[current]
+        edges = neighbours[current]
+        for other in edges:
+            neighbours[other].remove(current)
+        if edges:
+            #Head for the neighbour with the fewest onward options, breaking ties at random
+            current = edges[0]
+            fewest = len(neighbours[current])
+            ties = 1
+            for other in edges[1:]:
+                remaining = len(neighbours[other])
+                if remaining < fewest:
+                    current, fewest, ties = other, remaining, 1
+                elif remaining == fewest:
+                    ties += 1
+                    if rng.randrange(ties) == 0:
+                        current = other
+        else:
+            current = unvisited[rng.randrange(len(unvisited))]
+        child.append(current)
+    return _written(child, out)
+
+def cycleCrossover(a, b, rng=random, out=None):
+    #Cycles of positions alternate between taking their cities from a and from b
+    a, b = _lists(a, b, out)
+    num_cities = len(a)
+    positionInA = [0] * num_cities
+    for i, city in enumerate(a):
+        positionInA[city] = i
+    child = [-1] * num_cities
+    fromA = True
+    for start in range(num_cities):
+        if child[start] != -1:
+            continue
+        i = start
+        while child[i] == -1:
+            child[i] = a[i] if fromA else b[i]
+            i = positionInA[b[i]]
+        fromA = not fromA
+    return _written(child, out)
+
+crossovers = {'OX' : orderedCrossover,
+              'PMX' : partiallyMappedCrossover,
+              'ERX' : edgeRecombinationCrossover,
+              'CX' : cycleCrossover}
+
+def getCrossover(name):
+    if name not in crossovers:
+        raise ValueError("unknown crossover " + str(name) + ", expected one of " + ", ".join(crossovers))
+    return crossovers[name]
+
+def breed(a, b):
+    #The original quadratic ordered crossover, only kept for the benchmark
+    crossoverPart1 = []
+    crossoverPart2 = []
+    seqA = int(random.randrange(0, len(a)))
+    seqB = int(random.randrange(0, len(b)))
+    for i in range(min(seqA, seqB), max(seqA, seqB)):
+        crossoverPart1.append(a[i])
+    for i in range(len(b)):
+        if b[i] not in crossoverPart1:
+            crossoverPart2.append(b[i])
+    return crossoverPart1 + crossoverPart2
+
+def benchmark(num_cities, seconds=1.0):
+    a = list(range(num_cities))
+    b = list(range(num_cities))
+    random.shuffle(a)
+    random.shuffle(b)
+    rates = {}
+    for name, operator in [('breed', breed)] + list(crossovers.items()):
+        children = 0
+        startedAt = time.perf_counter()
+        while time.perf_counter() - startedAt < seconds:
+            operator(a, b)
+            children += 1
+        rates[name] = children / (time.perf_counter() - startedAt)
+    return rates
+
+if __name__ == "__main__":
+    num_cities = int(sys.argv[1]) if len(sys.argv) > 1 else 535
+    for name, rate in benchmark(num_cities).items():
+        print(name + ": " + format(rate, ".0f") + " children/s at n=" + str(num_cities))
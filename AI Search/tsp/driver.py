@@ -0,0 +1,195 @@
+"""
+Anytime running of the solvers: budgets, progress reports and the best tour so far.
+geneticTSP and astarSearch each used to carry their own 100 second cut-off and only had an answer once
+they returned. A SolverRun is handed to either of them instead: its Budget (seconds and/or iterations,
+a generation for the GA and an expansion for A*) decides when they stop, they offer it every tour that
+beats the best so far, and every "interval" seconds it calls its progress hooks with the run. A hook
+that returns True stops the run early, as does reaching "target_length" or calling stop(), so a caller
+can end a run once the tour is good enough. Given a lower bound on every tour's length (tsp.lowerbound)
+through setLowerBound, a run with a "target_gap" also stops ("target") as soon as its best tour is within
+that fraction of the bound, which for most instances the solvers reach long before their time runs out.
+A hook can also have improved(run) and stopped(run) methods, which are called as soon as the best tour
+improves and as soon as the run stops rather than at the next report.
+
+TourFileWriter is a hook that keeps the best tour so far in a file in the scripts' output format,
+written to a temporary file and renamed into place, so a run that gets killed still leaves a whole,
+valid tour behind. It writes each better tour as it is offered, at most once every "min_interval"
+seconds, and whatever is still unwritten at every report and when the run stops.
+
+Running this module directly runs the GA and A* on a city file under a SolverRun that prints progress:
+    python -m tsp.driver [file] [seconds]
+"""
+import sys
+import time
+
+from tsp.problem import writeTourFile
+from tsp.lowerbound import gap
+
+class Budget:
+    # a wall-clock limit in seconds and/or a limit on iterations; None means no limit of that kind
+    def __init__(self, time_limit=None, max_iterations=None):
+        self.time_limit = time_limit
+        self.max_iterations = max_iterations
+        self.reserved = 0.0
+        self.start()
+
+    def start(self):
+        self.startedAt = time.time()
+
+    def elapsed(self):
+        return time.time() - self.startedAt
+
+    def deadline(self):
+        # the time.time() at which the budget runs out, less any time reserved for a later stage
+        return self.startedAt + self.time_limit - self.reserved if self.time_limit is not None else float("inf")
+
+    def reserve(self, seconds):
+        # hold "seconds" back from the end of the time limit, so the deadline comes that much sooner until release().
+        # Without a time limit nothing is held back; tsp.solvers.reservePolish decides what such a budget gets
+        self.reserved = min(max(seconds, 0.0), self.time_limit) if self.time_limit is not None else 0.0
+
+    def release(self):
+        # hand the reserved time back; returns the seconds now remaining
+        self.reserved = 0.0
+        return self.remaining()
+
+    def remaining(self):
+        return max(0.0, self.deadline() - time.time())
+
+    def exhausted(self, iterations=0, now=None):
+        # the reason the budget has run out ("deadline" or "iterations"), or None
+        if self.max_iterations is not None and iterations >= self.max_iterations:
+            return "iterations"
+        if self.time_limit is not None and (time.time() if now is None else now) >= self.deadline():
+            return "deadline"
+        return None
+
+class SolverRun:
+    def __init__(self, budget=None, hooks=(), interval=1.0, target_length=None, target_gap=None):
+        self.budget = budget if budget is not None else Budget()
+        self.hooks = list(hooks)
+        self.interval = interval
+        self.target_length = target_length
+        self.target_gap = target_gap
+        self.lower_bound = None
+        self.best_tour = None
+        self.best_length = None
+        self.iterations = 0
+        self.improvements = 0
+        #(seconds, iteration, length) for every improvement
+        self.history = []
+        self.stopped = None
+        self.nextReport = self.budget.startedAt + interval
+
+    def offer(self, tour, length, iteration=None):
+        # record "tour" if it beats the best so far; returns True if it did
+        if self.best_length is not None and length >= self.best_length:
+            return False
+        self.best_tour = list(tour)
+        self.best_length = length
+        self.improvements += 1
+        self.history.append((self.budget.elapsed(), self.iterations if iteration is None else iteration, length))
+        for hook in self.hooks:
+            if hasattr(hook, "improved"):
+                hook.improved(self)
+        if self.target_length is not None and length <= self.target_length:
+            self.stop("target")
+        return True
+
+    def setLowerBound(self, lower_bound):
+        # with a "target_gap", set the target length to the longest tour within that gap of "lower_bound"; None (no bound,
+        # as tsp.lowerbound.lowerBound gives for a packed matrix) leaves the run without one
+        self.lower_bound = lower_bound
+        if self.target_gap is not None and lower_bound is not None:
+            within = int(lower_bound * (1 + self.target_gap))
+            self.target_length = within if self.target_length is None else max(self.target_length, within)
+            if self.best_length is not None and self.best_length <= self.target_length:
+                self.stop("target")
+
+    def stop(self, reason="stopped"):
+        if self.stopped is None:
+            self.stopped = reason
+            for hook in self.hooks:
+                if hasattr(hook, "stopped"):
+                    hook.stopped(self)
+
+    def tick(self, iteration):
+        # called by a solver once per iteration; reports progress when it is due and returns True once the run should stop
+        self.iterations = iteration
+        now = time.time()
+        if now >= self.nextReport:
+            self.nextReport = now + self.interval
+            self.report()
+        if self.stopped is None:
+            reason = self.budget.exhausted(iteration, now)
+            if reason is not None:
+                self.stop(reason)
+        return self.stopped is not None
+
+    def report(self):
+        for hook in self.hooks:
+            if hook(self):
+                self.stop("hook")
+
+    def finish(self):
+        # a last progress report once the solver has returned; returns the run's stats
+        self.stop("finished")
+        self.report()
+        return self.stats()
+
+    def stats(self):
+        stats = {"best_length": self.best_length, "iterations": self.iterations, "improvements": self.improvements,
+                 "seconds": self.budget.elapsed(), "stopped": self.stopped}
+        if self.lower_bound is not None:
+            stats["lower_bound"] = self.lower_bound
+            stats["gap"] = gap(self.best_length, self.lower_bound) if self.best_length is not None else None
+        return stats
+
+def printProgress(run):
+    #A progress hook for the scripts
+    if run.best_length is not None:
+        print("After " + format(run.budget.elapsed(), ".1f") + "s and " + str(run.iterations) + " iterations the best tour has length " +
+              str(run.best_length))
+
+class TourFileWriter:
+    # a progress hook that rewrites "output_file_name" with the run's best tour whenever it improves
+    def __init__(self, output_file_name, my_user_name, my_first_name, my_last_name, alg_code, name_of_file, added_note="",
+                 min_interval=1.0):
+        self.output_file_name = output_file_name
+        self.header = (my_user_name, my_first_name, my_last_name, alg_code, name_of_file, added_note)
+        self.min_interval = min_interval
+        self.written = None
+        self.writtenAt = float("-inf")
+
+    def write(self, run):
+        # write the best tour if it has changed since the last write
+        if run.best_length is not None and run.improvements != self.written:
+            writeTourFile(self.output_file_name, run.best_tour, run.best_length, *self.header)
+            self.written = run.improvements
+            self.writtenAt = time.time()
+
+    def improved(self, run):
+        #Runs of improvements in quick succession are written at most every "min_interval" seconds; the rest wait for the next report
+        if time.time() - self.writtenAt >= self.min_interval:
+            self.write(run)
+
+    def stopped(self, run):
+        self.write(run)
+
+    def __call__(self, run):
+        self.write(run)
+
+if __name__ == "__main__":
+    from tsp.cityfile import load_city_file
+    from tsp.genetic import geneticTSP
+    from tsp.astar import astarSearch, mstHeuristic
+    input_file = sys.argv[1] if len(sys.argv) > 1 else "AISearchfile175.txt"
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+    name_of_file, num_cities, distance_matrix, flag = load_city_file(input_file)
+    distance_matrix = distance_matrix.tolist()
+    for label, solve in (("GA", lambda run: geneticTSP(distance_matrix, 100, .01, 10000, run=run)),
+                         ("A*", lambda run: astarSearch(distance_matrix, mstHeuristic, start=0, run=run))):
+        run = SolverRun(Budget(seconds), [printProgress], seconds / 5)
+        solve(run)
+        stats = run.finish()
+        print(label + ": " + str(stats["best_length"]) + " after " + str(stats["improvements"]) + " improvements (" + stats["stopped"] + ")")
@@ -0,0 +1,306 @@
+"""
+Exact solvers for the small city files, so they get a proven optimal tour in far less time than the
+heuristic searches spend on them.
+
+heldKarp is the dynamic programme over subsets: best[S][j] is the shortest path from city 0 through the
+cities in S ending at j, worked out a whole layer of subsets of one size at a time with NumPy. It takes
+O(2^n n^2) time and a 2^(n-1) x (n-1) table of int32 (80MB at 21 cities), and past about 18 cities
+branch-and-bound is quicker, so it is only used up to "held_karp_up_to" cities.
+
+branchAndBound handles bigger files with Held and Karp's 1-tree bound (see tsp.lowerbound). A node of
+the search forces some edges into the tour and forbids others. It is split at a city of degree 3 or more
+in its best 1-tree (Volgenant and Jonker): forbid one of its tree edges, or force that edge and forbid
+another, or force both and forbid the rest. Nodes go best bound first, start from their parent's
+penalties, and are dropped once their bound reaches the best tour so far, which starts as a
+tsp.kopt.postOptimize tour and improves whenever a 1-tree turns out to be a tour.
+
+exactTSP picks between the two by size. Running this module directly checks both against brute force on
+small random instances and times them on the given city files (012 to 058 by default):
+    python -m tsp.exact [file ...]
+"""
+import sys
+import time
+import heapq
+import random
+import itertools
+import numpy as np
+
+from tsp.kopt import postOptimize
+from tsp.lowerbound import oneTree, _matrix
+from tsp.problem import tourLength, randomMatrix
+from tsp.distances import scalarMatrix
+
+HELD_KARP_UP_TO = 18
+
+def heldKarp(distance_matrix):
+    # an optimal tour and its length, starting from city 0
+    d = _matrix(distance_matrix)
+    n = len(d)
+    if n <= 3:
+        tour = list(range(n))
+        return tourLength(tour, scalarMatrix(d)), tour
+    #City j + 1 is bit j of a subset; city 0 is where every path starts
+    m = n - 1
+    size = 1 << m
+    dtype = np.int32 if int(d.max()) * n < 2 ** 30 else np.int64
+    infinity = np.iinfo(dtype).max // 2
+    best = np.full((size, m), infinity, dtype=dtype)
+    cities = np.arange(m)
+    best[1 << cities, cities] = d[0, 1:]
+    popcount = np.zeros(size, dtype=np.int8)
+    for bit in range(m):
+        popcount[1 << bit:2 << bit] = popcount[:1 << bit] + 1
+    order = np.argsort(popcount, kind="stable")
+    starts = np.searchsorted(popcount[order], np.arange(m + 2))
+    inner = d[1:, 1:].astype(dtype)
+    for count in range(2, m + 1):
+        subsets = order[starts[count]:starts[count + 1]]
+        for j in range(m):
+            ending = subsets[(subsets >> j) & 1 == 1]
+            #Paths ending at j come from paths over the same subset without j, ending anywhere else
+            best[ending, j] = (best[ending ^ (1 << j)] + inner[:, j]).min(axis=1)
+    full = size - 1
+    closed = best[full] + d[1:, 0]
+    j = int(np.argmin(closed))
+    length = int(closed[j])
+    tour = [j + 1]
+    subset = full
+    while subset != 1 << j:
+        previous = subset ^ (1 << j)
+        j, subset = int(np.argmin(best[previous] + inner[:, j])), previous
+        tour.append(j + 1)
+    tour.append(0)
+    tour.reverse()
+    return length, tour
+
+class _Node:
+    __slots__ = ("forced", "forbidden", "pi", "bound", "degrees", "edges")
+
+    def __init__(self, forced, forbidden, pi):
+        self.forced = forced
+        self.forbidden = forbidden
+        self.pi = pi
+        self.bound = None
+        self.degrees = None
+        self.edges = None
+
+def _propagate(forced, forbidden):
+    # forbid edges that could only close a short cycle or give a city a third forced edge; False if the node is infeasible
+    n = len(forced)
+    counts = forced.sum(axis=1)
+    if counts.max() > 2:
+        return False
+    for v in np.nonzero(counts == 2)[0]:
+        forbidden[v, ~forced[v]] = True
+        forbidden[~forced[v], v] = True
+    seen = np.zeros(n, dtype=bool)
+    for start in np.nonzero(counts == 1)[0]:
+        if seen[start]:
+            continue
+        #Walk the forced path from one end to the other
+        previous, v, length = -1, int(start), 1
+        seen[v] = True
+        while True:
+            following = [int(u) for u in np.nonzero(forced[v])[0] if u != previous]
+            if not following:
+                break
+            previous, v = v, following[0]
+            seen[v] = True
+            length += 1
+        if length < n:
+            forbidden[start, v] = forbidden[v, start] = True
+    #Any city with forced edges not on a path from a degree 1 city is on a forced cycle
+    onCycle = (counts > 0) & ~seen
+    if onCycle.any() and (onCycle.sum() < n or (counts[onCycle] != 2).any()):
+        return False
+    np.fill_diagonal(forbidden, True)
+    return True
+
+class BranchAndBound:
+    def __init__(self, distance_matrix, upper_length=None, upper_tour=None, root_iterations=300, node_iterations=40):
+        self.d = _matrix(distance_matrix)
+        self.costs = self.d.astype(np.float64)
+        self.rows = scalarMatrix(self.d)
+        self.n = len(self.d)
+        self.upper_length = upper_length
+        self.upper_tour = upper_tour
+        self.root_iterations = root_iterations
+        self.node_iterations = node_iterations
+        #Forced edges are made this much cheaper so every 1-tree takes them
+        self.bonus = float(self.d.max()) * self.n + 1.0
+        self.stats = {"nodes": 0, "pruned": 0, "one_trees": 0, "root_bound": None}
+
+    def _evaluate(self, node, iterations, step):
+        # raise node.bound by subgradient steps on node.pi; records the best 1-tree, or returns a tour if one comes up
+        n = self.n
+        forcedCount = int(node.forced.sum()) // 2
+        pi = node.pi.copy()
+        best = -np.inf
+        stale = 0
+        for k in range(iterations):
+            costs = self.costs + pi[:, None] + pi[None, :]
+            costs[node.forbidden] = np.inf
+            costs[node.forced] -= self.bonus
+            weight, degrees, edges = oneTree(costs)
+            self.stats["one_trees"] += 1
+            if not np.isfinite(weight) or sum(1 for u, v in edges if node.forced[u, v]) != forcedCount:
+                node.bound = np.inf
+                return None
+            bound = weight + self.bonus * forcedCount - 2 * pi.sum()
+            if bound > best + 1e-9:
+                best = bound
+                node.pi, node.degrees, node.edges = pi.copy(), degrees, edges
+                stale = 0
+            else:
+                stale += 1
+                if stale >= 10:
+                    step /= 2
+                    stale = 0
+            if self.upper_length is not None and best > self.upper_length - 1 + 1e-6:
+                break
+            gradient = degrees - 2
+            if not gradient.any():
+                tour = self._tour(edges)
+                node.bound = best
+                return tour
+            target = self.upper_length if self.upper_length is not None else bound * 1.05
+            pi = pi + step * max(target - bound, 1.0) / float(gradient @ gradient) * gradient
+        node.bound = best
+        return None
+
+    def _tour(self, edges):
+        adjacency = [[] for i in range(self.n)]
+        for u, v in edges:
+            adjacency[u].append(v)
+            adjacency[v].append(u)
+        tour = [0]
+        previous = -1
+        while len(tour) < self.n:
+            v = tour[-1]
+            following = adjacency[v][0] if adjacency[v][0] != previous else adjacency[v][1]
+            previous = v
+            tour.append(following)
+        return tour
+
+    def _offer(self, tour):
+        length = tourLength(tour, self.rows)
+        if self.upper_length is None or length < self.upper_length:
+            self.upper_length, self.upper_tour = length, tour
+            return True
+        return False
+
+    def _children(self, node):
+        # the Volgenant-Jonker split at the city with the highest degree in the node's best 1-tree
+        v = int(np.argmax(node.degrees))
+        free = [u for a, b in node.edges for u in ((b,) if a == v else (a,) if b == v else ()) if not node.forced[v, u]]
+        free.sort(key=lambda u: -self.d[v, u])
+        children = []
+        def child(force, forbid):
+            forced = node.forced.copy()
+            forbidden = node.forbidden.copy()
+            for u in force:
+                forced[v, u] = forced[u, v] = True
+            for u in forbid:
+                forbidden[v, u] = forbidden[u, v] = True
+            if _propagate(forced, forbidden):
+                children.append(_Node(forced, forbidden, node.pi))
+        child((), free[:1])
+        if int(node.forced[v].sum()) == 0 and len(free) >= 2:
+            child(free[:1], free[1:2])
+            child(free[:2], ())
+        else:
+            child(free[:1], ())
+        return children
+
+    def solve(self, run=None):
+        # returns (length, tour, proven): "proven" is False if "run" stopped the search first
+        n = self.n
+        self._offer(self.upper_tour if self.upper_tour is not None else list(range(n)))
+        forbidden = np.zeros((n, n), dtype=bool)
+        np.fill_diagonal(forbidden, True)
+        root = _Node(np.zeros((n, n), dtype=bool), forbidden, np.zeros(n))
+        tour = self._evaluate(root, self.root_iterations, 2.0)
+        self.stats["root_bound"] = float(root.bound)
+        if tour is not None:
+            self._offer(tour)
+        counter = itertools.count()
+        fringe = [(root.bound, next(counter), root)]
+        while fringe:
+            bound, c, node = heapq.heappop(fringe)
+            if bound > self.upper_length - 1 + 1e-6:
+                #Lengths are whole numbers, so a bound above upper_length - 1 can't lead to anything shorter
+                self.stats["pruned"] += 1 + len(fringe)
+                fringe = []
+                break
+            if run is not None and run.tick(self.stats["nodes"]):
+                return self.upper_length, self.upper_tour, False
+            self.stats["nodes"] += 1
+            for child in self._children(node):
+                tour = self._evaluate(child, self.node_iterations, 0.5)
+                if tour is not None:
+                    if self._offer(tour) and run is not None:
+                        run.offer(tour, self.upper_length, self.stats["nodes"])
+                elif child.bound <= self.upper_length - 1 + 1e-6:
+                    heapq.heappush(fringe, (child.bound, next(counter), child))
+                else:
+                    self.stats["pruned"] += 1
+        return self.upper_length, self.upper_tour, True
+
+def branchAndBound(distance_matrix, run=None, upper_time=None):
+    # (length, tour, proven) by branch-and-bound from a postOptimize tour found in "upper_time" seconds
+    n = len(distance_matrix)
+    if upper_time is None:
+        upper_time = min(1.0, n / 50)
+    tour, length, polish_stats = postOptimize(list(range(n)), distance_matrix, upper_time)
+    if run is not None:
+        run.offer(tour, length, 0)
+    search = BranchAndBound(distance_matrix, length, tour)
+    length, tour, proven = search.solve(run)
+    return length, tour, proven
+
+def exactTSP(distance_matrix, run=None, held_karp_up_to=HELD_KARP_UP_TO):
+    # (length, tour, proven): Held-Karp up to "held_karp_up_to" cities, branch-and-bound past that
+    if len(distance_matrix) <= held_karp_up_to:
+        length, tour = heldKarp(distance_matrix)
+        if run is not None:
+            run.offer(tour, length, 0)
+        return length, tour, True
+    return branchAndBound(distance_matrix, run)
+
+def bruteForce(distance_matrix):
+    d = scalarMatrix(_matrix(distance_matrix))
+    n = len(d)
+    return min(tourLength((0,) + order, d) for order in itertools.permutations(range(1, n)))
+
+def crossCheck(rounds=40, rng=random):
+    failures = 0
+    for r in range(rounds):
+        num_cities = rng.randint(4, 9)
+        distance_matrix = randomMatrix(num_cities, rng)
+        optimum = bruteForce(distance_matrix)
+        length, tour = heldKarp(distance_matrix)
+        if length != optimum or sorted(tour) != list(range(num_cities)) or tourLength(tour, distance_matrix) != length:
+            failures += 1
+        length, tour, proven = BranchAndBound(distance_matrix).solve()
+        if length != optimum or not proven or sorted(tour) != list(range(num_cities)):
+            failures += 1
+    for r in range(rounds // 4):
+        #Branch-and-bound against Held-Karp where brute force would take too long
+        distance_matrix = randomMatrix(rng.randint(12, 16), rng)
+        if branchAndBound(distance_matrix, upper_time=0.01)[0] != heldKarp(distance_matrix)[0]:
+            failures += 1
+    return failures
+
+exact_files = ["AISearchfile012.txt", "AISearchfile017.txt", "AISearchfile021.txt", "AISearchfile026.txt", "AISearchfile042.txt",
+               "AISearchfile048.txt", "AISearchfile058.txt"]
+
+if __name__ == "__main__":
+    from tsp.problem import loadMatrix
+    failures = crossCheck()
+    print("exact solvers agree with brute force" if failures == 0 else str(failures) + " mismatches")
+    for input_file in sys.argv[1:] or exact_files:
+        name_of_file, num_cities, distance_matrix, flag = loadMatrix(input_file)
+        startedAt = time.perf_counter()
+        length, tour, proven = exactTSP(distance_matrix)
+        print(input_file + ": " + str(length) + (" (optimal)" if proven else " (not proven)") + " in " +
+              format(time.perf_counter() - startedAt, ".2f") + "s")
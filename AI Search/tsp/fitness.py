@@ -0,0 +1,82 @@
+"""
+Whole-population tour length evaluation for the genetic algorithm.
+A population is a 2-D integer array with one tour per row (population_size x num_cities); every tour
+length is worked out with a single gather of the edge distances and a row sum, instead of summing each
+tour's edges one at a time with tsp.problem.tourLength.
+
+Running this module directly compares it with the tourLength loop the GA scripts used:
+    python -m tsp.fitness AISearchfile175.txt AISearchfile535.txt
+"""
+import sys
+import time
+import random
+import numpy as np
+
+from tsp.distances import PackedDistances
+from tsp.problem import tourLength
+
+class PopulationEvaluator:
+    def __init__(self, distance_matrix):
+        #Lists are converted once here rather than on every call
+        if isinstance(distance_matrix, PackedDistances):
+            self.lookup = distance_matrix.gather
+        else:
+            matrix = np.asarray(distance_matrix, dtype=np.int32)
+            self.lookup = lambda rows, columns: matrix[rows, columns]
+        self.evaluations = 0
+
+    def tourLengths(self, population):
+        # return the length of every tour (row) of "population" as an int64 array
+        population = np.asarray(population)
+        if population.ndim == 1:
+            population = population.reshape(1, -1)
+        following = np.roll(population, -1, axis=1)
+        self.evaluations += population.shape[0]
+        return self.lookup(population, following).sum(axis=1, dtype=np.int64)
+
+    def evaluate(self, population):
+        # return the tour lengths of "population" and the row index of the shortest tour
+        lengths = self.tourLengths(population)
+        return lengths, int(np.argmin(lengths))
+
+    def ratePopulation(self, population):
+        # drop-in for the scripts' ratePopulation: (distance, tour) pairs plus the summed 1 / distance fitness
+        lengths = self.tourLengths(population)
+        ratedPopulation = list(zip(lengths.tolist(), population))
+        populationFitness = float(np.sum(1 / lengths))
+        return (ratedPopulation, populationFitness)
+
+def benchmark(distance_matrix, population_size, seconds=2.0):
+    #Rate the same random population over and over with both approaches and report generations per second
+    num_cities = len(distance_matrix)
+    matrixLists = np.asarray(distance_matrix).tolist()
+    population = []
+    for i in range(population_size):
+        tour = list(range(num_cities))
+        random.shuffle(tour)
+        population.append(tour)
+    populationArray = np.array(population)
+    evaluator = PopulationEvaluator(distance_matrix)
+    rates = {}
+    for label, rate in (("tourLength loop", lambda: [tourLength(t, matrixLists) for t in population]),
+                        ("vectorised lists", lambda: evaluator.ratePopulation(population)),
+                        ("vectorised array", lambda: evaluator.evaluate(populationArray))):
+        generations = 0
+        startedAt = time.perf_counter()
+        while time.perf_counter() - startedAt < seconds:
+            rate()
+            generations += 1
+        rates[label] = generations / (time.perf_counter() - startedAt)
+    return rates
+
+if __name__ == "__main__":
+    from tsp.cityfile import load_city_file
+    for input_file in (sys.argv[1:] or ["AISearchfile175.txt", "AISearchfile535.txt"]):
+        name_of_file, num_cities, distance_matrix, flag = load_city_file(input_file)
+        if flag != "good":
+            print(input_file + ": " + flag)
+            continue
+        for population_size in (100, 1000):
+            rates = benchmark(distance_matrix, population_size)
+            print(input_file + ", population " + str(population_size) + ": "
+                  + ", ".join(label + " " + format(rate, ".1f") + " gen/s" for label, rate in rates.items()))
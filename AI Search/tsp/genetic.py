@@ -0,0 +1,148 @@
+"""
+The enhanced genetic algorithm from AlgAenhanced.py: tournament selection, crossover and mutation
+picked by name, elitism (the best tour so far is carried into every generation) and a mutation rate
+that decays towards the end of the run.
+It lives here so other code (the island model in tsp.islands) can run the same generations.
+
+A generation is a tsp.individual.PopulationBuffer. Two of them are allocated at the start and swapped
+every generation, the children being written over the older one, and the best tour so far is kept as an
+Individual with its length.
+"""
+import math
+import time
+import random
+
+from tsp.fitness import PopulationEvaluator
+from tsp.distances import scalarMatrix
+from tsp.crossover import getCrossover
+from tsp.selection import tournamentSelect
+from tsp.mutation import getMutation
+from tsp.individual import PopulationBuffer
+from tsp.fitnesscache import duplicateRows
+from tsp.localsearch import LocalSearch, memeticStep
+from tsp.checkpoint import captureState, readCheckpoint
+
+def genRandomTour(distance_matrix):
+    tour = list(range(len(distance_matrix)))
+    random.shuffle(tour)
+    return tour
+
+def genRandomPopulation(size, distance_matrix, evaluator):
+    # return a PopulationBuffer of "size" random tours and a copy of the best one as an Individual
+    population = PopulationBuffer(size, len(distance_matrix))
+    for k in range(size):
+        population.tours[k] = genRandomTour(distance_matrix)
+    #Every tour in the generation is scored at once by tsp.fitness instead of one tourLength call at a time
+    population.lengths[:] = evaluator.tourLengths(population.tours)
+    return population, population.individual(population.bestIndex()).copy()
+
+#All the tournaments for a generation are run in one batched draw, see tsp.selection
+def breedPopulation(population, spare, count, tournament_size, breed):
+    # breed "count" children straight into the first rows of "spare", the parents being rows of "population"
+    parents = tournamentSelect(population.lengths, 2 * count, tournament_size)
+    tours = population.tours
+    for i in range(count):
+        breed(tours[parents[2 * i]], tours[parents[2 * i + 1]], out=spare.tours[i])
+
+def mutatePopulation(children, lengths, mutation_rate, distance_matrix, mutate):
+    #"children" are the rows of the generation's buffer, mutated where they are
+    for k in range(len(children)):
+        lengths[k] = mutate(children[k], lengths[k], mutation_rate, distance_matrix)[1]
+
+#Children are scored once, straight after crossover; mutation then carries each length through its own
+#changes (see tsp.mutation) and the elite keeps the length it already has, so no tour is summed twice.
+#With a FitnessCache (tsp.fitnesscache) children that repeat a tour it holds skip scoring, and the generation's
+#tours are stored in it as they finally stand, with the lengths mutation has carried.
+#"replace_duplicates" swaps repeated tours in the new generation (never the elite) for fresh random ones
+#Given a LocalSearch (tsp.localsearch), the "memetic_count" shortest children are also taken to a local optimum
+def createNextGeneration(population, spare, mutation_rate, best, breed, evaluator, distance_matrix, mutate,
+                         fitness_cache=None, replace_duplicates=False, local_search=None, memetic_count=0):
+    # breed "population" into "spare" and return (new population, new spare, best Individual so far)
+    count = len(population) - 1
+    breedPopulation(population, spare, count, 20, breed)
+    children = spare.tours[:count]
+    if fitness_cache is None:
+        lengths = evaluator.tourLengths(children).tolist()
+    else:
+        lengths = fitness_cache.tourLengths(children, evaluator)
+    mutatePopulation(children, lengths, mutation_rate, distance_matrix, mutate)
+    if local_search is not None and memetic_count > 0:
+        memeticStep(local_search, children, lengths, memetic_count)
+    spare.lengths[:count] = lengths
+    if fitness_cache is not None:
+        fitness_cache.remember(children, lengths)
+    spare.store(count, best.tour, best.length)
+    if replace_duplicates:
+        duplicates = [k for k in duplicateRows(spare.tours) if k != count]
+        if duplicates:
+            for k in duplicates:
+                spare.tours[k] = genRandomTour(distance_matrix)
+            spare.lengths[duplicates] = evaluator.tourLengths(spare.tours[duplicates])
+    k = spare.bestIndex()
+    if spare.lengths[k] < best.length:
+        best = spare.individual(k).copy()
+    return spare, population, best
+
+def evolve(population, spare, best, first_generation, last_generation, generations, mutation_rate, breed, evaluator, deadline,
+           distance_matrix, mutate, fitness_cache=None, replace_duplicates=False, local_search=None, memetic_count=0, run=None,
+           checkpoint=None):
+    # run generations "first_generation" up to (not including) "last_generation" of a "generations" long run,
+    # stopping early at the time.time() "deadline" or when the tsp.driver.SolverRun "run" says so;
+    # returns the population, spare buffer, best and next generation number.
+    #"checkpoint" (a tsp.checkpoint.GACheckpointer) is called at the start of every generation
+    if spare is None:
+        spare = PopulationBuffer(len(population), population.tours.shape[1])
+    if run is not None:
+        run.offer(best.tolist(), best.length, first_generation)
+    i = first_generation
+    while i < last_generation:
+        if (run is not None and run.tick(i)) or time.time() >= deadline:
+            break
+        if checkpoint is not None:
+            checkpoint(population, best, i)
+        mutationFactor = math.exp(-3*(math.pow(i / generations, 6)))
+        previous = best
+        population, spare, best = createNextGeneration(population, spare, mutation_rate * mutationFactor, best, breed, evaluator,
+                                                       distance_matrix, mutate, fitness_cache, replace_duplicates, local_search,
+                                                       memetic_count)
+        i += 1
+        if run is not None and best is not previous:
+            run.offer(best.tolist(), best.length, i)
+    return population, spare, best, i
+
+#Crossovers are picked by name from tsp.crossover: OX (ordered), PMX, ERX (edge recombination) or CX (cycle)
+#and mutations from tsp.mutation: swap, inversion or insertion; pass a FitnessCache to memoise tour lengths,
+#and a "memetic_count" to locally optimise that many of the shortest children every generation.
+#A tsp.driver.SolverRun "run" replaces "time_limit" with its own budget and is offered every new best tour.
+#Given a "seed" the random module is seeded with it first. A tsp.checkpoint.GACheckpointer "checkpoint" saves
+#the run as it goes and once more when it stops; "resume", the path of such a checkpoint, carries that run on
+#instead of starting a new one (the other arguments must match the ones it was started with)
+def geneticTSP(distance_matrix, population_size, mutation_rate, generations, crossover="OX", time_limit=100, mutation="swap",
+               fitness_cache=None, replace_duplicates=False, memetic_count=0, run=None, seed=None, checkpoint=None, resume=None):
+    # return the best (distance, tour) found, the tour as a list
+    breed = getCrossover(crossover)
+    mutate = getMutation(mutation)
+    evaluator = PopulationEvaluator(distance_matrix)
+    distance_matrix = scalarMatrix(distance_matrix)
+    local_search = LocalSearch(distance_matrix) if memetic_count > 0 else None
+    settings = (generations, mutation_rate, crossover, mutation, memetic_count, replace_duplicates)
+    if seed is not None:
+        random.seed(seed)
+    if resume is not None:
+        state = readCheckpoint(resume)
+        state.checkSettings(len(distance_matrix), population_size, *settings)
+        population, best = state.population()
+        random.setstate(state.random_state)
+        first = state.generation
+    else:
+        population, best = genRandomPopulation(population_size, distance_matrix, evaluator)
+        first = 0
+    if checkpoint is not None:
+        checkpoint.configure(*settings)
+    deadline = run.budget.deadline() if run is not None else time.time() + time_limit
+    population, spare, best, i = evolve(population, None, best, first, generations, generations, mutation_rate, breed, evaluator,
+                                        deadline, distance_matrix, mutate, fitness_cache, replace_duplicates,
+                                        local_search, memetic_count, run, checkpoint)
+    if checkpoint is not None:
+        checkpoint.save(captureState(population, best, i, *settings))
+    return (best.length, best.tolist())
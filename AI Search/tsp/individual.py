@@ -0,0 +1,91 @@
+"""
+Compact storage for GA tours.
+A tour is a row of unsigned 16 bit city numbers (32 bit past 65536 cities), so a 535 city tour takes about
+1KB rather than the 4KB+ of a list of ints, and a whole generation lives in one 2-D array:
+
+    Individual       - one tour with its cached length and hash (__slots__, no per-object dict)
+    PopulationBuffer - a generation: "tours" (size x num_cities) and "lengths" arrays, allocated once
+
+The GA keeps two PopulationBuffers and swaps them every generation, writing the children into the
+spare one, so the population is never reallocated during a run.
+"""
+import numpy as np
+
+def tourDtype(num_cities):
+    return np.uint16 if num_cities <= 65536 else np.uint32
+
+class Individual:
+    __slots__ = ("tour", "length", "_hash")
+
+    def __init__(self, tour, length=None):
+        self.tour = tour
+        self.length = length
+        self._hash = None
+
+    @classmethod
+    def fromTour(cls, tour, length=None):
+        return cls(np.array(tour, dtype=tourDtype(len(tour))), length)
+
+    def copy(self):
+        # a standalone copy, e.g. to keep a tour that is a view into a buffer about to be overwritten
+        other = Individual(self.tour.copy(), self.length)
+        other._hash = self._hash
+        return other
+
+    def changed(self, length=None):
+        #Call after editing the tour in place so the cached hash is recomputed
+        self.length = length
+        self._hash = None
+
+    def tolist(self):
+        return self.tour.tolist()
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = hash(self.tour.tobytes())
+        return self._hash
+
+    def __eq__(self, other):
+        return isinstance(other, Individual) and np.array_equal(self.tour, other.tour)
+
+    def __lt__(self, other):
+        return self.length < other.length
+
+    #Individuals still unpack and index like the old (distance, tour) tuples
+    def __getitem__(self, i):
+        return (self.length, self.tour)[i]
+
+    def __iter__(self):
+        return iter((self.length, self.tour))
+
+    def __repr__(self):
+        return "Individual(" + str(self.length) + ", " + str(self.tour.tolist()) + ")"
+
+class PopulationBuffer:
+    __slots__ = ("tours", "lengths")
+
+    def __init__(self, size, num_cities):
+        self.tours = np.zeros((size, num_cities), dtype=tourDtype(num_cities))
+        self.lengths = np.zeros(size, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def individual(self, k):
+        # the k-th member as an Individual whose tour is a view into this buffer
+        return Individual(self.tours[k], int(self.lengths[k]))
+
+    def bestIndex(self):
+        return int(np.argmin(self.lengths))
+
+    def store(self, k, tour, length):
+        self.tours[k] = tour
+        self.lengths[k] = length
+
+    def storeAll(self, tours, lengths, start=0):
+        self.tours[start:start + len(tours)] = tours
+        self.lengths[start:start + len(tours)] = lengths
+
+    @property
+    def nbytes(self):
+        return self.tours.nbytes + self.lengths.nbytes
@@ -0,0 +1,163 @@
+"""
+Island model for the genetic algorithm: several populations evolve side by side in a process pool, each
+running the same generations as tsp.genetic, and every "migration_interval" generations each island
+sends copies of its best tours to its neighbours, where they replace the worst tours.
+
+Topologies:
+    ring            - island i sends to island i + 1
+    fully-connected - every island sends to every other island
+    random          - every island sends to one other island picked at random each migration
+
+The distance matrix is published once in shared memory (tsp.sharedmatrix) and each worker attaches it
+when the pool starts, so it is never pickled and never part of a task. Only the populations travel
+between migrations.
+
+A pool doesn't keep an island on the same worker from one interval to the next, so a FitnessCache (given a
+"fitness_cache_size") belongs to the worker, not the island: every worker keeps one for all the islands
+it runs, which is sound as a tour's length doesn't depend on the island. Each interval sends back the
+hits and misses of the island's own lookups, and the parent adds them up per island.
+"""
+import time
+import random
+import multiprocessing
+import numpy as np
+
+from tsp import genetic
+from tsp.fitness import PopulationEvaluator
+from tsp.fitnesscache import FitnessCache
+from tsp.crossover import getCrossover
+from tsp.mutation import getMutation
+from tsp.sharedmatrix import publishMatrix, matrixFrom
+
+_worker = {}
+
+def poolContext():
+    #Forked workers inherit the matrix and never re-run the calling script's top level, which matters
+    #because the Alg*.py scripts do all their work at import time
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context()
+
+def _initWorker(handle, fitness_cache_size=0):
+    #Both the mutations' lookups and the evaluator read the shared block in place
+    distance_matrix = matrixFrom(handle)
+    _worker["distance_matrix"] = distance_matrix
+    _worker["evaluator"] = PopulationEvaluator(distance_matrix)
+    _worker["fitness_cache"] = FitnessCache(fitness_cache_size) if fitness_cache_size > 0 else None
+
+def _evolveIsland(task):
+    (island, population, best, population_size, first, last, generations, mutation_rate, crossover, mutation, deadline, seed,
+     replace_duplicates) = task
+    startedAt = time.time()
+    random.seed(seed)
+    evaluator = _worker["evaluator"]
+    fitness_cache = _worker["fitness_cache"]
+    lookups = (fitness_cache.hits, fitness_cache.misses) if fitness_cache is not None else (0, 0)
+    if population is None:
+        population, best = genetic.genRandomPopulation(population_size, _worker["distance_matrix"], evaluator)
+    #The spare buffer stays behind in the worker; only the live generation is sent back
+    population, spare, best, reached = genetic.evolve(population, _worker.get("spare"), best, first, last, generations, mutation_rate,
+                                                      getCrossover(crossover), evaluator, deadline, _worker["distance_matrix"],
+                                                      getMutation(mutation), fitness_cache, replace_duplicates)
+    _worker["spare"] = spare
+    if fitness_cache is not None:
+        lookups = (fitness_cache.hits - lookups[0], fitness_cache.misses - lookups[1])
+    return island, population, best, reached, time.time() - startedAt, lookups
+
+def migrationTargets(topology, islands, rng):
+    # return, for every island, the list of islands it sends its emigrants to
+    if islands < 2:
+        return [[] for i in range(islands)]
+    if topology == "ring":
+        return [[(i + 1) % islands] for i in range(islands)]
+    if topology == "fully-connected":
+        return [[j for j in range(islands) if j != i] for i in range(islands)]
+    if topology == "random":
+        return [[(i + rng.randrange(1, islands)) % islands] for i in range(islands)]
+    raise ValueError("unknown topology " + str(topology) + ", expected ring, fully-connected or random")
+
+def migrate(populations, bests, targets, migrants):
+    # copy the "migrants" best tours of every island over the worst tours of the islands in "targets";
+    # emigrants are all picked before anyone arrives so the order of the islands doesn't matter
+    emigrants = []
+    for population in populations:
+        chosen = np.argsort(population.lengths, kind="stable")[:migrants]
+        emigrants.append((population.tours[chosen].copy(), population.lengths[chosen].copy()))
+    arrivals = [[] for i in range(len(populations))]
+    for source, destinations in enumerate(targets):
+        for destination in destinations:
+            arrivals[destination].append(emigrants[source])
+    received = []
+    for island, incoming in enumerate(arrivals):
+        population = populations[island]
+        if not incoming:
+            received.append(0)
+            continue
+        tours = np.concatenate([t for t, l in incoming])
+        lengths = np.concatenate([l for t, l in incoming])
+        #Always leave at least one native so an island can never be completely overwritten
+        order = np.argsort(lengths, kind="stable")[:max(len(population) - 1, 0)]
+        worst = np.argsort(population.lengths, kind="stable")[::-1][:len(order)]
+        population.tours[worst] = tours[order]
+        population.lengths[worst] = lengths[order]
+        if len(order) and lengths[order[0]] < bests[island].length:
+            bests[island] = population.individual(int(worst[0])).copy()
+        received.append(len(order))
+    return received
+
+def islandTSP(distance_matrix, population_size, mutation_rate, generations, islands=4, migration_interval=50,
+              migrants=2, topology="ring", crossover="OX", time_limit=100, processes=None, seed=None, mutation="swap", run=None,
+              fitness_cache_size=0, replace_duplicates=False):
+    # run the island model and return the global best (distance, tour) plus a list of per-island stats.
+    #With a "fitness_cache_size" every worker memoises tour lengths in a FitnessCache of that size, and every island's stats
+    #count the "cache_hits" and "cache_misses" of its lookups; "replace_duplicates" is as for tsp.genetic.geneticTSP
+    #A tsp.driver.SolverRun "run" replaces "time_limit" with its own budget and hears about the best tour after every migration
+    #interval (the islands themselves run in other processes)
+    rng = random.Random(seed if seed is not None else random.getrandbits(64))
+    getCrossover(crossover)
+    getMutation(mutation)
+    deadline = run.budget.deadline() if run is not None else time.time() + time_limit
+    populations = [None] * islands
+    bests = [None] * islands
+    stats = [{"island": i, "best_length": None, "generations": 0, "immigrants": 0, "seconds": 0.0, "cache_hits": 0, "cache_misses": 0}
+             for i in range(islands)]
+    generation = 0
+    with publishMatrix(distance_matrix) as handle, poolContext().Pool(processes or islands, initializer=_initWorker,
+                                                                       initargs=(handle, fitness_cache_size)) as pool:
+        while generation < generations and time.time() < deadline:
+            last = min(generation + migration_interval, generations)
+            tasks = [(i, populations[i], bests[i], population_size, generation, last, generations, mutation_rate,
+                      crossover, mutation, deadline, rng.getrandbits(64), replace_duplicates) for i in range(islands)]
+            reached = generations
+            for island, population, best, islandReached, seconds, (hits, misses) in pool.imap_unordered(_evolveIsland, tasks):
+                stats[island]["cache_hits"] += hits
+                stats[island]["cache_misses"] += misses
+                populations[island] = population
+                bests[island] = best
+                stats[island]["generations"] = islandReached
+                stats[island]["seconds"] += seconds
+                reached = min(reached, islandReached)
+            generation = reached
+            if run is not None:
+                leader = min(bests, key=lambda best: best.length)
+                run.offer(leader.tolist(), leader.length, generation)
+                if run.tick(generation):
+                    break
+            if generation < last:
+                break
+            if generation < generations:
+                received = migrate(populations, bests, migrationTargets(topology, islands, rng), migrants)
+                for island in range(islands):
+                    stats[island]["immigrants"] += received[island]
+    best = None
+    for island in range(islands):
+        if bests[island] is not None:
+            stats[island]["best_length"] = bests[island].length
+            if best is None or bests[island].length < best.length:
+                best = bests[island]
+    if best is None:
+        #The deadline passed before any interval ran, so the best of a random population is all there is
+        population, best = genetic.genRandomPopulation(population_size, distance_matrix, PopulationEvaluator(distance_matrix))
+        if run is not None:
+            run.offer(best.tolist(), best.length, 0)
+    return (best.length, best.tolist()), stats
@@ -0,0 +1,176 @@
+"""
+Lin-Kernighan style improvement of finished tours.
+LinKernighan is a tsp.localsearch.LocalSearch that, when no 2-opt, Or-opt or 2h-opt move helps a city,
+also tries a chain of up to "max_depth" 2-opt flips from it: break the edge (t1, t2), join t2 to a near
+city t3, break t3's edge to t4 and close back to t1, then carry on from t4 while the running gain
+(edges taken out less edges put in, not counting the closing edge) stays positive. Each step only looks
+at t2's nearest cities, best d(t3, t4) - d(t2, t3) first, backtracking over a few of them at the first
+two steps. Edges put in are never taken out again in the same chain. The chain is cut back to its best
+closed tour, so gains are known exactly at every step without summing the tour.
+
+postOptimize runs it on any algorithm's tour within a time budget and then spends what is left of the
+budget on kicks: a double-bridge move over a short stretch of the tour, followed by local search from
+the kicked cities only, kept if the tour got shorter. It reports how much shorter the tour got per second.
+
+Running this module directly compares the local search with and without the LK moves and the kicks:
+    python -m tsp.kopt [num_cities] [seconds]
+"""
+import sys
+import time
+import random
+
+from tsp.localsearch import LocalSearch
+from tsp.problem import tourLength, randomMatrix
+
+def _edge(a, b):
+    return (a, b) if a < b else (b, a)
+
+class LinKernighan(LocalSearch):
+    def __init__(self, distance_matrix, neighbours=None, k=8, moves=("2opt", "oropt", "2hopt", "lk"), max_depth=6, breadth=(5, 3)):
+        LocalSearch.__init__(self, distance_matrix, neighbours, k, moves)
+        self.max_depth = max_depth
+        self.breadth = breadth
+        self.stats["lk"] = 0
+
+    def _improveCity(self, a):
+        touched, delta = LocalSearch._improveCity(self, a)
+        if touched is None and "lk" in self.moves:
+            touched, delta = self._lkMove(a)
+        return touched, delta
+
+    def _lkMove(self, t1):
+        for t2 in (self._next(t1), self._prev(t1)):
+            self.best = (0, 0)
+            flips = []
+            self._lkStep(t1, t2, self.distance_matrix[t1][t2], 0, 0, flips, set(), {_edge(t1, t2)})
+            delta, keep = self.best
+            while len(flips) > keep:
+                #Undo the flips made past the best tour in the chain
+                self._move(*flips.pop())
+            if delta < 0:
+                self.stats["lk"] += 1
+                touched = {t1}
+                for a, c, b, d in flips:
+                    touched.update((a, b, c, d))
+                return touched, delta
+        return None, 0
+
+    def _lkStep(self, t1, t2, gain, depth, delta, flips, added, removed):
+        # one step of the chain from the tour edge (t1, t2); returns True once the chain has found a shorter tour
+        d = self.distance_matrix
+        forwards = self._next(t1) == t2
+        options = []
+        for t3 in self._candidates(t2):
+            dt2t3 = d[t2][t3]
+            if dt2t3 >= gain:
+                break
+            if t3 == t1 or t3 == t2 or not self.inTour[t3] or _edge(t2, t3) in removed:
+                continue
+            t4 = self._prev(t3) if forwards else self._next(t3)
+            if t4 == t2 or _edge(t3, t4) in added:
+                continue
+            options.append((d[t3][t4] - dt2t3, t3, t4))
+        options.sort(reverse=True)
+        breadth = self.breadth[depth] if depth < len(self.breadth) else 1
+        for value, t3, t4 in options[:breadth]:
+            flipDelta = d[t2][t3] + d[t4][t1] - d[t1][t2] - d[t3][t4]
+            self._move(t2, t1, t3, t4)
+            #Stored so that _move(*flip) puts the two edges back
+            flips.append((t2, t3, t1, t4))
+            added.add(_edge(t2, t3))
+            removed.add(_edge(t3, t4))
+            newDelta = delta + flipDelta
+            if newDelta < self.best[0]:
+                self.best = (newDelta, len(flips))
+            if depth + 1 < self.max_depth:
+                self._lkStep(t1, t4, gain - d[t2][t3] + d[t3][t4], depth + 1, newDelta, flips, added, removed)
+            if self.best[0] < 0:
+                return True
+            self._move(*flips.pop())
+            added.discard(_edge(t2, t3))
+            removed.discard(_edge(t3, t4))
+        return False
+
+def doubleBridge(tour, distance_matrix, rng=random, span=50):
+    # rotate "tour" to a random city and swap two short neighbouring stretches after it (a double-bridge move),
+    # in place; returns the change in length and the cities at the ends of the changed edges
+    n = len(tour)
+    start = rng.randrange(n)
+    tour[:] = tour[start:] + tour[:start]
+    span = max(1, min(span, (n - 2) // 3))
+    p1 = rng.randint(1, span)
+    p2 = p1 + rng.randint(1, span)
+    p3 = p2 + rng.randint(1, span)
+    ends = (tour[p1 - 1], tour[p1], tour[p2 - 1], tour[p2], tour[p3 - 1], tour[p3 % n])
+    a, b, c, e, f, g = ends
+    d = distance_matrix
+    delta = d[a][e] + d[f][b] + d[c][g] - d[a][b] - d[c][e] - d[f][g]
+    tour[p1:p3] = tour[p2:p3] + tour[p1:p2]
+    return delta, ends
+
+def postOptimize(tour, distance_matrix, time_limit=10, report=None, rng=random, local_search=None, target_length=None):
+    # improve a copy of "tour" for up to "time_limit" seconds, or until it is no longer than "target_length"; returns the
+    # new tour, its length and a dict of stats
+    startedAt = time.time()
+    deadline = startedAt + time_limit
+    if local_search is None:
+        local_search = LinKernighan(distance_matrix)
+    distance_matrix = local_search.distance_matrix
+    tour = list(tour)
+    startLength = tourLength(tour, distance_matrix)
+    tour, gain = local_search.improve(tour, time_limit)
+    length = startLength + gain
+    localOptimum = length
+    kicks = 0
+    kept = 0
+    if len(tour) >= 8:
+        while time.time() < deadline and (target_length is None or length > target_length):
+            saved = tour[:]
+            kickDelta, ends = doubleBridge(tour, distance_matrix, rng)
+            tour, gain = local_search.improve(tour, deadline - time.time(), ends)
+            kicks += 1
+            if kickDelta + gain < 0:
+                length += kickDelta + gain
+                kept += 1
+            else:
+                tour[:] = saved
+    seconds = time.time() - startedAt
+    stats = {"start_length": startLength, "local_optimum": localOptimum, "length": length, "seconds": seconds, "kicks": kicks,
+             "kicks_kept": kept, "improvement_per_second": (startLength - length) / seconds if seconds > 0 else 0.0}
+    if report is not None:
+        report("Post-optimisation: " + str(startLength) + " -> " + str(length) + " (local optimum " + str(localOptimum) + ") in " +
+               format(seconds, ".1f") + "s, " + format(stats["improvement_per_second"], ".1f") + " per second, " + str(kept) + " of " +
+               str(kicks) + " kicks kept")
+    return tour, length, stats
+
+def crossCheck(rounds=200, rng=random):
+    #Compare the gains reported by the LK moves and the kicks with the tour lengths
+    failures = 0
+    for r in range(rounds):
+        num_cities = rng.randint(5, 80)
+        distance_matrix = randomMatrix(num_cities, rng)
+        tour = list(range(num_cities))
+        rng.shuffle(tour)
+        before = tourLength(tour, distance_matrix)
+        search = LinKernighan(distance_matrix, k=rng.randint(2, 10), moves=("lk",), max_depth=rng.randint(1, 8))
+        tour, gain = search.improve(tour)
+        if sorted(tour) != list(range(num_cities)) or tourLength(tour, distance_matrix) != before + gain:
+            failures += 1
+        tour, length, stats = postOptimize(tour, distance_matrix, 0.02, rng=rng)
+        if sorted(tour) != list(range(num_cities)) or tourLength(tour, distance_matrix) != length:
+            failures += 1
+    return failures
+
+if __name__ == "__main__":
+    num_cities = int(sys.argv[1]) if len(sys.argv) > 1 else 535
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+    failures = crossCheck()
+    print("all reported gains match the tour lengths" if failures == 0 else str(failures) + " mismatches")
+    distance_matrix = randomMatrix(num_cities)
+    tour = list(range(num_cities))
+    random.shuffle(tour)
+    for label, search in (("2-opt/Or-opt/2h-opt", LocalSearch(distance_matrix)), ("with LK moves", LinKernighan(distance_matrix))):
+        startedAt = time.perf_counter()
+        improved, gain = search.improve(list(tour))
+        print(label + ": " + str(tourLength(tour, distance_matrix) + gain) + " in " + format(time.perf_counter() - startedAt, ".2f") + "s")
+    postOptimize(tour, distance_matrix, seconds, print)
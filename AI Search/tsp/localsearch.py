@@ -0,0 +1,260 @@
+"""
+Local search on whole tours with 2-opt, Or-opt and 2h-opt moves.
+AlgBenhanced.py's 2-opt tried every (i, j) pair and started the whole scan again after each improvement.
+LocalSearch only tries moves that add an edge from a city to one of its k nearest cities (a
+tsp.neighbours.NeighbourIndex), and keeps a "don't look" bit per city: a city is only looked at again
+once one of its tour edges has changed. The tour is a list with a position index, so a 2-opt move
+reverses whichever side of the tour is shorter in place.
+
+    2opt  - remove two edges and reconnect the two paths the other way round
+    oropt - move a run of 1 to 3 cities elsewhere in the tour, either way round
+    2hopt - while trying a 2-opt move, also try moving one of its end cities instead
+
+Or-opt and 2h-opt moves are carried out as two or three 2-opt moves. The same LocalSearch can improve
+a finished tour (improve), the best children of a GA generation (memeticStep) or be an A* heuristic
+(localSearchHeuristic in tsp.astar).
+
+Running this module directly checks that the gains reported match the tour lengths and times the
+search on random instances:
+    python -m tsp.localsearch
+"""
+import time
+import random
+from collections import deque
+
+from tsp.neighbours import NeighbourIndex
+from tsp.distances import scalarMatrix
+from tsp.problem import tourLength, randomMatrix
+
+class LocalSearch:
+    def __init__(self, distance_matrix, neighbours=None, k=8, moves=("2opt", "oropt", "2hopt")):
+        distance_matrix = scalarMatrix(distance_matrix)
+        self.distance_matrix = distance_matrix
+        self.neighbours = neighbours if neighbours is not None else NeighbourIndex(distance_matrix, k)
+        self.k = k
+        self.moves = set(moves)
+        self.stats = {"2opt": 0, "oropt": 0, "2hopt": 0}
+
+    def _next(self, city):
+        return self.tour[(self.pos[city] + 1) % len(self.tour)]
+
+    def _prev(self, city):
+        return self.tour[self.pos[city] - 1]
+
+    def _reverse(self, i, j):
+        # reverse tour positions i..j (forwards, wrapping round); the other side is reversed instead if it is shorter
+        tour = self.tour
+        pos = self.pos
+        n = len(tour)
+        length = (j - i) % n + 1
+        if 2 * length > n:
+            i, j = (j + 1) % n, (i - 1) % n
+            length = n - length
+        for step in range(length // 2):
+            a = tour[i]
+            b = tour[j]
+            tour[i] = b
+            pos[b] = i
+            tour[j] = a
+            pos[a] = j
+            i = (i + 1) % n
+            j = (j - 1) % n
+
+    def _move(self, a, b, c, d):
+        # 2-opt: replace tour edges (a, b) and (c, d) with (a, c) and (b, d)
+        if self._next(a) != b:
+            a, b, c, d = d, c, b, a
+        self._reverse(self.pos[b], self.pos[c])
+
+    def _orMove(self, first, last, c, e, reverse):
+        # move the run first..last (in tour order) between the neighbours c and e, c = previous city of e;
+        # c joins "last" if reverse, otherwise "first"
+        p = self._prev(first)
+        n = self._next(last)
+        self._move(p, first, c, e)
+        if c != n:
+            self._move(p, c, n, last)
+        if not reverse and first != last:
+            self._move(c, last, first, e)
+
+    def _candidates(self, city):
+        lists = self.neighbours.lists[city]
+        return lists if len(lists) <= self.k + 1 else lists[:self.k + 1]
+
+    def _twoOpt(self, a):
+        d = self.distance_matrix
+        for forwards in (True, False):
+            b = self._next(a) if forwards else self._prev(a)
+            dab = d[a][b]
+            for c in self._candidates(a):
+                dac = d[a][c]
+                if dac >= dab:
+                    break
+                if c == a or c == b or not self.inTour[c]:
+                    continue
+                e = self._next(c) if forwards else self._prev(c)
+                if e == a:
+                    continue
+                delta = dac + d[b][e] - dab - d[c][e]
+                if delta < 0:
+                    self._move(a, b, c, e)
+                    self.stats["2opt"] += 1
+                    return (a, b, c, e), delta
+                if "2hopt" in self.moves:
+                    touched, delta = self._twoHOpt(a, b, c, e, forwards)
+                    if touched:
+                        return touched, delta
+        return None, 0
+
+    def _twoHOpt(self, a, b, c, e, forwards):
+        # the 2h-opt alternatives to replacing (a, b), (c, e): move b between c and e, or c between a and b
+        d = self.distance_matrix
+        bNext = self._next(b) if forwards else self._prev(b)
+        if bNext != c and e != b:
+            delta = d[a][bNext] - d[a][b] - d[b][bNext] + d[c][b] + d[b][e] - d[c][e]
+            if delta < 0:
+                self._insert(b, c, e)
+                self.stats["2hopt"] += 1
+                return (a, b, bNext, c, e), delta
+        cBefore = self._prev(c) if forwards else self._next(c)
+        if cBefore != b and e != a:
+            delta = d[cBefore][e] - d[cBefore][c] - d[c][e] + d[a][c] + d[c][b] - d[a][b]
+            if delta < 0:
+                self._insert(c, a, b)
+                self.stats["2hopt"] += 1
+                return (a, b, c, cBefore, e), delta
+        return None, 0
+
+    def _insert(self, city, c, e):
+        # move "city" between its non-neighbours c and e
+        if self._next(c) != e:
+            c, e = e, c
+        self._orMove(city, city, c, e, False)
+
+    def _orOpt(self, a):
+        d = self.distance_matrix
+        tour = self.tour
+        n = len(tour)
+        i = self.pos[a]
+        for length in (1, 2, 3):
+            if n < length + 4:
+                break
+            last = tour[(i + length - 1) % n]
+            run = {tour[(i + k) % n] for k in range(length)}
+            p = tour[i - 1]
+            nextCity = tour[(i + length) % n]
+            removed = d[p][a] + d[last][nextCity] - d[p][nextCity]
+            for end in (a, last):
+                for c in self._candidates(end):
+                    if c in run or c == p or c == nextCity or not self.inTour[c]:
+                        continue
+                    for e in (self._next(c), self._prev(c)):
+                        if e in run or e == p or e == nextCity:
+                            continue
+                        dce = d[c][e]
+                        #Join "end" to c: the run goes in with "end" next to c
+                        other = last if end == a else a
+                        delta = d[c][end] + d[other][e] - dce - removed
+                        if delta < 0:
+                            if self._next(c) == e:
+                                self._orMove(a, last, c, e, end == last)
+                            else:
+                                self._orMove(a, last, e, c, end == a)
+                            self.stats["oropt"] += 1
+                            return (p, nextCity, a, last, c, e), delta
+        return None, 0
+
+    def _improveCity(self, a):
+        # make the first improving move found around city a; returns the cities whose edges changed (or None) and the gain
+        touched = None
+        delta = 0
+        if "2opt" in self.moves or "2hopt" in self.moves:
+            touched, delta = self._twoOpt(a)
+        if touched is None and "oropt" in self.moves:
+            touched, delta = self._orOpt(a)
+        return touched, delta
+
+    def improve(self, tour, time_limit=None, active=None):
+        # improve the closed tour (a list, changed in place) until no move helps or "time_limit" seconds pass;
+        # returns the tour and the change in its length. The tour may visit only some of the cities.
+        #"active" limits the first look to those cities, e.g. the ends of the edges a kick has just changed
+        if len(tour) < 5:
+            return tour, 0
+        self.tour = tour
+        self.pos = pos = [0] * len(self.distance_matrix)
+        for i, city in enumerate(tour):
+            pos[city] = i
+        deadline = None if time_limit is None else time.time() + time_limit
+        self.inTour = bytearray(len(pos))
+        for city in tour:
+            self.inTour[city] = 1
+        if active is None:
+            queue = deque(tour)
+            queued = bytearray(self.inTour)
+        else:
+            queue = deque(active)
+            queued = bytearray(len(pos))
+            for city in active:
+                queued[city] = 1
+        gain = 0
+        steps = 0
+        while queue:
+            a = queue.popleft()
+            queued[a] = 0
+            touched, delta = self._improveCity(a)
+            if touched is not None:
+                gain += delta
+                for city in touched:
+                    if not queued[city]:
+                        queued[city] = 1
+                        queue.append(city)
+            steps += 1
+            if deadline is not None and steps % 256 == 0 and time.time() >= deadline:
+                break
+        return tour, gain
+
+def improveTour(tour, distance_matrix, time_limit=None, local_search=None):
+    # a locally optimal copy of "tour" and its length; pass a LocalSearch to reuse its neighbour lists
+    if local_search is None:
+        local_search = LocalSearch(distance_matrix)
+    tour, gain = local_search.improve(list(tour), time_limit)
+    return tour, tourLength(tour, local_search.distance_matrix)
+
+def memeticStep(local_search, children, lengths, count):
+    # improve the "count" shortest of the GA's children (rows of an array, changed in place) and their lengths
+    for k in sorted(range(len(children)), key=lengths.__getitem__)[:count]:
+        children[k], gain = local_search.improve(children[k].tolist())
+        lengths[k] += gain
+
+def crossCheck(rounds=200, rng=random):
+    #Run every move type on random tours and compare the reported gain with the tour lengths
+    failures = 0
+    for r in range(rounds):
+        num_cities = rng.randint(5, 60)
+        distance_matrix = randomMatrix(num_cities, rng)
+        for moves in (("2opt",), ("oropt",), ("2hopt",), ("2opt", "oropt", "2hopt")):
+            #Some tours only visit part of the cities, as when A* uses the search on the unvisited ones
+            tour = [city for city in range(num_cities) if rng.random() < 0.8] if rng.random() < 0.5 else list(range(num_cities))
+            cities = sorted(tour)
+            rng.shuffle(tour)
+            before = tourLength(tour, distance_matrix)
+            tour, gain = LocalSearch(distance_matrix, k=rng.randint(2, 10), moves=moves).improve(tour)
+            if sorted(tour) != cities or tourLength(tour, distance_matrix) != before + gain:
+                failures += 1
+                print("mismatch with " + "+".join(moves) + " on " + str(num_cities) + " cities")
+    return failures
+
+if __name__ == "__main__":
+    failures = crossCheck()
+    print("all reported gains match the tour lengths" if failures == 0 else str(failures) + " mismatches")
+    for num_cities in (200, 1000):
+        distance_matrix = randomMatrix(num_cities)
+        tour = list(range(num_cities))
+        random.shuffle(tour)
+        before = tourLength(tour, distance_matrix)
+        for moves in (("2opt",), ("2opt", "oropt"), ("2opt", "oropt", "2hopt")):
+            local_search = LocalSearch(distance_matrix, moves=moves)
+            startedAt = time.perf_counter()
+            improved, gain = local_search.improve(list(tour))
+            print(str(num_cities) + " cities, " + "+".join(moves) + ": " + str(before) + " -> " + str(before + gain) + " in " +
+                  format(time.perf_counter() - startedAt, ".2f") + "s " + str(local_search.stats))
@@ -0,0 +1,174 @@
+"""
+Held and Karp's 1-tree lower bound on the length of every tour of an instance, so a run can tell how far
+its best tour might still be from optimal and stop once that gap is small enough (see
+tsp.driver.SolverRun.setLowerBound).
+
+A 1-tree is a minimum spanning tree over cities 1..n-1 plus the two cheapest edges from city 0. Every
+tour is a 1-tree, so the cheapest 1-tree is no longer than the shortest tour. Adding a penalty pi[i] to
+every edge at city i and taking 2 * sum(pi) off the total leaves each tour's length alone but changes
+which 1-tree is cheapest; subgradient steps on pi (raising the penalty on cities of degree above 2 and
+lowering it below) push the bound up, usually to within a percent or so of the optimum.
+
+lowerBound memoises the bound per instance, keyed by the SHA-1 of the matrix, and given the city file
+directory also keeps it in the matrix cache there (see tsp.matrixcache), so later runs get it at once;
+as with the matrix cache, a directory that can't be written to just means the bound isn't kept.
+The bound needs the whole matrix as an array, 8 bytes per entry, several times over, so a PackedDistances
+(past tsp.problem.PACKED_ABOVE cities) is never unpacked for it: lowerBound returns None, which
+SolverRun.setLowerBound takes as no bound, so a run with a "target_gap" simply has no gap to stop at.
+
+Running this module directly prints the bound and the gap to a postOptimize tour for the given city files:
+    python -m tsp.lowerbound [file ...]
+"""
+import os
+import sys
+import math
+import time
+import hashlib
+import numpy as np
+
+from tsp.cityfile import atomicWrite
+from tsp.distances import PackedDistances
+from tsp.matrixcache import CACHE_DIR_NAME
+
+_bounds = {}
+
+def _matrix(distance_matrix):
+    if isinstance(distance_matrix, PackedDistances):
+        raise ValueError("the 1-tree bound needs the full matrix, not a PackedDistances of " + str(distance_matrix.num_cities) + " cities")
+    return np.asarray(distance_matrix, dtype=np.int64)
+
+def oneTree(costs):
+    # the cheapest 1-tree under the n x n float "costs" (np.inf for edges that can't be used): returns its
+    # weight, the degree of every city and its edges
+    n = len(costs)
+    inTree = np.zeros(n, dtype=bool)
+    inTree[0] = inTree[1] = True
+    nearest = costs[1].copy()
+    nearest[inTree] = np.inf
+    parent = np.ones(n, dtype=np.int64)
+    degrees = np.zeros(n, dtype=np.int64)
+    edges = []
+    weight = 0.0
+    for step in range(n - 2):
+        v = int(np.argmin(nearest))
+        weight += nearest[v]
+        u = int(parent[v])
+        edges.append((u, v))
+        degrees[u] += 1
+        degrees[v] += 1
+        inTree[v] = True
+        nearest[v] = np.inf
+        row = costs[v]
+        closer = (row < nearest) & ~inTree
+        nearest[closer] = row[closer]
+        parent[closer] = v
+    a, b = np.argpartition(costs[0, 1:], 1)[:2] + 1
+    weight += costs[0, a] + costs[0, b]
+    edges.append((0, int(a)))
+    edges.append((0, int(b)))
+    degrees[0] = 2
+    degrees[a] += 1
+    degrees[b] += 1
+    return weight, degrees, edges
+
+def nearestNeighbourLength(d):
+    # the length of the nearest neighbour tour from city 0, as the first target of the subgradient steps
+    n = len(d)
+    visited = np.zeros(n, dtype=bool)
+    visited[0] = True
+    v, length = 0, 0
+    for step in range(n - 1):
+        row = np.where(visited, np.iinfo(np.int64).max, d[v])
+        u = int(np.argmin(row))
+        length += int(d[v, u])
+        visited[u] = True
+        v = u
+    return length + int(d[v, 0])
+
+def subgradientBound(distance_matrix, upper_length=None, iterations=300, time_limit=None):
+    # the best 1-tree bound found in "iterations" subgradient steps (or "time_limit" seconds) and its penalties
+    d = _matrix(distance_matrix)
+    n = len(d)
+    if n < 3:
+        return float(d.sum()), np.zeros(n)
+    if upper_length is None:
+        upper_length = nearestNeighbourLength(d)
+    deadline = time.time() + time_limit if time_limit is not None else float("inf")
+    base = d.astype(np.float64)
+    np.fill_diagonal(base, np.inf)
+    pi = np.zeros(n)
+    best, bestPi = -np.inf, pi
+    step = 2.0
+    stale = 0
+    for k in range(iterations):
+        weight, degrees, edges = oneTree(base + pi[:, None] + pi[None, :])
+        bound = weight - 2 * pi.sum()
+        if bound > best + 1e-9:
+            best, bestPi = bound, pi
+            stale = 0
+        else:
+            stale += 1
+            if stale >= 10:
+                step /= 2
+                stale = 0
+        gradient = degrees - 2
+        #A 1-tree with every degree 2 is a tour, and so an optimal one
+        if not gradient.any() or best > upper_length - 1 + 1e-6 or step < 1e-6 or time.time() >= deadline:
+            break
+        pi = pi + step * max(upper_length - bound, 1.0) / float(gradient @ gradient) * gradient
+    return best, bestPi
+
+def _digest(d):
+    return hashlib.sha1(np.ascontiguousarray(d, dtype=np.int64).tobytes()).hexdigest()
+
+def _cachePath(directory, digest):
+    return os.path.join(directory, CACHE_DIR_NAME, digest + ".bound")
+
+def lowerBound(distance_matrix, time_limit=10, directory=None):
+    # a whole number no longer than any tour, from at most "time_limit" seconds of subgradient steps the first
+    # time an instance is seen, or None for a PackedDistances; "directory" is the city file directory whose matrix
+    # cache should keep it
+    if isinstance(distance_matrix, PackedDistances):
+        return None
+    d = _matrix(distance_matrix)
+    digest = _digest(d)
+    if digest in _bounds:
+        return _bounds[digest]
+    path = _cachePath(directory, digest) if directory is not None else None
+    if path is not None and os.path.exists(path):
+        try:
+            with open(path) as f:
+                _bounds[digest] = int(f.read())
+            return _bounds[digest]
+        except (OSError, ValueError):
+            #An unreadable or half-written entry is worked out again
+            pass
+    bound, pi = subgradientBound(d, time_limit=time_limit)
+    #Lengths are whole numbers, so the bound can be rounded up
+    _bounds[digest] = int(math.ceil(bound - 1e-6))
+    if path is not None:
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with atomicWrite(path) as f:
+                f.write(str(_bounds[digest]))
+        except OSError:
+            #A read-only city-files folder just means the bound isn't kept
+            pass
+    return _bounds[digest]
+
+def gap(length, bound):
+    # how far above the lower bound "length" is, as a fraction of the bound
+    return (length - bound) / bound if bound > 0 else 0.0
+
+if __name__ == "__main__":
+    from tsp.problem import loadMatrix
+    from tsp.kopt import postOptimize
+    from tsp.exact import exact_files
+    for input_file in sys.argv[1:] or exact_files + ["AISearchfile175.txt", "AISearchfile535.txt"]:
+        name_of_file, num_cities, distance_matrix, flag = loadMatrix(input_file)
+        startedAt = time.perf_counter()
+        bound = lowerBound(distance_matrix)
+        seconds = time.perf_counter() - startedAt
+        tour, length, stats = postOptimize(list(range(num_cities)), distance_matrix, 2)
+        print(input_file + ": bound " + str(bound) + " in " + format(seconds, ".2f") + "s, tour " + str(length) + ", gap " +
+              format(100 * gap(length, bound), ".2f") + "%")
@@ -0,0 +1,44 @@
+"""
+Bounded least-recently-used memo shared by the search and the genetic algorithm: tsp.astar.HeuristicCache
+keeps heuristic values and tsp.fitnesscache.FitnessCache keeps tour lengths. Once "maxsize" entries are
+held, putting another one evicts the entry that was looked up or stored longest ago. None is never a
+cached value, so get() returning None always means a miss. The counters (hits, misses, evictions) are
+there to tune "maxsize".
+"""
+from collections import OrderedDict
+
+class LRUCache:
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self.values = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        value = self.values.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.values.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.values[key] = value
+        self.values.move_to_end(key)
+        while len(self.values) > self.maxsize:
+            self.values.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def hitRate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {"size": len(self.values), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "hit_rate": self.hitRate}
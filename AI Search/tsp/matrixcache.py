@@ -0,0 +1,126 @@
+"""
+Binary cache of parsed distance matrices, kept next to the city files in ../city-files/.matrix-cache/.
+Each entry is named after the city file and the SHA-1 of its contents, so editing a city file simply
+misses the cache and the stale entry is replaced. Entries are memory-mapped read-only, so any number
+of processes working on the same file share the same pages from the OS page cache.
+
+Entry layout: a 64 byte header (magic, version, number of cities, length of the NAME field) followed
+by the name and then the full row-major int32 matrix, starting on a 64 byte boundary. Given a
+"packed_above", files with more cities than that get a packed entry (named .tri.bin) holding only the
+upper triangle in the order tsp.distances.PackedDistances keeps it, and come back as a PackedDistances
+over it; they are parsed straight into the triangle, so the full matrix is never built at all.
+"""
+import os
+import sys
+import time
+import glob
+import struct
+import hashlib
+import numpy as np
+
+from tsp.cityfile import CITY_FILE_DIR, parse_city_values, values_to_matrix, atomicWrite, _report
+from tsp.distances import PackedDistances
+
+CACHE_DIR_NAME = ".matrix-cache"
+_MAGIC = b"TSPM"
+_VERSION = 1
+_HEADER = struct.Struct("<4sHIH")
+_ALIGN = 64
+
+def cache_path(input_file, file_bytes, cache_dir, packed=False):
+    digest = hashlib.sha1(file_bytes).hexdigest()
+    return os.path.join(cache_dir, input_file + "." + digest + (".tri.bin" if packed else ".bin"))
+
+def _data_offset(name_length):
+    used = _HEADER.size + name_length
+    return (used + _ALIGN - 1) // _ALIGN * _ALIGN
+
+def write_entry(path, name_of_file, distance_matrix):
+    # "distance_matrix" is the full matrix or, for a packed entry, a PackedDistances
+    name = name_of_file.encode("ascii")
+    offset = _data_offset(len(name))
+    if isinstance(distance_matrix, PackedDistances):
+        num_cities, values = distance_matrix.num_cities, distance_matrix.values
+    else:
+        num_cities, values = distance_matrix.shape[0], distance_matrix
+    header = _HEADER.pack(_MAGIC, _VERSION, num_cities, len(name)) + name
+    with atomicWrite(path, "wb") as f:
+        f.write(header.ljust(offset, b"\0"))
+        f.write(np.ascontiguousarray(values, dtype="<i4").tobytes())
+
+def read_entry(path, packed=False):
+    # memory-map a cache entry and return "name_of_file" and the read-only matrix (a PackedDistances over the triangle
+    # if "packed"), or None if the entry is unusable
+    with open(path, "rb") as f:
+        header = f.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            return None
+        magic, version, num_cities, name_length = _HEADER.unpack(header)
+        if magic != _MAGIC or version != _VERSION:
+            return None
+        name_of_file = f.read(name_length).decode("ascii")
+    offset = _data_offset(name_length)
+    if packed:
+        needed = num_cities * (num_cities - 1) // 2
+        if os.path.getsize(path) != offset + 4 * needed:
+            return None
+        values = np.memmap(path, dtype="<i4", mode="r", offset=offset, shape=(needed,)) if needed else np.zeros(0, dtype=np.int32)
+        return name_of_file, PackedDistances(num_cities, values)
+    if os.path.getsize(path) != offset + 4 * num_cities * num_cities:
+        return None
+    if num_cities == 0:
+        return name_of_file, np.zeros((0, 0), dtype=np.int32)
+    distance_matrix = np.memmap(path, dtype="<i4", mode="r", offset=offset, shape=(num_cities, num_cities))
+    return name_of_file, distance_matrix
+
+def _remove_stale(input_file, keep, cache_dir):
+    for path in glob.glob(os.path.join(glob.escape(cache_dir), glob.escape(input_file) + ".*.bin")):
+        if path != keep:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+def load_cached_city_file(input_file, directory=CITY_FILE_DIR, report=None, cache_dir=None, packed_above=None):
+    # same as tsp.cityfile.load_city_file but the matrix comes from (and goes into) the binary cache; the matrix returned
+    # on a hit is a read-only np.memmap, or past "packed_above" cities a PackedDistances over one
+    if cache_dir is None:
+        cache_dir = os.path.join(directory, CACHE_DIR_NAME)
+    with open(directory + input_file, "rb") as the_file:
+        file_bytes = the_file.read()
+    for packed in (False, True) if packed_above is not None else (False,):
+        path = cache_path(input_file, file_bytes, cache_dir, packed)
+        entry = read_entry(path, packed) if os.path.exists(path) else None
+        #An entry of the other kind, from a run with another "packed_above", is parsed again and replaced
+        if entry is not None and (packed_above is None or (len(entry[1]) > packed_above) == packed):
+            name_of_file, distance_matrix = entry
+            _report(report, "I have successfully read " + input_file + ".")
+            _report(report, "There are " + str(len(distance_matrix)) + " cities.")
+            _report(report, "I have successfully built a symmetric two-dimensional array of city distances.")
+            return name_of_file, len(distance_matrix), distance_matrix, "good"
+    name_of_file, num_cities, values, flag = parse_city_values(file_bytes, input_file, report)
+    if flag != "good":
+        return name_of_file, num_cities, None, flag
+    packed = packed_above is not None and num_cities > packed_above
+    distance_matrix = PackedDistances(num_cities, values) if packed else values_to_matrix(num_cities, values)
+    del values
+    _report(report, "I have successfully built a symmetric two-dimensional array of city distances.")
+    path = cache_path(input_file, file_bytes, cache_dir, packed)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        write_entry(path, name_of_file, distance_matrix)
+        _remove_stale(input_file, path, cache_dir)
+        distance_matrix = read_entry(path, packed)[1]
+    except OSError:
+        #A read-only city-files folder just means running without the cache
+        pass
+    return name_of_file, num_cities, distance_matrix, flag
+
+if __name__ == "__main__":
+    for input_file in (sys.argv[1:] or ["AISearchfile535.txt"]):
+        timings = []
+        for r in range(2):
+            startedAt = time.perf_counter()
+            load_cached_city_file(input_file)
+            timings.append(time.perf_counter() - startedAt)
+        print(input_file + ": first load " + format(timings[0], ".4f") + "s, cached load " + format(timings[1], ".4f") + "s")
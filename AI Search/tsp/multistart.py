@@ -0,0 +1,148 @@
+"""
+Multi-start A*: independent searches from different start cities in a process pool, keeping the best tour.
+How good a single search's tour is depends a lot on the city it happens to start from, so on small files
+every city gets a search (up to "ALL_STARTS_UP_TO" cities) and otherwise as many random start cities as
+asked for, one per process by default.
+
+The distance matrix is published once in shared memory (tsp.sharedmatrix) and attached by each worker
+when the pool starts, and forked workers (which tsp.islands.poolContext prefers) inherit a single
+NeighbourIndex, which other workers build for themselves; a task is only a start city. Every
+search runs under its own tsp.driver.SolverRun with the caller's deadline and a progress hook watching a
+shared Event. The first search to hit the deadline sets it, as does the caller's run stopping (on a target
+gap, say), and the other searches then stop within a tenth of a second and hand back their best tour
+so far; searches that had not started yet return at once. If none of them has a tour, the greedy tour
+from the first start city is returned instead. Any of tsp.bounded's searches can be used, with a
+"max_bytes" budget shared out between the processes.
+
+Running this module directly compares one search from a random city with a multi-start run on the given
+city files (the 012 to 535 files by default):
+    python -m tsp.multistart [time_limit] [processes] [file ...]
+"""
+import os
+import sys
+import time
+import random
+
+from tsp.astar import getHeuristic, greedyTour
+from tsp.cityfile import benchmark_files
+from tsp.bounded import getSearch
+from tsp.neighbours import NeighbourIndex
+from tsp.islands import poolContext
+from tsp.driver import Budget, SolverRun
+from tsp.sharedmatrix import publishMatrix, matrixFrom
+from tsp.problem import tourLength
+
+ALL_STARTS_UP_TO = 60
+#How often, in seconds, a search looks to see whether it has been cancelled
+CANCEL_INTERVAL = 0.1
+
+_worker = {}
+
+def _initWorker(distance_matrix, ordered_nearests, cancel):
+    #"distance_matrix" may be a tsp.sharedmatrix handle
+    distance_matrix = matrixFrom(distance_matrix)
+    _worker["distance_matrix"] = distance_matrix
+    _worker["ordered_nearests"] = ordered_nearests if ordered_nearests is not None else NeighbourIndex(distance_matrix)
+    _worker["cancel"] = cancel
+
+def _cancelled(run):
+    #A progress hook that stops the search once another search or the caller has cancelled the rest
+    return _worker["cancel"].is_set()
+
+def _searchFrom(task):
+    start, search, heuristic, deadline, search_options = task
+    cancel = _worker["cancel"]
+    if cancel.is_set():
+        return {"start": start, "tour": None, "length": None, "expanded": 0, "seconds": 0.0, "stopped": "cancelled"}
+    budget = Budget(deadline - time.time() if deadline is not None else None)
+    run = SolverRun(budget, [_cancelled], CANCEL_INTERVAL)
+    tour, stats = getSearch(search)(_worker["distance_matrix"], getHeuristic(heuristic), start=start, run=run,
+                                    ordered_nearests=_worker["ordered_nearests"], **search_options)
+    stopped = "cancelled" if run.stopped == "hook" else stats["stopped"]
+    if stopped == "deadline":
+        cancel.set()
+    return {"start": start, "tour": run.best_tour, "length": run.best_length, "expanded": stats["expanded"], "seconds": budget.elapsed(),
+            "stopped": stopped}
+
+def startCities(num_cities, starts=None, processes=1, rng=random):
+    # every city for small files, otherwise "starts" distinct random cities (one per process by default); a list is used as it is
+    if isinstance(starts, (list, tuple, range)):
+        return list(starts)
+    if starts is None:
+        if num_cities <= ALL_STARTS_UP_TO:
+            return list(range(num_cities))
+        starts = processes
+    return rng.sample(range(num_cities), min(starts, num_cities))
+
+def multiStartTSP(distance_matrix, heuristic="greedy", starts=None, processes=None, search="astar", time_limit=100, run=None, report=None,
+                  **search_options):
+    # return the best tour found, its length and the stats of every start, in start city order. "heuristic" and "search" are
+    # names from tsp.astar.heuristics and tsp.bounded.searches, "report" is called with each start's stats as it finishes,
+    # and a tsp.driver.SolverRun "run" replaces "time_limit" and is offered every start's tour
+    num_cities = len(distance_matrix)
+    processes = processes or os.cpu_count() or 1
+    tasksCities = startCities(num_cities, starts, processes)
+    processes = max(1, min(processes, len(tasksCities)))
+    if search_options.get("max_bytes") is not None:
+        search_options["max_bytes"] //= processes
+    if run is not None:
+        deadline = run.budget.deadline()
+    else:
+        deadline = time.time() + time_limit if time_limit is not None else float("inf")
+    deadline = deadline if deadline != float("inf") else None
+    orderedNearests = NeighbourIndex(distance_matrix)
+    context = poolContext()
+    cancel = context.Event()
+    tasks = [(start, search, heuristic, deadline, search_options) for start in tasksCities]
+    results = []
+    def collect(result):
+        results.append(result)
+        if run is not None:
+            if result["tour"] is not None:
+                run.offer(result["tour"], result["length"], len(results))
+            if run.tick(len(results)):
+                cancel.set()
+        if report is not None:
+            report(result)
+    if processes == 1:
+        _initWorker(distance_matrix, orderedNearests, cancel)
+        for task in tasks:
+            collect(_searchFrom(task))
+    else:
+        #Only forked workers get the index for free; pickling it for the others would send the whole matrix with it
+        inherited = orderedNearests if context.get_start_method() == "fork" else None
+        with publishMatrix(distance_matrix) as handle, context.Pool(processes, initializer=_initWorker,
+                                                                    initargs=(handle, inherited, cancel)) as pool:
+            for result in pool.imap_unordered(_searchFrom, tasks):
+                collect(result)
+    results.sort(key=lambda result: result["start"])
+    stats = [{key: value for key, value in result.items() if key != "tour"} for result in results]
+    best = min((result for result in results if result["tour"] is not None), key=lambda result: result["length"], default=None)
+    if best is None:
+        #Every start was cancelled before it had a tour, so fall back to the greedy tour from the first start city
+        tour = greedyTour(tasksCities[0], set(range(num_cities)) - {tasksCities[0]}, distance_matrix, orderedNearests)
+        length = tourLength(tour, distance_matrix)
+        if run is not None:
+            run.offer(tour, length, len(results))
+        return tour, length, stats
+    return best["tour"], best["length"], stats
+
+if __name__ == "__main__":
+    from tsp.problem import loadMatrix
+    from tsp.astar import astarSearch
+    time_limit = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    processes = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+    for input_file in sys.argv[3:] or benchmark_files:
+        name_of_file, num_cities, distance_matrix, flag = loadMatrix(input_file)
+        startedAt = time.perf_counter()
+        tour, stats = astarSearch(distance_matrix, getHeuristic("greedy"), time_limit=time_limit)
+        single = tourLength(tour, distance_matrix)
+        singleSeconds = time.perf_counter() - startedAt
+        startedAt = time.perf_counter()
+        tour, length, starts = multiStartTSP(distance_matrix, "greedy", processes=processes, time_limit=time_limit)
+        if sorted(tour) != list(range(num_cities)) or tourLength(tour, distance_matrix) != length:
+            print(input_file + ": INVALID TOUR")
+        lengths = [start["length"] for start in starts if start["length"] is not None]
+        print(input_file + ": one start " + str(single) + " in " + format(singleSeconds, ".1f") + "s, " + str(len(starts)) + " starts " +
+              str(length) + " (worst " + str(max(lengths)) + ") in " + format(time.perf_counter() - startedAt, ".1f") + "s, " +
+              str(sum(start["stopped"] == "cancelled" for start in starts)) + " cancelled")
@@ -0,0 +1,155 @@
+"""
+Mutation operators that keep track of the tour length as they go.
+Each move changes the tour in place and returns the exact change in length, worked out from the handful
+of edges it touches, so a mutated individual's length never has to be summed again:
+
+    swapCities    - swap the cities at two positions (up to four edges change)
+    reverseRange  - reverse the cities between two positions, i.e. a 2-opt move (two edges change)
+    moveCity      - take the city at one position and re-insert it at another (six edges change)
+
+swapMutate / inversionMutate / insertionMutate apply them at random the way the GA's mutate() always has
+(every position gets a "mutation_rate" chance), taking and returning the individual's length. They are
+picked by name with getMutation. swapMutate makes exactly the same changes as the original mutate()
+given the same random numbers. A tour can be a list or a row of a tsp.individual.PopulationBuffer;
+cities are read back as ints so a row's unsigned 16 bit ones never reach the matrix lookups.
+
+Running this module directly checks every move at every pair of positions (checkMoves) and then
+cross-checks the operators against tourLength:
+    python -m tsp.mutation
+"""
+import random
+import numpy as np
+
+from tsp.problem import tourLength, randomMatrix
+
+def _edgeSum(tour, edges, distance_matrix):
+    num_cities = len(tour)
+    total = 0
+    for k in edges:
+        total += distance_matrix[int(tour[k])][int(tour[(k + 1) % num_cities])]
+    return total
+
+def swapCities(tour, i, j, distance_matrix):
+    if i == j:
+        return 0
+    num_cities = len(tour)
+    #Edge k joins positions k and k + 1; a set so neighbouring positions don't count a shared edge twice
+    edges = {(i - 1) % num_cities, i, (j - 1) % num_cities, j}
+    before = _edgeSum(tour, edges, distance_matrix)
+    tour[i], tour[j] = tour[j], tour[i]
+    return _edgeSum(tour, edges, distance_matrix) - before
+
+def reverseRange(tour, i, j, distance_matrix):
+    # reverse tour[i..j] inclusive, i <= j
+    num_cities = len(tour)
+    if j - i + 1 >= num_cities or i == j:
+        tour[i:j + 1] = tour[i:j + 1][::-1]
+        return 0
+    before, first, last, after = int(tour[i - 1]), int(tour[i]), int(tour[j]), int(tour[(j + 1) % num_cities])
+    delta = distance_matrix[before][last] + distance_matrix[first][after]
+    delta -= distance_matrix[before][first] + distance_matrix[last][after]
+    tour[i:j + 1] = tour[i:j + 1][::-1]
+    return delta
+
+def _move(tour, i, j, city):
+    #Shift the cities between the two positions along by one, as tour.insert(j, tour.pop(i)) would on a list
+    if i < j:
+        tour[i:j] = tour[i + 1:j + 1]
+    elif j < i:
+        tour[j + 1:i + 1] = tour[j:i]
+    tour[j] = city
+
+def moveCity(tour, i, j, distance_matrix):
+    # remove the city at position i and re-insert it so it ends up at position j
+    num_cities = len(tour)
+    city = int(tour[i])
+    if num_cities < 3 or i == j:
+        _move(tour, i, j, city)
+        return 0
+    previous = int(tour[i - 1])
+    following = int(tour[(i + 1) % num_cities])
+    delta = distance_matrix[previous][following] - distance_matrix[previous][city] - distance_matrix[city][following]
+    _move(tour, i, j, city)
+    previous = int(tour[j - 1])
+    following = int(tour[(j + 1) % num_cities])
+    delta += distance_matrix[previous][city] + distance_matrix[city][following] - distance_matrix[previous][following]
+    return delta
+
+def swapMutate(individual, length, mutation_rate, distance_matrix, rng=random):
+    for i in range(len(individual)):
+        if(rng.random() < mutation_rate):
+            swap = rng.randrange(len(individual))
+            length += swapCities(individual, i, swap, distance_matrix)
+    return individual, length
+
+def inversionMutate(individual, length, mutation_rate, distance_matrix, rng=random):
+    for i in range(len(individual)):
+        if(rng.random() < mutation_rate):
+            other = rng.randrange(len(individual))
+            length += reverseRange(individual, min(i, other), max(i, other), distance_matrix)
+    return individual, length
+
+def insertionMutate(individual, length, mutation_rate, distance_matrix, rng=random):
+    for i in range(len(individual)):
+        if(rng.random() < mutation_rate):
+            length += moveCity(individual, i, rng.randrange(len(individual)), distance_matrix)
+    return individual, length
+
+mutations = {'swap' : swapMutate,
+             'inversion' : inversionMutate,
+             'insertion' : insertionMutate}
+
+def getMutation(name):
+    if name not in mutations:
+        raise ValueError("unknown mutation " + str(name) + ", expected one of " + ", ".join(mutations))
+    return mutations[name]
+
+def crossCheck(rounds=2000, rng=random):
+    #Apply random moves to random instances and compare the carried length with a full tourLength
+    failures = 0
+    for r in range(rounds):
+        num_cities = rng.randint(1, 30)
+        distance_matrix = randomMatrix(num_cities, rng)
+        tour = list(range(num_cities))
+        rng.shuffle(tour)
+        length = tourLength(tour, distance_matrix)
+        for name, operator in mutations.items():
+            tour, length = operator(tour, length, rng.random(), distance_matrix, rng)
+            if length != tourLength(tour, distance_matrix) or sorted(tour) != list(range(num_cities)):
+                failures += 1
+                print("mismatch after " + name + " on " + str(num_cities) + " cities")
+                length = tourLength(tour, distance_matrix)
+    return failures
+
+def checkMoves(sizes=(1, 2, 3, 4, 5, 8, 13), rng=random):
+    #Every move at every pair of positions, so adjacent positions, the ends of the tour (where the edges wrap round) and
+    #i == j are all covered, on a list and on a PopulationBuffer-style uint16 row; the delta has to match tourLength
+    #reverseRange only takes i <= j
+    moves = [(swapCities, False), (reverseRange, True), (moveCity, False)]
+    for num_cities in sizes:
+        distance_matrix = randomMatrix(num_cities, rng)
+        start = list(range(num_cities))
+        rng.shuffle(start)
+        for move, ordered in moves:
+            name = move.__name__
+            for i in range(num_cities):
+                for j in range(i if ordered else 0, num_cities):
+                    for tour in (list(start), np.array(start, dtype=np.uint16)):
+                        before = tourLength(tour, distance_matrix)
+                        delta = move(tour, i, j, distance_matrix)
+                        after = tourLength(tour, distance_matrix)
+                        assert after - before == delta, (name + "(" + str(i) + ", " + str(j) + ") on " + str(num_cities) + " cities gave " +
+                                                         str(delta) + ", tourLength changed by " + str(after - before))
+                        assert sorted(int(city) for city in tour) == list(range(num_cities)), name + " lost a city"
+    expected = list(range(5))
+    for tour in (expected[:], np.array(expected, dtype=np.uint16)):
+        moveCity(tour, 0, 4, randomMatrix(5, rng))
+        assert [int(city) for city in tour] == [1, 2, 3, 4, 0], "moveCity(0, 4) should put the first city last"
+        moveCity(tour, 4, 0, randomMatrix(5, rng))
+        assert [int(city) for city in tour] == expected, "moveCity(4, 0) should put the last city first"
+
+if __name__ == "__main__":
+    checkMoves()
+    print("every move's delta matches tourLength at every pair of positions")
+    failures = crossCheck()
+    print("all carried lengths match tourLength" if failures == 0 else str(failures) + " mismatches")
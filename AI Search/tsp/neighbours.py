@@ -0,0 +1,154 @@
+"""
+Nearest-neighbour candidate lists shared by the searches.
+computeOrderedNearests used to sort every row of the matrix in full (O(n^2 log n) time, n^2 boxed ints),
+and getNearest copied the whole unvisited set into a dict on every call. NeighbourIndex keeps only each
+city's k nearest cities, picked a block of rows at a time with np.argpartition, in the same order the full
+sort gave (nearest first, ties by city number). A NeighbourCursor walks those lists for one search with
+a visited bitmap, so finding the nearest unvisited city costs a few steps rather than a pass over every
+city. Only when all k candidates of a city are visited does it either scan the few cities still
+unvisited or, if there are more of those than candidates, double that city's list.
+
+index[i] still behaves like the full sorted row for code that walks past the candidates (the list is
+extended on demand), so NeighbourIndex can be passed wherever the ordered nearests lists were.
+"""
+import numpy as np
+
+def _rows(distance_matrix, start, stop):
+    if isinstance(distance_matrix, np.ndarray):
+        return np.asarray(distance_matrix[start:stop], dtype=np.int64)
+    if hasattr(distance_matrix, "row"):
+        return np.vstack([distance_matrix.row(i) for i in range(start, stop)]).astype(np.int64)
+    return np.asarray(distance_matrix[start:stop], dtype=np.int64)
+
+class NeighbourRow:
+    # the full nearest-first order of one city, read from the candidate list until it runs out
+    def __init__(self, index, i):
+        self.index = index
+        self.i = i
+
+    def __getitem__(self, k):
+        candidates = self.index.lists[self.i]
+        if k < len(candidates):
+            return candidates[k]
+        return self.index.extend(self.i, k + 1)[k]
+
+    def __len__(self):
+        return self.index.num_cities
+
+    def __iter__(self):
+        for chunk in self.index.chunks(self.i):
+            yield from chunk
+
+class NeighbourIndex:
+    def __init__(self, distance_matrix, k=16, block=256):
+        self.distance_matrix = distance_matrix
+        self.num_cities = n = len(distance_matrix)
+        self.k = k = min(k, n)
+        self.candidates = np.zeros((n, k), dtype=np.int32)
+        for start in range(0, n, block):
+            stop = min(start + block, n)
+            self.candidates[start:stop] = self._nearest(start, stop, k)
+        self.lists = self.candidates.tolist()
+
+    def _nearest(self, start, stop, k):
+        # the k nearest cities of rows start..stop, nearest first
+        n = self.num_cities
+        #distance * n + city is unique per row, so ties go to the lower city number as with a stable sort
+        keys = _rows(self.distance_matrix, start, stop) * n + np.arange(n, dtype=np.int64)
+        if k < n:
+            nearest = np.argpartition(keys, k - 1, axis=1)[:, :k]
+        else:
+            nearest = np.broadcast_to(np.arange(n), keys.shape)
+        order = np.argsort(np.take_along_axis(keys, nearest, axis=1), axis=1)
+        return np.take_along_axis(nearest, order, axis=1)
+
+    def extend(self, i, size):
+        # lengthen city i's list to at least "size" cities (doubling it, up to every city) and return it
+        candidates = self.lists[i]
+        if len(candidates) < size:
+            k = min(max(size, 2 * len(candidates)), self.num_cities)
+            self.lists[i] = candidates = self._nearest(i, i + 1, k)[0].tolist()
+        return candidates
+
+    def chunks(self, i):
+        # city i's nearest-first order as a few lists: its candidates, then each extension past them.
+        #Loops that may run past the candidates are quicker over these than over index[i] a city at a time
+        k = 0
+        while k < self.num_cities:
+            candidates = self.lists[i] if k == 0 else self.extend(i, k + 1)
+            yield candidates[k:] if k else candidates
+            k = len(candidates)
+
+    def __len__(self):
+        return self.num_cities
+
+    def __getitem__(self, i):
+        return NeighbourRow(self, i)
+
+    def cursor(self, unvisited):
+        return NeighbourCursor(self, unvisited)
+
+class NeighbourCursor:
+    # nearest unvisited city lookups for one search over the cities in "unvisited"
+    def __init__(self, index, unvisited, visited=None):
+        self.index = index
+        if visited is None:
+            visited = bytearray(b"\x01") * index.num_cities
+            for city in unvisited:
+                visited[city] = 0
+        self.visited = visited
+        self.remaining = visited.count(0)
+
+    def copy(self):
+        #Cheaper than a new cursor when many searches start from the same unvisited cities
+        return NeighbourCursor(self.index, None, bytearray(self.visited))
+
+    def visit(self, city):
+        if not self.visited[city]:
+            self.visited[city] = 1
+            self.remaining -= 1
+
+    def nearest(self, city):
+        # the nearest unvisited city to "city", or None once every city is visited
+        visited = self.visited
+        for other in self.index.lists[city]:
+            if not visited[other]:
+                return other
+        return self._beyond(city)
+
+    def _beyond(self, city):
+        # nearest() once every candidate of "city" is visited
+        if self.remaining == 0:
+            return None
+        visited = self.visited
+        candidates = self.index.lists[city]
+        #While more cities are unvisited than "city" has candidates the nearest is probably just past the list
+        while self.remaining > len(candidates) and len(candidates) < self.index.num_cities:
+            start = len(candidates)
+            candidates = self.index.extend(city, start + 1)
+            for other in candidates[start:]:
+                if not visited[other]:
+                    return other
+        row = self.index.distance_matrix[city]
+        best = None
+        other = visited.find(0)
+        while other >= 0:
+            if best is None or (row[other], other) < (row[best], best):
+                best = other
+            other = visited.find(0, other + 1)
+        return best
+
+    def walk(self, city):
+        # visit and yield, one at a time, the nearest unvisited city to the last one, starting from "city"
+        lists = self.index.lists
+        visited = self.visited
+        while self.remaining:
+            for other in lists[city]:
+                if not visited[other]:
+                    break
+            else:
+                other = self._beyond(city)
+            visited[other] = 1
+            self.remaining -= 1
+            yield other
+            city = other
@@ -0,0 +1,60 @@
+"""
+The scripts' file handling as functions: loading a city file into the matrix the algorithms use,
+checking a tour the way the verification block does, and writing it in the output file format, plus the
+tour length and random instances every module's self-check uses.
+The Alg*.py scripts keep their own copies of the verification and output blocks, which the assignment
+says not to touch; tsp.batch and anything else that solves many files in one process uses these.
+"""
+import time
+import random
+
+from tsp.cityfile import CITY_FILE_DIR, atomicWrite
+from tsp.matrixcache import load_cached_city_file
+from tsp.distances import scalarMatrix
+
+#Past this many cities the full matrix no longer fits in memory, see tsp.distances; the scripts all use it through loadMatrix
+PACKED_ABOVE = 5000
+
+def loadMatrix(input_file, directory=CITY_FILE_DIR, report=None, packed_above=PACKED_ABOVE):
+    # load_cached_city_file, with the matrix as tsp.distances.MatrixRows over the cache's memmap, so m[i][j] works like
+    # the nested lists without copying it; past "packed_above" cities a PackedDistances over a packed cache entry, the
+    # full matrix never being built
+    name_of_file, num_cities, distance_matrix, flag = load_cached_city_file(input_file, directory, report, packed_above=packed_above)
+    return name_of_file, num_cities, scalarMatrix(distance_matrix), flag
+
+def pathLength(path, distance_matrix):
+    length = 0
+    for i in range(len(path) - 1):
+        length += distance_matrix[path[i]][path[i + 1]]
+    return length
+
+def tourLength(tour, distance_matrix):
+    return pathLength(tour, distance_matrix) + distance_matrix[tour[-1]][tour[0]]
+
+def randomMatrix(num_cities, rng=random):
+    # a random instance as nested lists for the self-checks: points in the plane, so it looks like the city files rather than uniform noise
+    points = [(rng.random() * 1000, rng.random() * 1000) for i in range(num_cities)]
+    return [[int(((x1 - x2) ** 2 + (y1 - y2) ** 2) ** 0.5) for (x2, y2) in points] for (x1, y1) in points]
+
+def checkTour(tour, tour_length, distance_matrix):
+    # "good" if "tour" visits every city once and has length "tour_length", otherwise "bad"; also returns the true length
+    num_cities = len(distance_matrix)
+    if len(tour) != num_cities or sorted(tour) != list(range(num_cities)):
+        return "bad", None
+    check_tour_length = tourLength(tour, distance_matrix)
+    return ("good" if check_tour_length == tour_length else "bad"), check_tour_length
+
+def outputFileName(my_user_name, when=None):
+    # the scripts' output file name: the user name, then month, day, hour, minute and second
+    local_time = time.asctime(time.localtime(time.time() if when is None else when))
+    return my_user_name + local_time[4:7] + local_time[8:10] + local_time[11:13] + local_time[14:16] + local_time[17:19] + ".txt"
+
+def writeTourFile(output_file_name, tour, tour_length, my_user_name, my_first_name, my_last_name, alg_code, name_of_file, added_note=""):
+    # write "tour" in the scripts' output format, through a temporary file renamed into place so the file is always whole
+    with atomicWrite(output_file_name) as f:
+        f.write("USER = " + my_user_name + " (" + my_first_name + " " + my_last_name + ")\n")
+        f.write("ALGORITHM = " + alg_code + ", FILENAME = " + name_of_file + "\n")
+        f.write("NUMBER OF CITIES = " + str(len(tour)) + ", TOUR LENGTH = " + str(tour_length) + "\n")
+        f.write(",".join(str(city) for city in tour))
+        if added_note != "":
+            f.write("\nNOTE = " + added_note)
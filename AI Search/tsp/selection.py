@@ -0,0 +1,116 @@
+"""
+Batched parent selection for the genetic algorithm.
+Each function draws a whole mating pool's worth of indices in one NumPy call:
+
+    rouletteSelect   - fitness-proportional, prefix sum plus binary search (O(P + k log P))
+    AliasTable       - fitness-proportional, Walker's alias method, O(1) per draw after O(P) set-up
+    tournamentSelect - best of tournament_size uniform draws, all tournaments at once
+    randomSelect     - uniform draws
+
+When no NumPy generator is passed one is seeded from the random module, so random.seed still makes
+whole runs repeatable.
+
+Running this module directly compares them with the scripts' original selection loops:
+    python -m tsp.selection 100 1000 10000
+"""
+import sys
+import time
+import random
+import numpy as np
+
+def numpyRng(rng=None):
+    if rng is None:
+        return np.random.default_rng(random.getrandbits(64))
+    return rng
+
+def rouletteSelect(weights, count, rng=None, total=None):
+    # draw "count" indices with probability proportional to "weights" (e.g. 1 / tour length); a uniform draw
+    # from [0, total) picks the first index whose cumulative weight passes it, "total" defaulting to the sum
+    cumulative = np.cumsum(np.asarray(weights, dtype=np.float64))
+    draws = numpyRng(rng).random(count) * (cumulative[-1] if total is None else total)
+    #side="right" so a draw landing exactly on a boundary never picks a zero-weight individual
+    return np.minimum(np.searchsorted(cumulative, draws, side="right"), len(cumulative) - 1)
+
+class AliasTable:
+    def __init__(self, weights):
+        weights = np.asarray(weights, dtype=np.float64)
+        size = len(weights)
+        scaled = weights * (size / weights.sum())
+        self.probability = np.ones(size)
+        self.alias = np.arange(size)
+        small = [i for i in range(size) if scaled[i] < 1]
+        large = [i for i in range(size) if scaled[i] >= 1]
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            self.probability[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] = scaled[l] + scaled[s] - 1
+            if scaled[l] < 1:
+                small.append(l)
+            else:
+                large.append(l)
+
+    def sample(self, count, rng=None):
+        rng = numpyRng(rng)
+        columns = rng.integers(0, len(self.probability), count)
+        keep = rng.random(count) < self.probability[columns]
+        return np.where(keep, columns, self.alias[columns])
+
+def tournamentSelect(lengths, count, tournament_size, rng=None):
+    # run "count" tournaments of "tournament_size" uniform draws each and return the index of the
+    # shortest tour in each; ties go to the earliest draw, like tournamentPick
+    lengths = np.asarray(lengths)
+    entrants = numpyRng(rng).integers(0, len(lengths), (count, tournament_size))
+    winners = np.argmin(lengths[entrants], axis=1)
+    return entrants[np.arange(count), winners]
+
+def randomSelect(size, count, rng=None):
+    return numpyRng(rng).integers(0, size, count)
+
+def createMatingPoolLoop(population_sorted, population_fitness):
+    #The original O(P^2) roulette from AlgAbasic.py, only kept for the benchmark
+    selected = []
+    individualFitnesses = [population_sorted[i][0] / population_fitness for i in range(len(population_sorted))]
+    probability = [sum(individualFitnesses[:i+1]) for i in range(len(individualFitnesses))]
+    for i in range(len(population_sorted)):
+        r = random.random()
+        for j in range(len(population_sorted)):
+            if r <= probability[j]:
+                selected.append(population_sorted[j])
+                break
+    return selected
+
+def tournamentPick(population, tournament_size):
+    #The original one-at-a-time tournament from AlgAenhanced.py, only kept for the benchmark
+    best = None
+    for j in range(tournament_size):
+        index = random.randrange(0, len(population))
+        if best == None or population[index][0] < population[best][0]:
+            best = index
+    return population[best][1]
+
+def _timed(function):
+    startedAt = time.perf_counter()
+    function()
+    return time.perf_counter() - startedAt
+
+def benchmark(population_size):
+    #One untimed call so NumPy's first-use set-up isn't charged to whichever function runs first
+    rouletteSelect([1.0], 1)
+    lengths = np.array([random.randint(20000, 40000) for i in range(population_size)])
+    population = sorted((int(d), None) for d in lengths)
+    populationFitness = sum(1 / d for d, t in population)
+    timings = {}
+    if population_size <= 2000:
+        timings["roulette loop"] = _timed(lambda: createMatingPoolLoop(population, populationFitness))
+    timings["rouletteSelect"] = _timed(lambda: rouletteSelect(1 / lengths, population_size))
+    timings["AliasTable"] = _timed(lambda: AliasTable(1 / lengths).sample(population_size))
+    timings["tournamentPick loop"] = _timed(lambda: [tournamentPick(population, 20) for i in range(2 * population_size)])
+    timings["tournamentSelect"] = _timed(lambda: tournamentSelect(lengths, 2 * population_size, 20))
+    return timings
+
+if __name__ == "__main__":
+    for population_size in [int(p) for p in sys.argv[1:]] or [100, 1000, 10000]:
+        timings = benchmark(population_size)
+        print("population " + str(population_size) + ": " + ", ".join(label + " " + format(seconds * 1000, ".2f") + "ms" for label, seconds in timings.items()))
@@ -0,0 +1,172 @@
+"""
+A parsed distance matrix published once in shared memory, for process pools that would otherwise pickle
+the nested lists into every worker (or have each one parse the city file again).
+
+publishMatrix copies the matrix into a multiprocessing.shared_memory block, as int32: the full n x n
+matrix, or past PACKED_ABOVE cities only the upper triangle that tsp.distances.PackedDistances keeps.
+The SharedMatrix it returns owns the block, and its MatrixHandle (the block's name, the array's shape and
+dtype, and whether it is packed) is all a worker needs; it pickles to a few dozen bytes. attachMatrix maps
+the block into a process without copying it and returns the array view, or a PackedDistances over it.
+
+Both ends are reference-counted. The owner's count starts at 1, goes up with acquire() and down with
+release(), and the block is unlinked when it reaches zero (a SharedMatrix used in a "with" block releases
+itself at the end). In each process, every attachMatrix of a handle needs a detachMatrix before the
+mapping is closed; a worker that simply exits drops its mapping with it. Unlinking only removes the name,
+so workers still attached keep their pages until they detach.
+
+The solvers in tsp.solvers take a handle wherever they take a matrix: matrixFrom attaches it and hands
+them memoryview rows over the block (see tsp.distances.scalarMatrix), or the packed matrix past
+PACKED_ABOVE cities, so a worker holds no copy of the matrix of its own. The attachment lasts as long
+as the worker does.
+
+Running this module directly publishes a city file's matrix, has a pool of workers attach it and check
+it, and compares the bytes pickled for a handle with the bytes pickled for the matrix:
+    python -m tsp.sharedmatrix [file] [processes]
+"""
+import os
+import sys
+import atexit
+import pickle
+import numpy as np
+from multiprocessing import shared_memory
+
+from tsp.distances import PackedDistances, scalarMatrix
+from tsp.problem import PACKED_ABOVE
+
+#Blocks this process has published and not yet unlinked, and blocks it has attached: name -> [SharedMemory, count, matrix]
+_published = {}
+_attached = {}
+
+class MatrixHandle:
+    # what a process needs to attach a published matrix
+    def __init__(self, name, shape, dtype, num_cities, packed):
+        self.name = name
+        self.shape = shape
+        self.dtype = dtype
+        self.num_cities = num_cities
+        self.packed = packed
+
+    def __repr__(self):
+        return "MatrixHandle(" + repr(self.name) + ", " + str(self.num_cities) + " cities" + (", packed)" if self.packed else ")")
+
+class SharedMatrix:
+    def __init__(self, distance_matrix, name=None, packed_above=PACKED_ABOVE):
+        if isinstance(distance_matrix, PackedDistances):
+            values, num_cities, packed = distance_matrix.values, distance_matrix.num_cities, True
+        else:
+            values = np.asarray(distance_matrix, dtype=np.int32)
+            num_cities = len(values)
+            packed = num_cities > packed_above
+            if packed:
+                values = PackedDistances.fromMatrix(values).values
+        #A zero-size block can't be created, so an empty matrix still gets one byte
+        self.block = shared_memory.SharedMemory(name=name, create=True, size=max(values.nbytes, 1))
+        shared = np.ndarray(values.shape, dtype=np.int32, buffer=self.block.buf)
+        shared[...] = values
+        del shared
+        self.handle = MatrixHandle(self.block.name, values.shape, "<i4", num_cities, packed)
+        self.references = 1
+        self.owner = os.getpid()
+        _published[self.block.name] = self
+
+    def acquire(self):
+        if self.references <= 0:
+            raise ValueError("shared matrix " + self.handle.name + " has already been unlinked")
+        self.references += 1
+        return self.handle
+
+    def release(self):
+        # drop one reference; the block is unlinked once there are none left
+        if self.references <= 0:
+            return
+        self.references -= 1
+        if self.references == 0:
+            _published.pop(self.handle.name, None)
+            self.block.close()
+            self.block.unlink()
+
+    def __enter__(self):
+        return self.handle
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+def publishMatrix(distance_matrix, name=None, packed_above=PACKED_ABOVE):
+    # copy "distance_matrix" (nested lists, an array or a PackedDistances) into shared memory; returns its SharedMatrix
+    return SharedMatrix(distance_matrix, name, packed_above)
+
+def attachMatrix(handle):
+    # the published matrix as a read-only array over the shared block (a PackedDistances if it is packed), without copying it
+    if handle.name not in _attached:
+        block = shared_memory.SharedMemory(name=handle.name)
+        values = np.ndarray(handle.shape, dtype=handle.dtype, buffer=block.buf)
+        values.flags.writeable = False
+        matrix = PackedDistances(handle.num_cities, values) if handle.packed else values
+        _attached[handle.name] = [block, 0, matrix]
+    entry = _attached[handle.name]
+    entry[1] += 1
+    return entry[2]
+
+def detachMatrix(handle):
+    # drop one attachment; the mapping is closed once this process holds none. Views from attachMatrix must not be used after that
+    entry = _attached.get(handle.name)
+    if entry is None:
+        return
+    entry[1] -= 1
+    if entry[1] <= 0:
+        del _attached[handle.name]
+        block = entry[0]
+        entry[2] = None
+        try:
+            block.close()
+        except BufferError:
+            #Something still holds a view of the block; the mapping goes when that does
+            pass
+
+def matrixFrom(distance_matrix):
+    # the matrix for a solver: a handle is attached and handed back as tsp.distances.MatrixRows over the block (or the
+    # PackedDistances over it), so nothing is copied; anything else is returned as it is
+    if not isinstance(distance_matrix, MatrixHandle):
+        return distance_matrix
+    return scalarMatrix(attachMatrix(distance_matrix))
+
+@atexit.register
+def _unlinkPublished():
+    #Blocks still published when the process exits would otherwise outlive it; a forked child leaves them to its parent
+    for shared in list(_published.values()):
+        if shared.owner == os.getpid():
+            shared.references = 1
+            shared.release()
+
+def _checksum(handle):
+    matrix = attachMatrix(handle)
+    if handle.packed:
+        total = int(matrix.values.sum(dtype=np.int64))
+    else:
+        total = int(matrix.sum(dtype=np.int64))
+    detachMatrix(handle)
+    return total
+
+if __name__ == "__main__":
+    import time
+    from tsp.problem import loadMatrix
+    from tsp.islands import poolContext
+    input_file = sys.argv[1] if len(sys.argv) > 1 else "AISearchfile535.txt"
+    processes = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    name_of_file, num_cities, distance_matrix, flag = loadMatrix(input_file)
+    startedAt = time.perf_counter()
+    shared = publishMatrix(distance_matrix)
+    print("Published " + input_file + " as " + repr(shared.handle) + " in " + format(time.perf_counter() - startedAt, ".3f") + "s")
+    print("Pickled: matrix " + str(len(pickle.dumps(distance_matrix))) + " bytes, handle " + str(len(pickle.dumps(shared.handle))) +
+          " bytes")
+    expected = int(np.asarray(distance_matrix, dtype=np.int64).sum()) if not shared.handle.packed else \
+               int(PackedDistances.fromMatrix(distance_matrix).values.sum(dtype=np.int64))
+    with shared as handle:
+        with poolContext().Pool(processes) as pool:
+            totals = pool.map(_checksum, [handle] * processes)
+    print("every worker saw the same matrix" if all(total == expected for total in totals) else "MISMATCH: " + str(totals))
+    try:
+        shared_memory.SharedMemory(name=shared.handle.name).close()
+        print("NOT UNLINKED")
+    except FileNotFoundError:
+        print("unlinked once the last reference was released")
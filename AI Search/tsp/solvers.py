@@ -0,0 +1,156 @@
+"""
+Registry of the algorithms, keyed by the scripts' alg_code and then by variant ("basic" or "enhanced"):
+
+    GA basic    - tsp.basicga, the GA of AlgAbasic.py
+    GA enhanced - tsp.genetic (or tsp.islands with islands > 1) followed by tsp.kopt.postOptimize, as AlgAenhanced.py
+    AS basic    - tsp.astar with the greedy heuristic, as AlgBbasic.py
+    AS enhanced - tsp.astar with the 2-opt heuristic followed by tsp.kopt.postOptimize, as AlgBenhanced.py; the search
+                  can be swapped for tsp.bounded's beam search or SMA* to keep within a memory budget, and run
+                  from many start cities at once with tsp.multistart
+    EX enhanced - tsp.exact, Held-Karp or branch-and-bound by size, for a proven optimal tour of a small file
+
+A solver is called as solver(distance_matrix, run, **options), "run" being the tsp.driver.SolverRun that
+sets its budget and hears about its tours, and returns (tour, tour_length). Every solver stops as soon as
+the run has a tour within its "target_gap" of the tsp.lowerbound bound. New algorithms go in with
+registerSolver, under a new code with its name for codes_and_names. Solvers got through getSolver (and
+so solve) also take a tsp.sharedmatrix handle in place of the matrix, attached in whatever process runs
+them.
+"""
+from tsp import basicga
+from tsp.genetic import geneticTSP
+from tsp.fitnesscache import FitnessCache
+from tsp.islands import islandTSP
+from tsp.astar import astar, getHeuristic
+from tsp.bounded import getSearch
+from tsp.multistart import multiStartTSP
+from tsp.kopt import postOptimize
+from tsp.exact import exactTSP, HELD_KARP_UP_TO
+from tsp.driver import Budget, SolverRun
+from tsp.problem import tourLength
+from tsp.sharedmatrix import matrixFrom
+from tsp.lowerbound import lowerBound
+
+codes_and_names = {'BF' : 'brute-force search',
+                   'BG' : 'basic greedy search',
+                   'BS' : 'best_first search without heuristic data',
+                   'ID' : 'iterative deepening search',
+                   'BH' : 'best_first search with heuristic data',
+                   'AS' : 'A* search',
+                   'HC' : 'hilling climbing search',
+                   'SA' : 'simulated annealing search',
+                   'GA' : 'genetic algorithm',
+                   'EX' : 'exact search'}
+
+def reservePolish(run, polish_time=None):
+    # hold "polish_time" seconds back from the end of the run's budget for polish, by default a tenth of its time limit,
+    # so the solver stops early enough for both to finish inside it; returns the time held back.
+    #A budget of iterations alone has no time to hold back: the polish is skipped, unless "polish_time" is given, when
+    #it runs that many seconds after the solver's iterations
+    if run.budget.time_limit is None:
+        return polish_time if polish_time is not None else 0.0
+    if polish_time is None:
+        polish_time = run.budget.time_limit / 10
+    run.budget.reserve(polish_time)
+    return polish_time
+
+def polish(tour, tour_length, distance_matrix, run, polish_time, report=None):
+    # postOptimize the solver's tour in the time reservePolish held back, unless it has already reached the run's target
+    polish_time = min(polish_time, run.budget.release())
+    if polish_time <= 0 or run.stopped == "target":
+        return tour, tour_length
+    tour, tour_length, polish_stats = postOptimize(tour, distance_matrix, polish_time, report, target_length=run.target_length)
+    run.offer(tour, tour_length)
+    return tour, tour_length
+
+def cacheSummary(stats):
+    # a line for the report about a FitnessCache, from its stats()
+    return ("fitness cache: " + format(100 * stats["hit_rate"], ".1f") + "% hits (" + str(stats["hits"]) + " of " +
+            str(stats["hits"] + stats["misses"]) + "), " + str(stats["evictions"]) + " evicted, " + str(stats["size"]) + "/" +
+            str(stats["maxsize"]) + " held")
+
+def basicGeneticSolver(distance_matrix, run, population_size=100, mutation_rate=.01, generations=10000, crossover="OX"):
+    tour_length, tour = basicga.geneticTSP(distance_matrix, population_size, mutation_rate, generations, run, crossover)
+    return list(tour), tour_length
+
+def geneticSolver(distance_matrix, run, population_size=100, mutation_rate=.01, generations=10000, crossover="OX", mutation="swap",
+                  memetic_count=0, islands=1, migration_interval=50, migrants=2, topology="ring", seed=None, fitness_cache_size=0,
+                  replace_duplicates=False, checkpoint=None, resume=None, polish_time=None, report=None):
+    # "migrants" and "topology" only apply to islands and checkpoints only to a single population. A "fitness_cache_size" above 0
+    # memoises tour lengths in a tsp.fitnesscache.FitnessCache (one per island worker), whose counters are reported at the end
+    polish_time = reservePolish(run, polish_time)
+    if islands > 1:
+        result, island_stats = islandTSP(distance_matrix, population_size, mutation_rate, generations, islands, migration_interval,
+                                         migrants=migrants, topology=topology, crossover=crossover, mutation=mutation, run=run, seed=seed,
+                                         fitness_cache_size=fitness_cache_size, replace_duplicates=replace_duplicates)
+        if report is not None:
+            for stats in island_stats:
+                report("Island " + str(stats["island"]) + ": best " + str(stats["best_length"]) + " after " + str(stats["generations"]) +
+                       " generations")
+                if fitness_cache_size > 0:
+                    lookups = stats["cache_hits"] + stats["cache_misses"]
+                    report("Island " + str(stats["island"]) + " fitness cache: " + str(stats["cache_hits"]) + " hits in " + str(lookups) +
+                           " lookups")
+    else:
+        fitness_cache = FitnessCache(fitness_cache_size) if fitness_cache_size > 0 else None
+        result = geneticTSP(distance_matrix, population_size, mutation_rate, generations, crossover, mutation=mutation,
+                            fitness_cache=fitness_cache, replace_duplicates=replace_duplicates, memetic_count=memetic_count, run=run,
+                            seed=seed, checkpoint=checkpoint, resume=resume)
+        if report is not None and fitness_cache is not None:
+            report(cacheSummary(fitness_cache.stats()))
+    return polish(result[1], result[0], distance_matrix, run, polish_time, report)
+
+def basicAStarSolver(distance_matrix, run, heuristic="greedy"):
+    tour = astar(distance_matrix, getHeuristic(heuristic), run=run)
+    return tour, tourLength(tour, distance_matrix)
+
+def astarSolver(distance_matrix, run, heuristic="2opt", polish_time=None, report=None, search="astar", max_bytes=None, processes=1,
+                starts=None, **search_options):
+    # "search" is one of tsp.bounded.searches, given "max_bytes" (its own default if None) and any other options it takes.
+    # With more than one process, or given "starts", it is run from several start cities by tsp.multistart
+    if max_bytes is not None:
+        search_options["max_bytes"] = max_bytes
+    polish_time = reservePolish(run, polish_time)
+    #The run's best tour, which is the greedy tour from the start city if the search itself found nothing shorter
+    if processes > 1 or starts is not None:
+        multiStartTSP(distance_matrix, heuristic, starts, processes, search, run=run, **search_options)
+    else:
+        getSearch(search)(distance_matrix, getHeuristic(heuristic), run=run, **search_options)
+    return polish(run.best_tour, run.best_length, distance_matrix, run, polish_time, report)
+
+def exactSolver(distance_matrix, run, held_karp_up_to=HELD_KARP_UP_TO):
+    #The run stops as "optimal" once the tour is proven optimal, and with the best tour so far if its budget runs out first
+    tour_length, tour, proven = exactTSP(distance_matrix, run, held_karp_up_to)
+    if proven:
+        run.stop("optimal")
+    return tour, tour_length
+
+solvers = {"GA": {"basic": basicGeneticSolver, "enhanced": geneticSolver},
+           "AS": {"basic": basicAStarSolver, "enhanced": astarSolver},
+           "EX": {"enhanced": exactSolver}}
+
+def registerSolver(alg_code, variant, solver, name=None):
+    if name is not None:
+        codes_and_names[alg_code] = name
+    if alg_code not in codes_and_names:
+        raise ValueError("unknown algorithm code " + str(alg_code) + ", give its name to register it")
+    solvers.setdefault(alg_code, {})[variant] = solver
+
+def getSolver(alg_code, variant="enhanced"):
+    if alg_code not in solvers:
+        raise ValueError("unknown algorithm code " + str(alg_code) + ", expected one of " + ", ".join(sorted(solvers)))
+    if variant not in solvers[alg_code]:
+        raise ValueError("no " + str(variant) + " " + codes_and_names[alg_code] + ", expected one of " + ", ".join(sorted(solvers[alg_code])))
+    solver = solvers[alg_code][variant]
+    def solveMatrix(distance_matrix, run, *args, **options):
+        return solver(matrixFrom(distance_matrix), run, *args, **options)
+    return solveMatrix
+
+def solve(alg_code, distance_matrix, time_limit=100, variant="enhanced", hooks=(), target_gap=None, city_dir=None, **options):
+    # run one solver under a fresh SolverRun; returns the tour, its length and the run's stats. With a "target_gap" the
+    # run first spends up to a tenth of "time_limit" on the lower bound, kept in the matrix cache in "city_dir" if given
+    distance_matrix = matrixFrom(distance_matrix)
+    run = SolverRun(Budget(time_limit), hooks, target_gap=target_gap)
+    if target_gap is not None:
+        run.setLowerBound(lowerBound(distance_matrix, time_limit / 10, city_dir))
+    tour, tour_length = getSolver(alg_code, variant)(distance_matrix, run, **options)
+    return tour, tour_length, run.finish()
@@ -0,0 +1,215 @@
+"""
+Minimum spanning trees over the unvisited cities, for an admissible A* heuristic.
+Any way of finishing a partial tour that stands on city v, with the cities "unvisited" still to go and
+the tour to close at "start", is a path v -> unvisited -> start. Take its two end edges off and what is
+left spans "unvisited", so it is at least the weight of a minimum spanning tree over them; each end edge
+is at least the cheapest edge from v (or start) into them. mstHeuristic adds those three up, so it never
+overestimates the rest of the tour.
+
+The trees are grown with Prim's algorithm over the neighbour lists of a tsp.neighbours.NeighbourIndex:
+each tree city keeps a cursor into its list (lengthened on demand), pointing at its nearest city not yet in the tree, so the
+cheapest edge out of the tree is always on a small heap. mstChildren scores all the children of an A*
+expansion from the parent's tree: dropping a child that is a leaf just takes its edge off, and dropping
+any other child only reconnects the pieces of the tree it held together, using the cheapest edges between them.
+
+Running this module directly checks the trees against a plain O(n^2) Prim, the incremental values
+against mstHeuristic and the bound against brute-force optimal tours:
+    python -m tsp.spanningtree
+"""
+import time
+import random
+import heapq
+import itertools
+
+def _advance(u, cursors, ordered_nearests, allowed):
+    # move u's cursor to its nearest city for which allowed(city) holds; returns that city or None
+    nearests = ordered_nearests.lists[u]
+    k = cursors.get(u, 0)
+    while True:
+        while k < len(nearests) and not allowed(nearests[k]):
+            k += 1
+        if k < len(nearests) or len(nearests) == ordered_nearests.num_cities:
+            break
+        nearests = ordered_nearests.extend(u, k + 1)
+    cursors[u] = k
+    return nearests[k] if k < len(nearests) else None
+
+def minimumSpanningTree(cities, distance_matrix, ordered_nearests):
+    # return (weight, adjacency) of a minimum spanning tree over the set "cities", adjacency mapping each city to a list of tree neighbours
+    adjacency = {city: [] for city in cities}
+    if not cities:
+        return 0, adjacency
+    inTree = set()
+    allowed = lambda city: city in adjacency and city not in inTree
+    cursors = {}
+    heap = []
+    weight = 0
+    u = min(cities)
+    inTree.add(u)
+    while len(inTree) < len(adjacency):
+        v = _advance(u, cursors, ordered_nearests, allowed)
+        if v is not None:
+            heapq.heappush(heap, (distance_matrix[u][v], u, v))
+        d, u, v = heapq.heappop(heap)
+        if v in inTree:
+            continue
+        inTree.add(v)
+        adjacency[u].append(v)
+        adjacency[v].append(u)
+        weight += d
+        #v's cursor starts fresh; u is pushed again with its next candidate
+        nextCity = _advance(v, cursors, ordered_nearests, allowed)
+        if nextCity is not None:
+            heapq.heappush(heap, (distance_matrix[v][nextCity], v, nextCity))
+    return weight, adjacency
+
+def spanningTreeWithout(city, weight, adjacency, distance_matrix, ordered_nearests):
+    # weight of a minimum spanning tree over the tree's cities less "city", given the tree's weight and adjacency
+    neighbours = adjacency[city]
+    weight -= sum(distance_matrix[city][u] for u in neighbours)
+    if len(neighbours) <= 1:
+        #A leaf's edge is the cheapest one it has, so the rest of the tree is still minimal
+        return weight
+    #Label the pieces the city held together, then join them back up with Prim's algorithm over the pieces
+    label = {city: -1}
+    members = []
+    for k, u in enumerate(neighbours):
+        label[u] = k
+        piece = [u]
+        stack = [u]
+        while stack:
+            x = stack.pop()
+            for y in adjacency[x]:
+                if y not in label:
+                    label[y] = k
+                    piece.append(y)
+                    stack.append(y)
+        members.append(piece)
+    #Every pair of pieces has at least one piece that isn't the biggest, so only the smaller pieces' neighbour
+    #lists need walking: each city notes the first city it meets in every other piece
+    biggest = max(range(len(members)), key=lambda k: len(members[k]))
+    cheapest = {}
+    for k, piece in enumerate(members):
+        if k == biggest:
+            continue
+        for u in piece:
+            seen = {k}
+            for chunk in ordered_nearests.chunks(u):
+                for v in chunk:
+                    other = label.get(v, -1)
+                    if other < 0 or other in seen:
+                        continue
+                    seen.add(other)
+                    pair = (min(k, other), max(k, other))
+                    d = distance_matrix[u][v]
+                    if pair not in cheapest or d < cheapest[pair]:
+                        cheapest[pair] = d
+                    if len(seen) == len(members):
+                        break
+                else:
+                    continue
+                break
+    #Kruskal's algorithm over the pieces
+    group = list(range(len(members)))
+    def find(k):
+        while group[k] != k:
+            group[k] = group[group[k]]
+            k = group[k]
+        return k
+    joins = 0
+    for d, (a, b) in sorted((d, pair) for pair, d in cheapest.items()):
+        a, b = find(a), find(b)
+        if a != b:
+            group[a] = b
+            weight += d
+            joins += 1
+            if joins == len(members) - 1:
+                break
+    return weight
+
+def _nearestIn(v, cities, ordered_nearests, skip=None):
+    for chunk in ordered_nearests.chunks(v):
+        for u in chunk:
+            if u in cities and u != skip:
+                return u
+
+def mstHeuristic(v, children, distance_matrix, ordered_nearests, start=None):
+    # lower bound on the rest of the tour from v through "children" and back to "start" (back to v if no start is given)
+    if start is None:
+        start = v
+    if not children:
+        return distance_matrix[v][start]
+    weight, adjacency = minimumSpanningTree(children, distance_matrix, ordered_nearests)
+    first = _nearestIn(v, children, ordered_nearests)
+    #Closing back at v needs two different edges out of v unless only one city is left
+    last = _nearestIn(start, children, ordered_nearests, first if start == v and len(children) > 1 else None)
+    return weight + distance_matrix[v][first] + distance_matrix[start][last]
+
+def mstChildren(v, unvisited, children, distance_matrix, ordered_nearests, start=None, deadline=None):
+    # mstHeuristic for each city in "children" (a subset of "unvisited", the cities left after v), from one tree over "unvisited";
+    # None if the time.time() "deadline" passes first
+    cities = set(unvisited)
+    values = []
+    if start is None:
+        for child in children:
+            if deadline is not None and time.time() >= deadline:
+                return None
+            values.append(mstHeuristic(child, cities - {child}, distance_matrix, ordered_nearests))
+        return values
+    weight, adjacency = minimumSpanningTree(cities, distance_matrix, ordered_nearests)
+    for child in children:
+        if deadline is not None and time.time() >= deadline:
+            return None
+        if len(cities) == 1:
+            values.append(distance_matrix[child][start])
+            continue
+        rest = spanningTreeWithout(child, weight, adjacency, distance_matrix, ordered_nearests)
+        first = _nearestIn(child, cities, ordered_nearests, child)
+        last = _nearestIn(start, cities, ordered_nearests, child)
+        values.append(rest + distance_matrix[child][first] + distance_matrix[start][last])
+    return values
+
+def _plainPrim(cities, distance_matrix):
+    cities = list(cities)
+    if not cities:
+        return 0
+    best = {city: distance_matrix[cities[0]][city] for city in cities[1:]}
+    weight = 0
+    while best:
+        city = min(best, key=best.get)
+        weight += best.pop(city)
+        for other in best:
+            best[other] = min(best[other], distance_matrix[city][other])
+    return weight
+
+def crossCheck(rounds=300, rng=random):
+    from tsp.problem import randomMatrix
+    from tsp.neighbours import NeighbourIndex
+    failures = 0
+    for r in range(rounds):
+        num_cities = rng.randint(2, 30)
+        distance_matrix = randomMatrix(num_cities, rng)
+        orderedNearests = NeighbourIndex(distance_matrix, rng.randint(1, 8))
+        start, v = rng.sample(range(num_cities), 2)
+        unvisited = [city for city in range(num_cities) if city not in (start, v) and rng.random() < 0.8]
+        if minimumSpanningTree(set(unvisited), distance_matrix, orderedNearests)[0] != _plainPrim(unvisited, distance_matrix):
+            failures += 1
+        if not unvisited:
+            continue
+        values = mstChildren(v, unvisited, unvisited, distance_matrix, orderedNearests, start)
+        for child, value in zip(unvisited, values):
+            if value != mstHeuristic(child, set(unvisited) - {child}, distance_matrix, orderedNearests, start):
+                failures += 1
+        if len(unvisited) <= 6:
+            #Admissible: never more than the cheapest way to finish from any child
+            for child, value in zip(unvisited, values):
+                rest = [city for city in unvisited if city != child]
+                cheapest = min(sum(distance_matrix[a][b] for a, b in zip((child,) + order, order + (start,)))
+                               for order in itertools.permutations(rest))
+                if value > cheapest:
+                    failures += 1
+    return failures
+
+if __name__ == "__main__":
+    failures = crossCheck()
+    print("spanning trees and bounds check out" if failures == 0 else str(failures) + " failures")